@@ -1,13 +1,14 @@
-from flask import Flask, abort
+from flask import Flask
 from flask_cors import CORS
 from flask_restx import Api
 from flask_bcrypt import Bcrypt
 from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
+from app.persistence.routing import RoutingSession
 
 bcrypt = Bcrypt()
 jwt = JWTManager()
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 
 
 def create_app(config_class="config.DevelopmentConfig"):
@@ -18,18 +19,27 @@ def create_app(config_class="config.DevelopmentConfig"):
 
     bcrypt.init_app(app)
     jwt.init_app(app)
+
+    from app.persistence import routing
+
+    routing.configure(app)
     db.init_app(app)
+    routing.init_app(app)
 
-    @jwt.user_lookup_loader
-    def user_lookup_callback(_jwt_header, jwt_data):
-        from app.services import facade
+    from app import instrumentation
 
-        user = facade.get_user(jwt_data["sub"]["id"])
+    instrumentation.init_app(app)
 
-        if not user:
-            abort(404, "User not found")
+    from app import principal, response_cache
+    from app.persistence import entity_cache
 
-        return user
+    principal.init_app(app)
+    entity_cache.init_app(app)
+    response_cache.init_app(app)
+
+    @jwt.user_lookup_loader
+    def user_lookup_callback(_jwt_header, jwt_data):
+        return principal.Principal(jwt_data["sub"]["id"])
 
     api = Api(
         app,
@@ -48,6 +58,10 @@ def create_app(config_class="config.DevelopmentConfig"):
         doc="/api/v1",
     )
 
+    from app.api.v1.serializers import register_representation
+
+    register_representation(api)
+
     from app.api.v1.users import api as users_ns
     from app.api.v1.amenities import api as amenities_ns
     from app.api.v1.places import api as places_ns
@@ -61,4 +75,12 @@ def create_app(config_class="config.DevelopmentConfig"):
     api.add_namespace(reviews_ns, path="/api/v1")
     api.add_namespace(auth_ns, path="/api/v1")
 
+    from app import metrics
+
+    metrics.init_app(app, api)
+
+    from app.commands import register_commands
+
+    register_commands(app)
+
     return app
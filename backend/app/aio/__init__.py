@@ -0,0 +1,306 @@
+"""ASGI variant of the API: hot read endpoints on the event loop.
+
+The endpoints of app.aio.routes (place detail, place reviews, review and
+amenity details) are served by coroutines through AsyncHBnBFacade, on
+SQLAlchemy asyncio (aiosqlite for SQLite), so a worker keeps many of
+them in flight while they wait on the database. Every other request,
+writes included, goes to the regular Flask app through asgiref's
+WsgiToAsgi, so the routes, validation and auth are exactly run.py's.
+Both sides share the Flask app's config and response cache; calls to a
+store doing file I/O (the "sqlite" backend) run in a thread, off the
+event loop. Requests served here are recorded in the Flask app's metrics
+and, with REQUEST_INSTRUMENTATION, timed and logged as in
+app.instrumentation.
+
+Run asgi.py with an ASGI server, e.g. `uvicorn asgi:app`. Needs
+sqlalchemy[asyncio], aiosqlite (or asyncpg) and asgiref.
+"""
+import asyncio
+import time
+from urllib.parse import urlencode
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import unquote_etag
+from werkzeug.routing import RequestRedirect
+
+from app import create_app, instrumentation, metrics
+from app.aio.facade import AsyncHBnBFacade
+from app.aio.routes import ROUTES, AsyncRequest
+from app.api.v1.caching import STORED_HEADERS
+from app.api.v1.serializers import dumps
+from app.persistence.routing import (
+    STICKY_COOKIE,
+    is_sqlite_file,
+    primary_until,
+    set_pragmas,
+    sqlite_path,
+)
+from app.response_cache import MemoryResponseStore
+
+# asyncio driver of each synchronous backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+
+def async_database_uri(app, uri: str) -> str:
+    """uri with the asyncio driver of its backend."""
+    url = make_url(uri)
+    backend = url.get_backend_name()
+
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for '{backend}'")
+
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    if is_sqlite_file(uri):
+        url = url.set(database=sqlite_path(app, uri))
+
+    return url.render_as_string(hide_password=False)
+
+
+def create_async_facade(app, uri: str) -> AsyncHBnBFacade:
+    engine = create_async_engine(async_database_uri(app, uri))
+
+    if is_sqlite_file(uri):
+        # journal_mode is left to the Flask app's writer
+        set_pragmas(
+            engine.sync_engine,
+            {
+                name: value
+                for name, value in app.config["SQLITE_PRAGMAS"].items()
+                if name != "journal_mode"
+            },
+        )
+
+    return AsyncHBnBFacade(engine)
+
+
+class AsyncApp:
+    """ASGI app serving ROUTES itself and the rest through Flask."""
+
+    def __init__(self, flask_app, facade, replica_facade=None):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.facade = facade
+        self.replica_facade = replica_facade
+        self.urls = flask_app.url_map.bind("")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            return await self._lifespan(receive, send)
+
+        route = None
+
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            route = self._match(scope["path"])
+
+        if route is None:
+            return await self.wsgi(scope, receive, send)
+
+        (handler, tags, tags_from), endpoint, rule, kwargs = route
+        request = AsyncRequest(scope)
+        sample = metrics.start_request(self.flask_app, endpoint, rule)
+
+        try:
+            status, headers, body = await self._instrumented(
+                request,
+                endpoint,
+                self._respond(request, handler, tags, tags_from, kwargs),
+            )
+            metrics.record_request(sample, request.method, status)
+
+            origin = request.headers.get("origin")
+
+            if origin is not None:
+                headers["Access-Control-Allow-Origin"] = origin
+                headers["Vary"] = "Origin"
+            else:
+                headers["Access-Control-Allow-Origin"] = "*"
+
+            headers["Content-Length"] = str(len(body))
+
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status,
+                    "headers": [
+                        (
+                            name.lower().encode("latin-1"),
+                            value.encode("latin-1"),
+                        )
+                        for name, value in headers.items()
+                    ],
+                }
+            )
+            await send(
+                {
+                    "type": "http.response.body",
+                    "body": b"" if request.method == "HEAD" else body,
+                }
+            )
+        finally:
+            metrics.end_request(sample)
+
+    async def _instrumented(self, request, endpoint, respond):
+        """Await respond, timed and logged as in app.instrumentation."""
+        if not self.flask_app.config["REQUEST_INSTRUMENTATION"]:
+            return await respond
+
+        stats = instrumentation.RequestStats()
+        token = instrumentation.async_request_stats.set(stats)
+
+        try:
+            status, headers, body = await respond
+        finally:
+            instrumentation.async_request_stats.reset(token)
+
+        seconds = instrumentation.report(
+            stats,
+            {
+                "method": request.method,
+                "path": request.path,
+                "endpoint": endpoint,
+                "status": status,
+            },
+        )
+        headers["Server-Timing"] = instrumentation.server_timing(
+            stats, seconds
+        )
+        return status, headers, body
+
+    def _match(self, path):
+        try:
+            rule, kwargs = self.urls.match(path, "GET", return_rule=True)
+        except (HTTPException, RequestRedirect):
+            return None
+
+        if rule.endpoint not in ROUTES:
+            return None
+
+        return ROUTES[rule.endpoint], rule.endpoint, rule.rule, kwargs
+
+    def _pinned(self, request) -> bool:
+        """True if the client wrote recently, see routing."""
+        cookie = request.cookies.get(STICKY_COOKIE)
+        return primary_until(self.flask_app, cookie) > time.time()
+
+    def _facade_for(self, request) -> AsyncHBnBFacade:
+        """The replica's unless the client wrote recently."""
+        if self.replica_facade is None or self._pinned(request):
+            return self.facade
+
+        return self.replica_facade
+
+    async def _respond(self, request, handler, tags, tags_from, kwargs):
+        """Run a route through the response cache, as cached_response."""
+        cache = self.flask_app.extensions.get("response_cache")
+        pinned = self.replica_facade is not None and self._pinned(request)
+        cached = tags is not None and cache is not None and not pinned
+        key = (
+            f"{request.path}?{urlencode(sorted(request.args.items(True)))}"
+        )
+
+        if cached:
+            entry, generation = await self._in_store(
+                cache, lambda: self._lookup(cache, key)
+            )
+
+            if entry is not None:
+                status, headers, body = self._replay(request, entry)
+                headers["X-Cache"] = "HIT"
+                return status, headers, body
+
+        facade = self._facade_for(request)
+        status, data, headers = await handler(request, facade, **kwargs)
+
+        if data is None:
+            return status, headers, b""
+
+        body = dumps(data)
+        headers["Content-Type"] = "application/json"
+
+        if cached:
+            # Replica reads are not stored, see routing
+            if status == 200 and facade is not self.replica_facade:
+                entry_tags = {tag.format(**kwargs) for tag in tags}
+                if tags_from is not None:
+                    entry_tags.update(tags_from(data))
+
+                stored = [
+                    (name, headers[name])
+                    for name in STORED_HEADERS
+                    if name in headers
+                ]
+                await self._in_store(
+                    cache,
+                    lambda: cache.add(
+                        key, (status, stored, body), entry_tags, generation
+                    ),
+                )
+
+            headers["X-Cache"] = "MISS"
+
+        return status, headers, body
+
+    @staticmethod
+    def _lookup(cache, key):
+        """The entry under key, or None and the generation to fill it."""
+        entry = cache.get(key)
+        return entry, None if entry is not None else cache.generation
+
+    @staticmethod
+    async def _in_store(cache, call):
+        """call(), in a thread unless the store is in memory."""
+        if isinstance(cache, MemoryResponseStore):
+            return call()
+
+        return await asyncio.to_thread(call)
+
+    @staticmethod
+    def _replay(request, entry):
+        status, headers, body = entry
+        headers = dict(headers)
+        etag = headers.get("ETag")
+
+        if etag is not None and request.if_none_match.contains_weak(
+            unquote_etag(etag)[0]
+        ):
+            return 304, {"ETag": etag}, b""
+
+        return status, headers, body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                for facade in (self.facade, self.replica_facade):
+                    if facade is not None:
+                        await facade.dispose()
+
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+def create_asgi_app(config_class="config.DevelopmentConfig") -> AsyncApp:
+    flask_app = create_app(config_class)
+    config = flask_app.config
+    replica_uri = config.get("SQLALCHEMY_REPLICA_URI")
+    facade = create_async_facade(flask_app, config["SQLALCHEMY_DATABASE_URI"])
+    replica_facade = (
+        create_async_facade(flask_app, replica_uri) if replica_uri else None
+    )
+
+    if config["REQUEST_INSTRUMENTATION"]:
+        for each in (facade, replica_facade):
+            if each is not None:
+                instrumentation.instrument_engine(each.engine.sync_engine)
+
+    return AsyncApp(flask_app, facade, replica_facade)
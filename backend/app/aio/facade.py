@@ -0,0 +1,78 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.aio.repository import (
+    AsyncAmenityRepository,
+    AsyncPlaceRepository,
+    AsyncReviewRepository,
+    AsyncUserRepository,
+)
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+
+
+class AsyncHBnBFacade:
+    """Coroutine versions of the HBnBFacade read methods.
+
+    Same names, arguments and results; writes stay on HBnBFacade, whose
+    unit of work and cache invalidation are synchronous.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        self.user_repo = AsyncUserRepository(sessionmaker)
+        self.place_repo = AsyncPlaceRepository(sessionmaker)
+        self.review_repo = AsyncReviewRepository(sessionmaker)
+        self.amenity_repo = AsyncAmenityRepository(sessionmaker)
+
+    async def dispose(self) -> None:
+        """Close the engine's pooled connections."""
+        await self.engine.dispose()
+
+    # ------------------- User -------------------
+
+    async def get_user(self, user_id: str) -> User | None:
+        return await self.user_repo.get(user_id)
+
+    # ------------------- Amenity -------------------
+
+    async def get_amenity(self, amenity_id: str) -> Amenity | None:
+        return await self.amenity_repo.get(amenity_id)
+
+    async def get_all_amenities(self) -> list[Amenity]:
+        return await self.amenity_repo.get_all()
+
+    async def get_amenities_stats(self) -> list[tuple]:
+        return [await self.amenity_repo.collection_stats()]
+
+    # ------------------- Places -------------------
+
+    async def get_place(
+        self, place_id: str, load: str | None = None
+    ) -> Place | None:
+        return await self.place_repo.get(place_id, load=load)
+
+    async def get_all_places(self) -> list[Place]:
+        return await self.place_repo.get_all()
+
+    async def get_places_stats(self) -> list[tuple]:
+        return [
+            await self.place_repo.collection_stats(),
+            await self.user_repo.collection_stats(),
+            await self.amenity_repo.collection_stats(),
+        ]
+
+    # ------------------- Reviews -------------------
+
+    async def get_review(self, review_id: str) -> Review | None:
+        return await self.review_repo.get(review_id)
+
+    async def get_reviews_stats(self) -> list[tuple]:
+        return [await self.review_repo.collection_stats()]
+
+    async def get_reviews_by_place(self, place_id) -> list[Review]:
+        place = await self.place_repo.get(place_id, load="reviews")
+
+        return place.reviews if place else []
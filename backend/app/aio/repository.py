@@ -0,0 +1,64 @@
+"""Read repositories on SQLAlchemy asyncio.
+
+Each call runs in its own short AsyncSession; objects come back detached
+with every relationship of the load policy already loaded, so they can
+be serialized after the session is closed.
+"""
+from sqlalchemy import func, select
+
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.persistence.loading import loader_options
+
+
+class AsyncSQLAlchemyRepository:
+    def __init__(self, model, sessionmaker):
+        self.model = model
+        self.sessionmaker = sessionmaker
+
+    async def get(self, obj_id, load=None):
+        async with self.sessionmaker() as session:
+            return await session.get(
+                self.model,
+                obj_id,
+                options=loader_options(self.model, load),
+            )
+
+    async def get_all(self, load=None):
+        async with self.sessionmaker() as session:
+            result = await session.scalars(
+                select(self.model).options(
+                    *loader_options(self.model, load)
+                )
+            )
+            return result.all()
+
+    async def collection_stats(self):
+        """(row count, latest updated_at), see SQLAlchemyRepository."""
+        async with self.sessionmaker() as session:
+            result = await session.execute(
+                select(func.count(), func.max(self.model.updated_at))
+            )
+            return tuple(result.one())
+
+
+class AsyncUserRepository(AsyncSQLAlchemyRepository):
+    def __init__(self, sessionmaker):
+        super().__init__(User, sessionmaker)
+
+
+class AsyncPlaceRepository(AsyncSQLAlchemyRepository):
+    def __init__(self, sessionmaker):
+        super().__init__(Place, sessionmaker)
+
+
+class AsyncReviewRepository(AsyncSQLAlchemyRepository):
+    def __init__(self, sessionmaker):
+        super().__init__(Review, sessionmaker)
+
+
+class AsyncAmenityRepository(AsyncSQLAlchemyRepository):
+    def __init__(self, sessionmaker):
+        super().__init__(Amenity, sessionmaker)
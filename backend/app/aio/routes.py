@@ -0,0 +1,137 @@
+"""Read endpoints served on the event loop, same contract as app/api/v1.
+
+Each handler takes the request, the AsyncHBnBFacade and the URL
+arguments, and returns (status, body, headers): body is the data to
+encode as JSON, or None for a bodiless 304.
+"""
+from urllib.parse import parse_qsl
+
+from werkzeug.datastructures import MultiDict
+from werkzeug.http import parse_cookie, parse_date, parse_etags
+
+from app.api.v1.conditional import (
+    entity_validators,
+    not_modified,
+    validator_headers,
+)
+from app.api.v1.places import place_detail_tags
+from app.api.v1.serializers import AMENITY, PLACE_DETAIL, REVIEW
+
+
+class AsyncRequest:
+    """The parts of an ASGI HTTP scope the handlers need."""
+
+    def __init__(self, scope):
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = MultiDict(
+            parse_qsl(
+                scope.get("query_string", b"").decode("latin-1"),
+                keep_blank_values=True,
+            )
+        )
+        self.headers = {
+            name.decode("latin-1").lower(): value.decode("latin-1")
+            for name, value in scope.get("headers", ())
+        }
+
+    @property
+    def if_none_match(self):
+        return parse_etags(self.headers.get("if-none-match"))
+
+    @property
+    def if_modified_since(self):
+        return parse_date(self.headers.get("if-modified-since"))
+
+    @property
+    def cookies(self):
+        return parse_cookie(self.headers.get("cookie", ""))
+
+
+def conditional(request, validators, build, check_date: bool = True):
+    """Async counterpart of conditional.conditional_response."""
+    headers, etag, last_modified = validator_headers(validators)
+
+    if not_modified(
+        request.if_none_match,
+        request.if_modified_since,
+        etag,
+        last_modified if check_date else None,
+    ):
+        return 304, None, headers
+
+    return 200, build(), headers
+
+
+async def get_place(request, facade, place_id):
+    place = await facade.get_place(place_id, load="detail")
+
+    if not place:
+        return 404, {"error": "Place not found"}, {}
+
+    return conditional(
+        request,
+        entity_validators(
+            place, place.owner, *place.amenities, *place.reviews
+        ),
+        lambda: PLACE_DETAIL(place),
+    )
+
+
+async def get_place_reviews(request, facade, place_id):
+    place = await facade.get_place(place_id, load="reviews")
+
+    if not place:
+        return 404, {"message": "Place not found"}, {}
+
+    return conditional(
+        request,
+        entity_validators(*place.reviews),
+        lambda: REVIEW.many(place.reviews),
+        check_date=False,
+    )
+
+
+async def get_review(request, facade, review_id):
+    review = await facade.get_review(review_id)
+
+    if not review:
+        return 404, {"message": "Review not found"}, {}
+
+    return conditional(
+        request, entity_validators(review), lambda: REVIEW(review)
+    )
+
+
+async def get_amenity(request, facade, amenity_id):
+    amenity = await facade.get_amenity(amenity_id)
+
+    if not amenity:
+        return 404, {"message": "Amenity not found"}, {}
+
+    return conditional(
+        request, entity_validators(amenity), lambda: AMENITY(amenity)
+    )
+
+
+# Flask endpoint -> (handler, cache tags, tags_from): the URLs are matched
+# against the Flask app's own url_map, and the tags are those of the
+# resource's cached_response decorator (None: not cached)
+ROUTES = {
+    "places_place_resource": (
+        get_place,
+        ("place:{place_id}",),
+        place_detail_tags,
+    ),
+    "reviews_place_review_list": (
+        get_place_reviews,
+        ("place:{place_id}",),
+        None,
+    ),
+    "reviews_review_resource": (get_review, None, None),
+    "amenities_amenity_resource": (
+        get_amenity,
+        ("amenity:{amenity_id}",),
+        None,
+    ),
+}
@@ -1,5 +1,15 @@
 from flask_jwt_extended import current_user, jwt_required
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.batch import batch_models, batch_report, batch_too_large
+from app.api.v1.caching import cached_response
+from app.api.v1.conditional import (
+    collection_validators,
+    conditional_response,
+    entity_validators,
+)
+from app.api.v1.serializers import AMENITY
+from app.api.v1.streaming import stream_parser, stream_response, wants_stream
+from app.persistence.integrity import DuplicateError
 from app.services import facade
 
 api = Namespace("amenities", description="Amenity operations")
@@ -18,6 +28,10 @@ amenity_response_model = api.model(
     ),
 )
 
+amenity_batch_model, amenity_batch_report_model = batch_models(
+    api, "Amenity", amenity_model
+)
+
 
 @api.route("/")
 class AmenityList(Resource):
@@ -42,26 +56,86 @@ class AmenityList(Resource):
 
         try:
             new_amenity = facade.create_amenity(amenity_data)
+        except DuplicateError as e:
+            return {"message": str(e)}, 409
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": new_amenity.id,
-            "name": new_amenity.name,
-        }, 201
+        return AMENITY(new_amenity), 201
 
+    @api.expect(stream_parser)
     @api.response(
         200,
         "List of amenities retrieved successfully",
         [amenity_response_model],
     )
+    @api.response(304, "Not modified")
+    @cached_response("amenities")
     def get(self):
         """Retrieve a list of all amenities"""
-        amenities = facade.get_all_amenities()
+        if wants_stream(stream_parser.parse_args()):
+            return stream_response(facade.stream_amenities(), AMENITY)
+
+        return conditional_response(
+            collection_validators(facade.get_amenities_stats()),
+            lambda: AMENITY.many(facade.get_all_amenities()),
+            check_date=False,
+        )
 
-        return [
-            {"id": amenity.id, "name": amenity.name} for amenity in amenities
-        ]
+
+@api.route("/batch")
+class AmenityBatch(Resource):
+    @api.expect(amenity_batch_model)
+    @api.response(
+        200,
+        "Batch processed, see per-item results",
+        amenity_batch_report_model,
+    )
+    @api.response(400, "Invalid input data")
+    @api.response(403, "Admin privileges required")
+    @api.response(409, "An amenity of the batch already exists")
+    @api.response(413, "Too many items in the batch")
+    @jwt_required()
+    def post(self):
+        """Register many amenities in one transaction"""
+        if not current_user.is_admin:
+            return {"error": "Admin privileges required"}, 403
+
+        items = api.payload["items"]
+
+        if batch_too_large(items):
+            return {"message": "Too many items in the batch"}, 413
+
+        taken = {
+            amenity.name
+            for amenity in facade.get_amenities_by_names(
+                {item["name"] for item in items}
+            )
+        }
+        results = [None] * len(items)
+        pending = []
+
+        for index, item in enumerate(items):
+            if item["name"] in taken:
+                results[index] = (
+                    409,
+                    f"Amenity with the name '{item['name']}' already exists",
+                )
+            else:
+                taken.add(item["name"])
+                pending.append(index)
+
+        try:
+            created = facade.create_amenities(
+                [items[index] for index in pending]
+            )
+        except DuplicateError as e:
+            return {"message": str(e)}, 409
+
+        for index, result in zip(pending, created):
+            results[index] = result
+
+        return batch_report(results), 200
 
 
 @api.route("/<amenity_id>")
@@ -69,18 +143,19 @@ class AmenityResource(Resource):
     @api.response(
         200, "Amenity details retrieved successfully", amenity_response_model
     )
+    @api.response(304, "Not modified")
     @api.response(404, "Amenity not found")
+    @cached_response("amenity:{amenity_id}")
     def get(self, amenity_id):
         """Get amenity details by ID"""
-        amenity = facade.get_amenity(amenity_id)
+        amenity = facade.get_amenity(amenity_id, snapshot=True)
 
         if not amenity:
             return {"message": "Amenity not found"}, 404
 
-        return {
-            "id": amenity.id,
-            "name": amenity.name,
-        }
+        return conditional_response(
+            entity_validators(amenity), lambda: AMENITY(amenity)
+        )
 
     @api.expect(amenity_model)
     @api.response(200, "Amenity updated successfully", amenity_response_model)
@@ -112,10 +187,9 @@ class AmenityResource(Resource):
         try:
             updated_amenity = facade.update_amenity(amenity, amenity_data)
 
+        except DuplicateError as e:
+            return {"message": str(e)}, 409
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": updated_amenity.id,
-            "name": updated_amenity.name,
-        }
+        return AMENITY(updated_amenity)
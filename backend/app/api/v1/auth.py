@@ -36,9 +36,11 @@ class Login(Resource):
         """Authenticate user and return a JWT token"""
         credentials = api.payload
 
-        user = facade.get_user_by_email(credentials["email"])
+        user = facade.authenticate_user(
+            credentials["email"], credentials["password"]
+        )
 
-        if not user or not user.verify_password(credentials["password"]):
+        if not user:
             return {"error": "Invalid credentials"}, 401
 
         access_token = create_access_token(
@@ -0,0 +1,65 @@
+from flask import current_app
+from flask_restx import fields
+from sqlalchemy import inspect
+
+
+def batch_models(api, name, item_model):
+    """Payload and report models of a batch endpoint for item_model."""
+    payload = api.model(
+        f"{name}Batch",
+        {"items": fields.List(fields.Nested(item_model), required=True)},
+    )
+    result = api.model(
+        f"{name}BatchResult",
+        {
+            "index": fields.Integer(description="Position in the payload"),
+            "status": fields.Integer(description="HTTP status of the item"),
+            "id": fields.String(description="ID of the created item"),
+            "message": fields.String(description="Why the item failed"),
+        },
+    )
+    report = api.model(
+        f"{name}BatchReport",
+        {
+            "created": fields.Integer(),
+            "failed": fields.Integer(),
+            "results": fields.List(fields.Nested(result)),
+        },
+    )
+    return payload, report
+
+
+def batch_too_large(items: list) -> bool:
+    return len(items) > current_app.config["BATCH_MAX_ITEMS"]
+
+
+def batch_report(results: list) -> dict:
+    """Per-item report of a batch.
+
+    results holds, in payload order, the created object, the validation
+    error raised for the item, or a (status, message) pair.
+    """
+    entries = []
+
+    for index, result in enumerate(results):
+        if isinstance(result, tuple):
+            status, message = result
+            entries.append(
+                {"index": index, "status": status, "message": message}
+            )
+        elif isinstance(result, Exception):
+            entries.append(
+                {"index": index, "status": 400, "message": str(result)}
+            )
+        else:
+            # The identity key avoids refreshing each expired object
+            obj_id = inspect(result).identity[0]
+            entries.append({"index": index, "status": 201, "id": obj_id})
+
+    created = sum(entry["status"] == 201 for entry in entries)
+
+    return {
+        "created": created,
+        "failed": len(entries) - created,
+        "results": entries,
+    }
@@ -0,0 +1,102 @@
+"""Serve public GET endpoints from the shared response cache.
+
+Only decorate handlers whose response does not depend on the caller: the
+cache key is the path plus the normalized query string, nothing else.
+A hit is replayed from the stored bytes without touching the database.
+Responses read from a replica are not stored, and clients pinned to the
+primary bypass the cache (see app/persistence/routing.py).
+"""
+from functools import wraps
+from urllib.parse import urlencode
+
+from flask import Response, request
+from flask_restx.utils import unpack
+from werkzeug.http import unquote_etag
+
+from app.api.v1.streaming import wants_stream
+from app.persistence.routing import pinned_to_primary, reads_lag
+from app.response_cache import response_cache
+
+# Response headers stored along with the body
+STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def cache_key() -> str:
+    """Request path plus the query parameters in sorted order."""
+    return f"{request.path}?{urlencode(sorted(request.args.items(True)))}"
+
+
+def cached_response(*tags: str, tags_from=None):
+    """Cache the 200 responses of a Resource GET method.
+
+    tags may reference URL arguments, e.g. "place:{place_id}". tags_from,
+    if given, returns further tags for a response body, e.g. the ids of
+    the entities embedded in it.
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(resource, *args, **kwargs):
+            cache = response_cache()
+
+            if (
+                cache is None
+                or wants_stream(request.args)
+                or pinned_to_primary()
+            ):
+                return method(resource, *args, **kwargs)
+
+            key = cache_key()
+            entry = cache.get(key)
+
+            if entry is not None:
+                return _replay(entry)
+
+            generation = cache.generation
+            result = method(resource, *args, **kwargs)
+
+            # Already a response: a 304 or a stream, nothing to store
+            if isinstance(result, Response):
+                return result
+
+            data, code, headers = unpack(result)
+            response = resource.api.make_response(data, code, headers=headers)
+
+            if code == 200 and not reads_lag():
+                entry_tags = {tag.format(**kwargs) for tag in tags}
+                if tags_from is not None:
+                    entry_tags.update(tags_from(data))
+
+                stored = [
+                    (name, response.headers[name])
+                    for name in STORED_HEADERS
+                    if name in response.headers
+                ]
+                cache.add(
+                    key,
+                    (code, stored, response.get_data()),
+                    entry_tags,
+                    generation,
+                )
+
+            response.headers["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def _replay(entry) -> Response:
+    status, headers, body = entry
+    etag = dict(headers).get("ETag")
+
+    if etag is not None and request.if_none_match.contains_weak(
+        unquote_etag(etag)[0]
+    ):
+        response = Response(status=304, headers={"ETag": etag})
+    else:
+        response = Response(body, status=status, headers=headers)
+
+    response.headers["X-Cache"] = "HIT"
+    return response
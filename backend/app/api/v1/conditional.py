@@ -0,0 +1,92 @@
+"""Conditional GET: strong ETags and Last-Modified on read endpoints.
+
+Item validators are derived from the id and version of every entity
+embedded in the response, collection validators from the row count and
+latest updated_at of the tables a list reads (see facade.get_*_stats).
+Both are known before the body is built, so a matching If-None-Match or
+If-Modified-Since is answered with 304 without serializing anything.
+"""
+import hashlib
+from datetime import datetime, timezone
+
+from flask import Response, request
+from werkzeug.http import http_date, quote_etag
+
+
+def entity_validators(*objs) -> tuple[str, datetime | None]:
+    """ETag and Last-Modified of a response embedding objs, in order."""
+    digest = hashlib.sha1()
+    last_modified = None
+
+    for obj in objs:
+        digest.update(f"{obj.id}:{obj.version};".encode())
+
+        if last_modified is None or obj.updated_at > last_modified:
+            last_modified = obj.updated_at
+
+    return digest.hexdigest(), last_modified
+
+
+def collection_validators(stats) -> tuple[str, datetime | None]:
+    """ETag and Last-Modified from (count, max(updated_at)) pairs."""
+    digest = hashlib.sha1()
+    last_modified = None
+
+    for count, updated_at in stats:
+        digest.update(f"{count}:{updated_at};".encode())
+
+        if updated_at is not None and (
+            last_modified is None or updated_at > last_modified
+        ):
+            last_modified = updated_at
+
+    return digest.hexdigest(), last_modified
+
+
+def conditional_response(validators, build, check_date: bool = True):
+    """build()'s body with the validators as headers, or a bodiless 304.
+
+    Deleting a row does not move a collection's Last-Modified, so lists
+    pass check_date=False and only If-None-Match can make them 304.
+    """
+    headers, etag, last_modified = validator_headers(validators)
+
+    if not_modified(
+        request.if_none_match,
+        request.if_modified_since,
+        etag,
+        last_modified if check_date else None,
+    ):
+        return Response(status=304, headers=headers)
+
+    return build(), 200, headers
+
+
+def validator_headers(validators) -> tuple[dict, str, datetime | None]:
+    """ETag/Last-Modified headers, the etag and the UTC last modified."""
+    etag, last_modified = validators
+    headers = {"ETag": quote_etag(etag)}
+
+    if last_modified is not None:
+        # Timestamps are stored as naive local time
+        last_modified = last_modified.astimezone(timezone.utc)
+        headers["Last-Modified"] = http_date(last_modified)
+
+    return headers, etag, last_modified
+
+
+def not_modified(
+    if_none_match, if_modified_since, etag: str, last_modified
+) -> bool:
+    """True if If-None-Match (werkzeug ETags) or If-Modified-Since allow
+    a 304.
+    """
+    # If-Modified-Since is ignored when If-None-Match is sent (RFC 9110)
+    if if_none_match:
+        return if_none_match.contains_weak(etag)
+
+    return (
+        if_modified_since is not None
+        and last_modified is not None
+        and last_modified.replace(microsecond=0) <= if_modified_since
+    )
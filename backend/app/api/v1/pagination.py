@@ -0,0 +1,40 @@
+from flask import current_app
+from flask_restx import fields, inputs, reqparse
+
+pagination_parser = reqparse.RequestParser()
+pagination_parser.add_argument(
+    "limit", type=int, location="args", help="Maximum number of items"
+)
+pagination_parser.add_argument(
+    "cursor",
+    type=str,
+    location="args",
+    help="Value of next_cursor from the previous page",
+)
+pagination_parser.add_argument(
+    "stream",
+    type=inputs.boolean,
+    location="args",
+    help="Stream every item as one JSON array instead of a page",
+)
+
+
+def page_limit(limit: int | None) -> int:
+    """Clamp the requested page size to the configured bounds."""
+    if limit is None:
+        return current_app.config["PAGE_SIZE_DEFAULT"]
+
+    return max(1, min(limit, current_app.config["PAGE_SIZE_MAX"]))
+
+
+def page_model(api, name, item_model):
+    """Envelope model for a page of item_model."""
+    return api.model(
+        name,
+        {
+            "items": fields.List(fields.Nested(item_model)),
+            "next_cursor": fields.String(
+                description="Cursor for the next page, null on the last page"
+            ),
+        },
+    )
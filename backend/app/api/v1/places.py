@@ -1,5 +1,16 @@
 from flask_jwt_extended import current_user, get_jwt_identity, jwt_required
-from flask_restx import Namespace, Resource, fields
+from flask_restx import Namespace, Resource, fields, reqparse
+from app.api.v1.batch import batch_models, batch_report, batch_too_large
+from app.api.v1.caching import cached_response
+from app.api.v1.conditional import (
+    collection_validators,
+    conditional_response,
+    entity_validators,
+)
+from app.api.v1.pagination import page_limit, page_model, pagination_parser
+from app.api.v1.serializers import PLACE, PLACE_DETAIL
+from app.api.v1.streaming import stream_response, wants_stream
+from app.persistence.geo import parse_bbox
 from app.services import facade
 
 api = Namespace("places", description="Place operations")
@@ -68,6 +79,10 @@ place_response_model = api.model(
         "PlaceResponse",
         {
             "id": fields.String(description="Place ID"),
+            "review_count": fields.Integer(description="Number of reviews"),
+            "rating_avg": fields.Float(
+                description="Average rating, 0 when there are no reviews"
+            ),
             "owner": fields.Nested(user_model),
             "amenities": fields.List(fields.Nested(amenity_model)),
             "reviews": fields.List(fields.Nested(review_model)),
@@ -75,6 +90,147 @@ place_response_model = api.model(
     ),
 )
 
+place_page_model = page_model(api, "PlacePage", place_response_model)
+
+place_batch_model, place_batch_report_model = batch_models(
+    api, "Place", place_model
+)
+
+place_search_parser = pagination_parser.copy()
+place_search_parser.add_argument(
+    "min_price", type=float, location="args", help="Minimum price per night"
+)
+place_search_parser.add_argument(
+    "max_price", type=float, location="args", help="Maximum price per night"
+)
+place_search_parser.add_argument(
+    "owner_id", type=str, location="args", help="Only places of this owner"
+)
+place_search_parser.add_argument(
+    "amenity_id",
+    type=str,
+    action="append",
+    location="args",
+    help="Only places having all of these amenities (repeatable)",
+)
+place_search_parser.add_argument(
+    "bbox",
+    type=str,
+    location="args",
+    help="Bounding box as 'min_lon,min_lat,max_lon,max_lat'",
+)
+place_search_parser.add_argument(
+    "sort",
+    type=str,
+    choices=("price", "-price", "created", "rating"),
+    location="args",
+    help="Sort order (rating: highest average first), defaults to place ID",
+)
+
+nearby_parser = reqparse.RequestParser()
+nearby_parser.add_argument(
+    "lat", type=float, required=True, location="args", help="Latitude"
+)
+nearby_parser.add_argument(
+    "lon", type=float, required=True, location="args", help="Longitude"
+)
+nearby_parser.add_argument(
+    "radius_km",
+    type=float,
+    required=True,
+    location="args",
+    help="Search radius in kilometres",
+)
+nearby_parser.add_argument(
+    "limit", type=int, location="args", help="Maximum number of places"
+)
+
+nearby_place_model = api.model(
+    "NearbyPlace",
+    place_response_model.clone(
+        "NearbyPlace",
+        {"distance_km": fields.Float(description="Distance to the point")},
+    ),
+)
+
+nearby_page_model = api.model(
+    "NearbyPlacePage",
+    {"items": fields.List(fields.Nested(nearby_place_model))},
+)
+
+text_search_parser = pagination_parser.copy()
+text_search_parser.remove_argument("stream")
+text_search_parser.add_argument(
+    "q",
+    type=str,
+    required=True,
+    location="args",
+    help="Words to find in titles and descriptions, 'word*' for a prefix",
+)
+
+text_search_place_model = api.model(
+    "TextSearchPlace",
+    place_response_model.clone(
+        "TextSearchPlace",
+        {
+            "score": fields.Float(
+                description="bm25 relevance, lower is more relevant"
+            ),
+            "title_highlight": fields.String(
+                description="HTML title with the matches in <mark>"
+            ),
+            "snippet": fields.String(
+                description="HTML description excerpt around the matches"
+            ),
+        },
+    ),
+)
+
+text_search_page_model = page_model(
+    api, "TextSearchPlacePage", text_search_place_model
+)
+
+
+facet_parser = place_search_parser.copy()
+for name in ("limit", "cursor", "stream", "sort"):
+    facet_parser.remove_argument(name)
+
+amenity_facet_model = api.model(
+    "AmenityFacet",
+    {
+        "id": fields.String(description="Amenity ID"),
+        "name": fields.String(description="Name of the amenity"),
+        "count": fields.Integer(
+            description="Number of matching places having the amenity"
+        ),
+    },
+)
+
+amenity_facets_model = api.model(
+    "AmenityFacets",
+    {"items": fields.List(fields.Nested(amenity_facet_model))},
+)
+
+
+def search_filters(args) -> dict:
+    """Repository filters of a place_search_parser (or facet) request."""
+    return {
+        "min_price": args["min_price"],
+        "max_price": args["max_price"],
+        "owner_id": args["owner_id"],
+        "amenity_ids": args["amenity_id"] or (),
+        "bbox": parse_bbox(args["bbox"]) if args["bbox"] else None,
+        "sort": args.get("sort"),
+    }
+
+
+def place_detail_tags(data) -> list[str]:
+    """Cache tags of the entities embedded in a place detail."""
+    return [
+        f"user:{data['owner']['id']}",
+        *(f"amenity:{amenity['id']}" for amenity in data["amenities"]),
+    ]
+
 
 @api.route("/")
 class PlaceList(Resource):
@@ -88,76 +244,206 @@ class PlaceList(Resource):
         """Register a new place"""
         place_data: dict = api.payload
 
-        place_data["owner"] = current_user
+        place_data["owner"] = current_user.user
         amenities = place_data.pop("amenities", [])
 
         try:
-            new_place = facade.create_place(place_data)
+            with facade.transaction():
+                new_place = facade.create_place(place_data)
+
+                for amenity in facade.get_amenities_by_ids(amenities):
+                    new_place.add_amenity(amenity)
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        has_added = False
-
-        for amenity in amenities:
-            exists = facade.get_amenity(amenity)
-
-            if exists:
-                new_place.add_amenity(exists)
-                has_added = True
-
-        if has_added:
-            new_place.save()
-
-        return {
-            "id": new_place.id,
-            "title": new_place.title,
-            "description": new_place.description,
-            "price": new_place.price,
-            "latitude": new_place.latitude,
-            "longitude": new_place.longitude,
-            "owner": {
-                "id": new_place.owner.id,
-                "first_name": new_place.owner.first_name,
-                "last_name": new_place.owner.last_name,
-                "email": new_place.owner.email,
-            },
-            "amenities": [
-                {
-                    "id": amenity.id,
-                    "name": amenity.name,
-                }
-                for amenity in new_place.amenities
-            ],
-        }, 201
+        return PLACE(new_place), 201
 
+    @api.expect(place_search_parser)
     @api.response(
-        200, "List of places retrieved successfully", [place_response_model]
+        200, "List of places retrieved successfully", place_page_model
     )
+    @api.response(304, "Not modified")
+    @api.response(400, "Invalid filter or cursor")
+    @cached_response("places")
     def get(self):
-        """Retrieve a list of all places"""
-        places = facade.get_all_places()
-
-        return [
-            {
-                "id": place.id,
-                "title": place.title,
-                "description": place.description,
-                "price": place.price,
-                "latitude": place.latitude,
-                "longitude": place.longitude,
-                "owner": {
-                    "id": place.owner.id,
-                    "first_name": place.owner.first_name,
-                    "last_name": place.owner.last_name,
-                    "email": place.owner.email,
-                },
-                "amenities": [
-                    {"id": amenity.id, "name": amenity.name}
-                    for amenity in place.amenities
+        """Retrieve a filtered, sorted page of places
+
+        With stream=1 (or Accept: application/x-ndjson) every matching place
+        is streamed instead of one page.
+        """
+        args = place_search_parser.parse_args()
+
+        try:
+            filters = search_filters(args)
+
+            if wants_stream(args):
+                return stream_response(
+                    facade.stream_places(load="list", **filters), PLACE
+                )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        def page():
+            places, next_cursor = facade.search_places(
+                page_limit(args["limit"]),
+                args["cursor"],
+                load="list",
+                **filters,
+            )
+            return {"items": PLACE.many(places), "next_cursor": next_cursor}
+
+        try:
+            return conditional_response(
+                collection_validators(facade.get_places_stats()),
+                page,
+                check_date=False,
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+
+@api.route("/batch")
+class PlaceBatch(Resource):
+    @api.expect(place_batch_model)
+    @api.response(
+        200, "Batch processed, see per-item results", place_batch_report_model
+    )
+    @api.response(400, "Invalid input data")
+    @api.response(401, "Invalid token")
+    @api.response(413, "Too many items in the batch")
+    @jwt_required()
+    def post(self):
+        """Register many places in one transaction"""
+        items = api.payload["items"]
+
+        if batch_too_large(items):
+            return {"message": "Too many items in the batch"}, 413
+
+        owner = current_user.user
+
+        for item in items:
+            item["owner"] = owner
+
+        return batch_report(facade.create_places(items)), 200
+
+
+@api.route("/facets")
+class PlaceFacets(Resource):
+    @api.expect(facet_parser)
+    @api.response(
+        200, "Amenity counts over the matching places", amenity_facets_model
+    )
+    @api.response(304, "Not modified")
+    @api.response(400, "Invalid filter")
+    @cached_response("places")
+    def get(self):
+        """Count the places having each amenity among the filtered places"""
+        args = facet_parser.parse_args()
+
+        try:
+            filters = search_filters(args)
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+        def items():
+            return {
+                "items": [
+                    {"id": amenity_id, "name": name, "count": count}
+                    for amenity_id, name, count in facade.get_amenity_facets(
+                        **filters
+                    )
+                ]
+            }
+
+        return conditional_response(
+            collection_validators(facade.get_places_stats()),
+            items,
+            check_date=False,
+        )
+
+
+@api.route("/nearby")
+class PlaceNearby(Resource):
+    @api.expect(nearby_parser)
+    @api.response(
+        200, "Places within the radius, nearest first", nearby_page_model
+    )
+    @api.response(304, "Not modified")
+    @api.response(400, "Invalid coordinates or radius")
+    @cached_response("places")
+    def get(self):
+        """Retrieve the places nearest to a point within a radius"""
+        args = nearby_parser.parse_args()
+
+        if not -90 <= args["lat"] <= 90 or not -180 <= args["lon"] <= 180:
+            return {"message": "Invalid coordinates"}, 400
+
+        if args["radius_km"] <= 0:
+            return {"message": "radius_km must be a positive number"}, 400
+
+        def items():
+            results = facade.get_places_nearby(
+                args["lat"],
+                args["lon"],
+                args["radius_km"],
+                page_limit(args["limit"]),
+                load="list",
+            )
+            return {
+                "items": [
+                    {**PLACE(place), "distance_km": distance}
+                    for place, distance in results
+                ]
+            }
+
+        return conditional_response(
+            collection_validators(facade.get_places_stats()),
+            items,
+            check_date=False,
+        )
+
+
+@api.route("/search")
+class PlaceTextSearch(Resource):
+    @api.expect(text_search_parser)
+    @api.response(
+        200, "Matching places, most relevant first", text_search_page_model
+    )
+    @api.response(304, "Not modified")
+    @api.response(400, "Invalid query or cursor")
+    @cached_response("places")
+    def get(self):
+        """Full-text search over place titles and descriptions"""
+        args = text_search_parser.parse_args()
+
+        def page():
+            hits, next_cursor = facade.search_places_text(
+                args["q"],
+                page_limit(args["limit"]),
+                args["cursor"],
+                load="list",
+            )
+            return {
+                "items": [
+                    {
+                        **PLACE(place),
+                        "score": score,
+                        "title_highlight": title,
+                        "snippet": snippet,
+                    }
+                    for place, score, title, snippet in hits
                 ],
+                "next_cursor": next_cursor,
             }
-            for place in places
-        ]
+
+        try:
+            return conditional_response(
+                collection_validators(facade.get_places_stats()),
+                page,
+                check_date=False,
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
 
 
 @api.route("/<place_id>")
@@ -165,36 +451,22 @@ class PlaceResource(Resource):
     @api.response(
         200, "Place details retrieved successfully", place_response_model
     )
+    @api.response(304, "Not modified")
     @api.response(404, "Place not found")
+    @cached_response("place:{place_id}", tags_from=place_detail_tags)
     def get(self, place_id):
         """Get place details by ID"""
-        place = facade.get_place(place_id)
+        place = facade.get_place(place_id, load="detail", snapshot=True)
 
         if not place:
             return {"error": "Place not found"}, 404
 
-        return {
-            "id": place.id,
-            "title": place.title,
-            "description": place.description,
-            "price": place.price,
-            "latitude": place.latitude,
-            "longitude": place.longitude,
-            "owner": {
-                "id": place.owner.id,
-                "first_name": place.owner.first_name,
-                "last_name": place.owner.last_name,
-                "email": place.owner.email,
-            },
-            "amenities": [
-                {"id": amenity.id, "name": amenity.name}
-                for amenity in place.amenities
-            ],
-            "reviews": [
-                {"id": review.id, "text": review.text, "rating": review.rating}
-                for review in place.reviews
-            ],
-        }
+        return conditional_response(
+            entity_validators(
+                place, place.owner, *place.amenities, *place.reviews
+            ),
+            lambda: PLACE_DETAIL(place),
+        )
 
     @api.expect(place_model)
     @api.response(200, "Place updated successfully", place_response_model)
@@ -206,14 +478,14 @@ class PlaceResource(Resource):
         """Update a place's information"""
         place_data = api.payload
 
-        existing_place = facade.get_place(place_id)
+        existing_place = facade.get_place(place_id, load="list")
 
         if not existing_place:
             return {"error": "Place not found"}, 404
 
         if (
             not current_user.is_admin
-            and existing_place.owner.id != current_user.id
+            and existing_place.owner_id != current_user.id
         ):
             return {"error": "Unauthorized action"}, 403
 
@@ -224,21 +496,4 @@ class PlaceResource(Resource):
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": updated_place.id,
-            "title": updated_place.title,
-            "description": updated_place.description,
-            "price": updated_place.price,
-            "latitude": updated_place.latitude,
-            "longitude": updated_place.longitude,
-            "owner": {
-                "id": updated_place.owner.id,
-                "first_name": updated_place.owner.first_name,
-                "last_name": updated_place.owner.last_name,
-                "email": updated_place.owner.email,
-            },
-            "amenities": [
-                {"id": amenity.id, "name": amenity.name}
-                for amenity in updated_place.amenities
-            ],
-        }
+        return PLACE(updated_place)
@@ -1,5 +1,16 @@
 from flask_jwt_extended import current_user, jwt_required
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.batch import batch_models, batch_report, batch_too_large
+from app.api.v1.caching import cached_response
+from app.api.v1.conditional import (
+    collection_validators,
+    conditional_response,
+    entity_validators,
+)
+from app.api.v1.pagination import page_limit, page_model, pagination_parser
+from app.api.v1.serializers import REVIEW
+from app.api.v1.streaming import stream_response, wants_stream
+from app.persistence.integrity import DuplicateError
 from app.services import facade
 
 api = Namespace("reviews", description="Review operations")
@@ -29,6 +40,12 @@ review_response_model = api.model(
     ),
 )
 
+review_page_model = page_model(api, "ReviewPage", review_response_model)
+
+review_batch_model, review_batch_report_model = batch_models(
+    api, "Review", review_model
+)
+
 
 @api.route("/reviews")
 class ReviewList(Resource):
@@ -47,53 +64,118 @@ class ReviewList(Resource):
         if not place:
             return {"error": "Place not found"}, 400
 
-        if place.owner.id == current_user.id:
+        if place.owner_id == current_user.id:
             return {"error": "You cannot review your own place."}, 400
 
-        has_reviewed = False
-
-        for review in place.reviews:
-            if review.user.id == current_user.id:
-                has_reviewed = True
-                break
-
-        if has_reviewed:
+        if facade.has_reviewed(current_user.id, place.id):
             return {"error": "You have already reviewed this place."}, 400
 
         review_data["place"] = place
-        review_data["user"] = current_user
+        review_data["user"] = current_user.user
         review_data.pop("place_id")
 
         try:
             new_review = facade.create_review(review_data)
+        except DuplicateError as e:
+            return {"error": str(e)}, 400
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": new_review.id,
-            "text": new_review.text,
-            "rating": new_review.rating,
-            "user_id": new_review.user.id,
-            "place_id": new_review.place.id,
-        }, 201
+        return REVIEW(new_review), 201
 
+    @api.expect(pagination_parser)
     @api.response(
-        200, "List of reviews retrieved successfully", [review_response_model]
+        200, "List of reviews retrieved successfully", review_page_model
     )
+    @api.response(304, "Not modified")
+    @api.response(400, "Invalid cursor")
     def get(self):
-        """Retrieve a list of all reviews"""
-        reviews = facade.get_all_reviews()
+        """Retrieve a page of reviews, or stream them all with stream=1"""
+        args = pagination_parser.parse_args()
+
+        if wants_stream(args):
+            return stream_response(facade.stream_reviews(), REVIEW)
+
+        def page():
+            reviews, next_cursor = facade.get_reviews_page(
+                page_limit(args["limit"]), args["cursor"]
+            )
+            return {"items": REVIEW.many(reviews), "next_cursor": next_cursor}
+
+        try:
+            return conditional_response(
+                collection_validators(facade.get_reviews_stats()),
+                page,
+                check_date=False,
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
+
+
+@api.route("/reviews/batch")
+class ReviewBatch(Resource):
+    @api.expect(review_batch_model)
+    @api.response(
+        200,
+        "Batch processed, see per-item results",
+        review_batch_report_model,
+    )
+    @api.response(400, "Invalid input data")
+    @api.response(401, "Invalid token")
+    @api.response(413, "Too many items in the batch")
+    @jwt_required()
+    def post(self):
+        """Register many reviews in one transaction"""
+        items = api.payload["items"]
 
-        return [
-            {
-                "id": review.id,
-                "text": review.text,
-                "rating": review.rating,
-                "user_id": review.user.id,
-                "place_id": review.place.id,
-            }
-            for review in reviews
-        ]
+        if batch_too_large(items):
+            return {"message": "Too many items in the batch"}, 413
+
+        place_ids = {item["place_id"] for item in items}
+        places = {
+            place.id: place for place in facade.get_places_by_ids(place_ids)
+        }
+        reviewed = facade.get_reviewed_place_ids(current_user.id, place_ids)
+        results = [None] * len(items)
+        pending = []
+
+        for index, item in enumerate(items):
+            place = places.get(item["place_id"])
+
+            if not place:
+                results[index] = (400, "Place not found")
+            elif place.owner_id == current_user.id:
+                results[index] = (400, "You cannot review your own place.")
+            elif place.id in reviewed:
+                results[index] = (
+                    400,
+                    "You have already reviewed this place.",
+                )
+            else:
+                reviewed.add(place.id)
+                pending.append(index)
+
+        user = current_user.user if pending else None
+
+        try:
+            created = facade.create_reviews(
+                [
+                    {
+                        "text": items[index]["text"],
+                        "rating": items[index]["rating"],
+                        "place": places[items[index]["place_id"]],
+                        "user": user,
+                    }
+                    for index in pending
+                ]
+            )
+        except DuplicateError as e:
+            return {"error": str(e)}, 400
+
+        for index, result in zip(pending, created):
+            results[index] = result
+
+        return batch_report(results), 200
 
 
 @api.route("/reviews/<review_id>")
@@ -101,21 +183,18 @@ class ReviewResource(Resource):
     @api.response(
         200, "Review details retrieved successfully", review_response_model
     )
+    @api.response(304, "Not modified")
     @api.response(404, "Review not found")
     def get(self, review_id):
         """Get review details by ID"""
-        review = facade.get_review(review_id)
+        review = facade.get_review(review_id, snapshot=True)
 
         if not review:
             return {"message": "Review not found"}, 404
 
-        return {
-            "id": review.id,
-            "text": review.text,
-            "rating": review.rating,
-            "user_id": review.user.id,
-            "place_id": review.place.id,
-        }
+        return conditional_response(
+            entity_validators(review), lambda: REVIEW(review)
+        )
 
     @api.expect(review_model)
     @api.response(200, "Review updated successfully", review_response_model)
@@ -133,7 +212,7 @@ class ReviewResource(Resource):
         if not review:
             return {"message": "Review not found"}, 404
 
-        if not current_user.is_admin and review.user.id != current_user.id:
+        if not current_user.is_admin and review.user_id != current_user.id:
             return {"message": "Unauthorized action"}, 403
 
         review_data.pop("place_id", None)
@@ -143,13 +222,7 @@ class ReviewResource(Resource):
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": updated_review.id,
-            "text": updated_review.text,
-            "rating": updated_review.rating,
-            "user_id": updated_review.user.id,
-            "place_id": updated_review.place.id,
-        }
+        return REVIEW(updated_review)
 
     @api.response(204, "Review deleted successfully")
     @api.response(401, "Invalid token")
@@ -163,7 +236,7 @@ class ReviewResource(Resource):
         if not review:
             return {"message": "Review not found"}, 404
 
-        if not current_user.is_admin and review.user.id != current_user.id:
+        if not current_user.is_admin and review.user_id != current_user.id:
             return {"message": "Unauthorized action"}, 403
 
         facade.delete_review(review)
@@ -177,23 +250,18 @@ class PlaceReviewList(Resource):
         "List of reviews for the place retrieved successfully",
         [review_response_model],
     )
+    @api.response(304, "Not modified")
     @api.response(404, "Place not found")
+    @cached_response("place:{place_id}")
     def get(self, place_id):
         """Get all reviews for a specific place"""
-        place = facade.get_place(place_id)
+        place = facade.get_place(place_id, load="reviews", snapshot=True)
 
         if not place:
             return {"message": "Place not found"}, 404
 
-        reviews = facade.get_reviews_by_place(place_id)
-
-        return [
-            {
-                "id": review.id,
-                "text": review.text,
-                "rating": review.rating,
-                "user_id": review.user.id,
-                "place_id": review.place.id,
-            }
-            for review in reviews
-        ]
+        return conditional_response(
+            entity_validators(*place.reviews),
+            lambda: REVIEW.many(place.reviews),
+            check_date=False,
+        )
@@ -0,0 +1,80 @@
+from flask import Response, request, stream_with_context
+from flask_restx import inputs, reqparse
+from app.api.v1.serializers import dumps
+
+NDJSON = "application/x-ndjson"
+
+# Items serialized per chunk written to the socket
+CHUNK_SIZE = 500
+
+stream_parser = reqparse.RequestParser()
+stream_parser.add_argument(
+    "stream",
+    type=inputs.boolean,
+    location="args",
+    help="Stream every item as one JSON array instead of a page",
+)
+
+
+def wants_stream(args) -> bool:
+    """True for ?stream=1 or when the client prefers NDJSON.
+
+    args are parsed arguments or the raw request.args, whose stream value
+    is parsed like stream_parser does (an invalid one is no stream).
+    """
+    stream = args.get("stream")
+
+    if isinstance(stream, str):
+        try:
+            stream = inputs.boolean(stream)
+        except ValueError:
+            stream = False
+
+    return bool(stream) or _prefers_ndjson()
+
+
+def _prefers_ndjson() -> bool:
+    accept = request.accept_mimetypes
+    return accept.best_match(["application/json", NDJSON]) == NDJSON
+
+
+def stream_response(objects, serialize) -> Response:
+    """Stream objects as a JSON array, or NDJSON lines if preferred.
+
+    The body is produced while iterating, so memory use stays flat and the
+    first bytes leave before the last rows are read.
+    """
+    ndjson = _prefers_ndjson()
+
+    def chunks():
+        buffer = []
+        first = True
+
+        if not ndjson:
+            yield b"["
+
+        for obj in objects:
+            buffer.append(dumps(serialize(obj)))
+
+            if len(buffer) == CHUNK_SIZE:
+                yield _join(buffer, ndjson, first)
+                buffer = []
+                first = False
+
+        if buffer:
+            yield _join(buffer, ndjson, first)
+
+        if not ndjson:
+            yield b"]"
+
+    return Response(
+        stream_with_context(chunks()),
+        mimetype=NDJSON if ndjson else "application/json",
+    )
+
+
+def _join(buffer, ndjson, first):
+    if ndjson:
+        return b"\n".join(buffer) + b"\n"
+
+    return (b"" if first else b",") + b",".join(buffer)
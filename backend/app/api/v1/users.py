@@ -1,5 +1,9 @@
 from flask_jwt_extended import current_user, jwt_required
 from flask_restx import Namespace, Resource, fields
+from app.api.v1.pagination import page_limit, page_model, pagination_parser
+from app.api.v1.serializers import USER
+from app.api.v1.streaming import stream_response, wants_stream
+from app.persistence.integrity import DuplicateError
 from app.services import facade
 
 api = Namespace("users", description="User operations")
@@ -37,6 +41,8 @@ user_payload_model = api.model(
     strict=True,
 )
 
+user_page_model = page_model(api, "UserPage", user_response_model)
+
 
 @api.route("/")
 class UserList(Resource):
@@ -61,32 +67,34 @@ class UserList(Resource):
 
         try:
             new_user = facade.create_user(user_data)
+        except DuplicateError as e:
+            return {"message": str(e)}, 409
         except ValueError as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": new_user.id,
-            "first_name": new_user.first_name,
-            "last_name": new_user.last_name,
-            "email": new_user.email,
-        }, 201
+        return USER(new_user), 201
 
-    @api.response(
-        200, "List of users retrieved successfully", [base_user_model]
-    )
+    @api.expect(pagination_parser)
+    @api.response(200, "List of users retrieved successfully", user_page_model)
+    @api.response(400, "Invalid cursor")
     def get(self):
-        """Get a list of all users"""
-        users = facade.get_users()
+        """Get a page of users, or stream them all with stream=1"""
+        args = pagination_parser.parse_args()
+
+        if wants_stream(args):
+            return stream_response(facade.stream_users(), USER)
+
+        try:
+            users, next_cursor = facade.get_users_page(
+                page_limit(args["limit"]), args["cursor"]
+            )
+        except ValueError as e:
+            return {"message": str(e)}, 400
 
-        return [
-            {
-                "id": user.id,
-                "first_name": user.first_name,
-                "last_name": user.last_name,
-                "email": user.email,
-            }
-            for user in users
-        ]
+        return {
+            "items": USER.many(users),
+            "next_cursor": next_cursor,
+        }
 
 
 @api.route("/<user_id>")
@@ -98,23 +106,19 @@ class UserResource(Resource):
     def get(self, user_id):
         """Get user details by ID"""
 
-        user = facade.get_user(user_id)
+        user = facade.get_user(user_id, snapshot=True)
 
         if not user:
             return {"message": "User not found"}, 404
 
-        return {
-            "id": user.id,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
-        }, 200
+        return USER(user), 200
 
     @api.expect(user_payload_model)
     @api.response(
         200, "User details updated successfully", user_response_model
     )
     @api.response(400, "Invalid input data")
+    @api.response(409, "Email already registered")
     @api.response(401, "Invalid token")
     @api.response(403, "Unauthorized action")
     @api.response(404, "User not found")
@@ -135,21 +139,21 @@ class UserResource(Resource):
             "first_name": user_data.get("first_name", user.first_name),
             "last_name": user_data.get("last_name", user.last_name),
             "email": user_data.get("email", user.email),
-            "password": user_data.get("password", user.password),
         }
 
+        # Only a new password is hashed; omitting it keeps the current one
+        if user_data.get("password"):
+            data["password"] = user_data["password"]
+
         if not current_user.is_admin:
             data.pop("email", None)
             data.pop("password", None)
 
         try:
             updated_user = facade.update_user(user, data)
+        except DuplicateError as e:
+            return {"message": str(e)}, 409
         except (ValueError, TypeError) as e:
             return {"message": str(e)}, 400
 
-        return {
-            "id": updated_user.id,
-            "first_name": updated_user.first_name,
-            "last_name": updated_user.last_name,
-            "email": updated_user.email,
-        }, 200
+        return USER(updated_user), 200
@@ -0,0 +1,131 @@
+"""In-process caches shared by the service and persistence layers."""
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """Size-bounded LRU mapping whose entries expire after ttl seconds."""
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is not None:
+                value, expires_at = item
+
+                if expires_at > self._timer():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+
+                self._discard(key)
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, self._timer() + self.ttl)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._discard(next(iter(self._data)))
+                self.evictions += 1
+
+    def pop(self, key):
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                return None
+
+            self._discard(key)
+            return item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _discard(self, key):
+        """Remove key; called with the lock held, subclasses may extend."""
+        del self._data[key]
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class TaggedCache(TTLCache):
+    """TTLCache whose entries can be invalidated by tag.
+
+    add() takes the generation read before the value was computed and
+    drops the value if an invalidation ran in between, so a reader racing
+    a writer cannot store what the writer has just invalidated.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        super().__init__(maxsize, ttl, timer)
+        self.generation = 0
+        self._keys_by_tag = {}
+        self._tags_by_key = {}
+
+    def add(self, key, value, tags, generation: int) -> None:
+        """Store value under key unless an invalidation ran since."""
+        with self._lock:
+            if generation != self.generation:
+                return
+
+            if key in self._data:
+                self._discard(key)
+
+            self.set(key, value)
+
+            if key in self._data:
+                self._tags_by_key[key] = tags
+                for tag in tags:
+                    self._keys_by_tag.setdefault(tag, set()).add(key)
+
+    def invalidate(self, tags) -> None:
+        with self._lock:
+            self.generation += 1
+
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._data:
+                        self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            super().clear()
+            self._keys_by_tag.clear()
+            self._tags_by_key.clear()
+
+    def _discard(self, key):
+        super()._discard(key)
+
+        for tag in self._tags_by_key.pop(key, ()):
+            keys = self._keys_by_tag.get(tag)
+
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
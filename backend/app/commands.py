@@ -0,0 +1,245 @@
+import json
+import time
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.persistence import bulk_export
+from app.persistence.bulk_import import FORMATS, KINDS, SourceChangedError
+
+
+@click.command("recompute-ratings")
+@with_appcontext
+def recompute_ratings_command():
+    """Rebuild the rating aggregates of every place from its reviews."""
+    from app.services import facade
+
+    rated = facade.recompute_place_ratings()
+    click.echo(f"Recomputed rating aggregates ({rated} places with reviews)")
+
+
+@click.command("recompute-amenity-bits")
+@with_appcontext
+def recompute_amenity_bits_command():
+    """Assign amenity bits and rebuild the amenity bitset of every place."""
+    from app.services import facade
+
+    assigned = facade.recompute_amenity_bits()
+    click.echo(f"Recomputed amenity bitsets ({assigned} amenities with a bit)")
+
+
+@click.command("rebuild-search-index")
+@with_appcontext
+def rebuild_search_index_command():
+    """Create the place full-text index and fill it from the database."""
+    from app.services import facade
+
+    indexed = facade.rebuild_search_index()
+    click.echo(f"Rebuilt the place search index ({indexed} places)")
+
+
+@click.command("sync-replica")
+@click.option(
+    "--every",
+    type=float,
+    default=None,
+    help="Copy again every N seconds until interrupted.",
+)
+@with_appcontext
+def sync_replica_command(every):
+    """Copy the SQLite primary database to the SQLite replica."""
+    from app.persistence.routing import (
+        copy_database,
+        is_sqlite_file,
+        sqlite_path,
+    )
+
+    primary = current_app.config["SQLALCHEMY_DATABASE_URI"]
+    replica = current_app.config["SQLALCHEMY_REPLICA_URI"]
+
+    if not (is_sqlite_file(primary) and is_sqlite_file(replica)):
+        raise click.UsageError(
+            "sync-replica needs SQLite file primary and replica databases"
+        )
+
+    while True:
+        copy_database(
+            sqlite_path(current_app, primary),
+            sqlite_path(current_app, replica),
+        )
+        click.echo(f"Replica synced at {time.strftime('%H:%M:%S')}")
+
+        if every is None:
+            return
+
+        time.sleep(every)
+
+
+@click.command("import")
+@click.argument("kind", type=click.Choice(KINDS))
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(FORMATS),
+    default=None,
+    help="File format, by default from the extension (.csv, .jsonl, .gz).",
+)
+@click.option(
+    "--chunk-size",
+    type=click.IntRange(min=1),
+    default=5000,
+    show_default=True,
+    help="Rows written per transaction.",
+)
+@click.option(
+    "--workers",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Password hashing processes, one per CPU by default; 0 hashes "
+    "in this process.",
+)
+@click.option(
+    "--restart",
+    is_flag=True,
+    help="Start from the first row, ignoring the checkpoint of a previous "
+    "run of the same file.",
+)
+@click.option(
+    "--errors",
+    "errors_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append the rejected rows to this JSONL file instead of printing "
+    "them.",
+)
+@with_appcontext
+def import_command(kind, path, fmt, chunk_size, workers, restart, errors_path):
+    """Bulk import KIND rows from a CSV or JSONL file.
+
+    Import users and amenities first, then places, then reviews. An
+    interrupted import resumes after its last committed chunk when run
+    again.
+    """
+    from app.services import facade
+
+    errors_file = open(errors_path, "a") if errors_path else None
+
+    def report(rows, errors):
+        for number, message in errors:
+            if errors_file is not None:
+                errors_file.write(
+                    json.dumps({"row": number, "message": message}) + "\n"
+                )
+            else:
+                click.echo(f"row {number}: {message}", err=True)
+
+        click.echo(f"{rows} rows processed")
+
+    try:
+        counts = facade.import_file(
+            kind,
+            path,
+            fmt=fmt,
+            chunk_size=chunk_size,
+            hash_workers=workers,
+            restart=restart,
+            on_chunk=report,
+        )
+    except SourceChangedError as e:
+        raise click.UsageError(f"{e} (--restart)")
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    finally:
+        if errors_file is not None:
+            errors_file.close()
+
+    click.echo(
+        f"Imported {counts['inserted']} {kind}, rejected "
+        f"{counts['rejected']}, skipped {counts['skipped']} rows already "
+        "imported"
+    )
+
+
+@click.command("export")
+@click.argument("directory", type=click.Path(file_okay=False))
+@click.option(
+    "--table",
+    "tables",
+    type=click.Choice(tuple(bulk_export.TABLES)),
+    multiple=True,
+    help="Table to export (repeatable), all of them by default.",
+)
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(bulk_export.FORMATS),
+    default="jsonl",
+    show_default=True,
+    help="Gzipped JSONL or CSV, or Parquet (requires pyarrow).",
+)
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Tables exported in parallel, one process each.",
+)
+@click.option(
+    "--incremental",
+    is_flag=True,
+    help="Only export the rows updated since the previous export into "
+    "DIRECTORY.",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only export the rows updated after this time.",
+)
+@click.option(
+    "--rows-per-file",
+    type=click.IntRange(min=1),
+    default=1_000_000,
+    show_default=True,
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=10_000,
+    show_default=True,
+    help="Rows fetched from the database at a time.",
+)
+@with_appcontext
+def export_command(directory, tables, **options):
+    """Export the tables into DIRECTORY as compressed files.
+
+    Memory use does not grow with the table sizes. Each run records its
+    watermark in DIRECTORY/manifest.json for --incremental, which reads
+    from the primary and re-exports a few minutes before it: drop the
+    duplicates on (id, version). Deleted rows are not exported.
+    """
+    from app.services import facade
+
+    options["tables"] = tables or tuple(bulk_export.TABLES)
+
+    try:
+        results = facade.export_tables(directory, **options)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    for table, result in results.items():
+        click.echo(
+            f"Exported {result['rows']} {table} in "
+            f"{len(result['files'])} files"
+        )
+
+
+def register_commands(app):
+    app.cli.add_command(recompute_ratings_command)
+    app.cli.add_command(recompute_amenity_bits_command)
+    app.cli.add_command(rebuild_search_index_command)
+    app.cli.add_command(sync_replica_command)
+    app.cli.add_command(import_command)
+    app.cli.add_command(export_command)
@@ -0,0 +1,240 @@
+"""Per-request SQL statement counts and timings, and sampled profiles.
+
+Enabled by REQUEST_INSTRUMENTATION. Cursor events of the writer and
+reader engines count the statements a request runs and the time spent in
+them; every response then carries
+
+    Server-Timing: db;dur=3.21;desc="4 queries", app;dur=11.52
+
+and a JSON line is logged to the "app.access" logger:
+
+    {"method": "GET", "path": "/api/v1/places/", "endpoint":
+     "places_place_list", "status": 200, "duration_ms": 11.52,
+     "db_queries": 4, "db_ms": 3.21}
+
+Streamed responses (stream=1) have sent their headers before their body
+runs its queries: they carry no Server-Timing, and their line is logged
+when the body is closed, with the statements it ran counted.
+
+The endpoints app.aio serves on the event loop are timed and logged
+the same way, with the statements of its asyncio engines, but never
+profiled.
+
+With PROFILE_SAMPLE_RATE = N, one request in N (per process) is also
+profiled, with cProfile (.prof files, for snakeviz or flameprof) or
+pyinstrument (.html), into PROFILE_DIR.
+"""
+import cProfile
+import contextvars
+import itertools
+import json
+import logging
+import os
+import time
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+try:
+    import pyinstrument
+except ImportError:  # pragma: no cover - optional dependency
+    pyinstrument = None
+
+PROFILERS = ("cprofile", "pyinstrument")
+
+access_log = logging.getLogger("app.access")
+
+# WSGI environ key of the request's stats: a streamed body runs its
+# queries in a new app context, after g is gone
+STATS_KEY = "app.request_stats"
+
+# Stats of the request app.aio is serving in the current task
+async_request_stats = contextvars.ContextVar(
+    "async_request_stats", default=None
+)
+
+
+class RequestStats:
+    __slots__ = ("started", "queries", "db_seconds", "profiler", "streamed")
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.profiler = None
+        self.streamed = False
+
+
+def request_stats() -> RequestStats | None:
+    """Stats of the current request, None outside instrumented ones."""
+    if not has_request_context():
+        return async_request_stats.get()
+
+    return request.environ.get(STATS_KEY)
+
+
+def _before_cursor_execute(conn, cursor, statement, params, context, many):
+    # On the statement's context, dropped with it if the statement fails
+    context._query_start_time = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, params, context, many):
+    stats = request_stats()
+
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += time.perf_counter() - context._query_start_time
+
+
+def instrument_engine(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _start_profiler(kind: str):
+    if kind == "pyinstrument":
+        profiler = pyinstrument.Profiler(async_mode="disabled")
+        profiler.start()
+        return profiler
+
+    profiler = cProfile.Profile()
+
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another thread is being profiled (Python 3.12+ allows one)
+        return None
+
+    return profiler
+
+
+def _stop_profiler(profiler) -> None:
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _save_profile(profiler, directory: str, method: str, endpoint) -> None:
+    _stop_profiler(profiler)
+    path = os.path.join(
+        directory,
+        f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{time.time_ns()}"
+        f"-{method}-{endpoint or 'unmatched'}",
+    )
+
+    if isinstance(profiler, cProfile.Profile):
+        profiler.dump_stats(f"{path}.prof")
+        return
+
+    with open(f"{path}.html", "w", encoding="utf-8") as file:
+        file.write(profiler.output_html())
+
+
+def server_timing(stats: RequestStats, seconds: float) -> str:
+    return (
+        f'db;dur={stats.db_seconds * 1000:.2f};desc="{stats.queries} '
+        f'queries", app;dur={seconds * 1000:.2f}'
+    )
+
+
+def report(stats: RequestStats, line: dict) -> float:
+    """Log line with the stats; returns the request's seconds."""
+    seconds = time.perf_counter() - stats.started
+    line["duration_ms"] = round(seconds * 1000, 2)
+    line["db_queries"] = stats.queries
+    line["db_ms"] = round(stats.db_seconds * 1000, 2)
+    access_log.info(json.dumps(line))
+    return seconds
+
+
+def init_app(app) -> None:
+    """Instrument the engines and requests; after routing.init_app."""
+    from app import db
+
+    if not app.config["REQUEST_INSTRUMENTATION"]:
+        return
+
+    profiler_kind = app.config["PROFILER"]
+    sample_rate = app.config["PROFILE_SAMPLE_RATE"]
+    directory = app.config["PROFILE_DIR"]
+
+    if profiler_kind not in PROFILERS:
+        raise ValueError(f"Unknown PROFILER '{profiler_kind}'")
+
+    if sample_rate and profiler_kind == "pyinstrument" and not pyinstrument:
+        raise ValueError("PROFILER 'pyinstrument' requires pyinstrument")
+
+    if sample_rate:
+        directory = directory or os.path.join(app.instance_path, "profiles")
+        os.makedirs(directory, exist_ok=True)
+
+    with app.app_context():
+        engines = list(db.engines.values())
+
+    reader = app.extensions.get("sqlalchemy_reader")
+
+    for engine in engines + ([reader] if reader is not None else []):
+        instrument_engine(engine)
+
+    # Printed by the handler Flask gives the "app" logger unless logging
+    # is configured otherwise
+    if access_log.level == logging.NOTSET:
+        access_log.setLevel(logging.INFO)
+
+    counter = itertools.count(1)
+
+    @app.before_request
+    def _start_request():
+        stats = request.environ[STATS_KEY] = RequestStats()
+
+        if sample_rate and next(counter) % sample_rate == 0:
+            stats.profiler = _start_profiler(profiler_kind)
+
+    def _finish(stats, line) -> float:
+        if stats.profiler is not None:
+            _save_profile(
+                stats.profiler, directory, line["method"], line["endpoint"]
+            )
+
+        return report(stats, line)
+
+    @app.after_request
+    def _report_request(response):
+        stats = request_stats()
+
+        if stats is None:
+            return response
+
+        line = {
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": response.status_code,
+        }
+
+        if response.is_streamed:
+            # Left in the environ for the queries of the body
+            stats.streamed = True
+            response.call_on_close(lambda: _finish(stats, line))
+            return response
+
+        del request.environ[STATS_KEY]
+        seconds = _finish(stats, line)
+        response.headers.add("Server-Timing", server_timing(stats, seconds))
+        return response
+
+    @app.teardown_request
+    def _discard_request(_error):
+        # after_request is skipped when the view raised. Streamed stats
+        # are finished when the body closes, whereas teardown also runs
+        # when the view returns
+        stats = request_stats()
+
+        if stats is None or stats.streamed:
+            return
+
+        del request.environ[STATS_KEY]
+
+        if stats.profiler is not None:
+            _stop_profiler(stats.profiler)
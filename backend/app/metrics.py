@@ -0,0 +1,478 @@
+"""Prometheus metrics, served at /metrics in the text exposition format.
+
+Recorded in each process:
+
+- hbnb_http_requests_total, hbnb_http_request_duration_seconds and
+  hbnb_http_requests_in_flight, by namespace and route (the URL rule),
+  whether Flask or app.aio serves the request;
+- hbnb_db_pool_checkout_seconds, by engine (writer or reader);
+- hbnb_bcrypt_seconds, by operation (hash or verify), pool wait included;
+- hbnb_cache_hits_total and hbnb_cache_misses_total of the principal,
+  entity and response caches, and their hbnb_cache_hit_ratio.
+
+/metrics only shows the process serving it unless METRICS_DIR is set.
+Then every process writes its samples to METRICS_DIR/<pid>.json each
+METRICS_FLUSH_SECONDS, at exit and when it serves /metrics, which adds up
+the files of all of them: the counters and histograms of exited workers
+are kept, their gauges dropped. Empty METRICS_DIR when the server starts.
+"""
+import atexit
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, has_app_context, request
+
+REQUEST_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+CHECKOUT_BUCKETS = (
+    0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0
+)
+BCRYPT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Name -> (type, help, histogram buckets)
+METRICS = {
+    "hbnb_http_requests_total": ("counter", "HTTP requests handled.", None),
+    "hbnb_http_request_duration_seconds": (
+        "histogram",
+        "HTTP request latency.",
+        REQUEST_BUCKETS,
+    ),
+    "hbnb_http_requests_in_flight": (
+        "gauge",
+        "HTTP requests being handled.",
+        None,
+    ),
+    "hbnb_db_pool_checkout_seconds": (
+        "histogram",
+        "Time to get a connection from the pool.",
+        CHECKOUT_BUCKETS,
+    ),
+    "hbnb_bcrypt_seconds": (
+        "histogram",
+        "Password hashing and verification time.",
+        BCRYPT_BUCKETS,
+    ),
+    "hbnb_cache_hits_total": ("counter", "Cache lookups that hit.", None),
+    "hbnb_cache_misses_total": ("counter", "Cache lookups that missed.", None),
+    "hbnb_cache_hit_ratio": ("gauge", "Cache hits over lookups.", None),
+}
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+CACHES = {
+    "principal": "principal_cache",
+    "entity": "entity_cache",
+    "response": "response_cache",
+}
+
+
+class Registry:
+    """Samples of one process, keyed by (name, labels).
+
+    labels is a tuple of (name, value) pairs. A histogram holds a count
+    per bucket, one for +Inf, then the sum of the observations.
+    """
+
+    def __init__(self) -> None:
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        # Callables returning (name, labels, value) counters, read when
+        # the samples are taken
+        self.collectors = []
+        # Collected values inherited from the parent of a forked worker
+        self._baseline = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._flusher_pid = None
+
+    def inc(self, name: str, labels: tuple, amount: float = 1) -> None:
+        key = (name, labels)
+
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def add(self, name: str, labels: tuple, amount: float) -> None:
+        key = (name, labels)
+
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + amount
+
+    def observe(self, name: str, labels: tuple, value: float) -> None:
+        buckets = METRICS[name][2]
+        key = (name, labels)
+
+        with self._lock:
+            counts = self.histograms.get(key)
+
+            if counts is None:
+                counts = self.histograms[key] = [0] * (len(buckets) + 2)
+
+            counts[bisect_left(buckets, value)] += 1
+            counts[-1] += value
+
+    def snapshot(self) -> dict:
+        """The samples as JSON-compatible lists."""
+        with self._lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            histograms = {
+                key: list(counts) for key, counts in self.histograms.items()
+            }
+
+        for name, labels, value in self._collect():
+            counters[(name, labels)] = value - self._baseline.get(
+                (name, labels), 0
+            )
+
+        return {
+            kind: [[name, labels, value] for (name, labels), value in items]
+            for kind, items in (
+                ("counters", counters.items()),
+                ("gauges", gauges.items()),
+                ("histograms", histograms.items()),
+            )
+        }
+
+    def _collect(self):
+        for collect in self.collectors:
+            yield from collect()
+
+    def flush(self, directory: str) -> None:
+        path = os.path.join(directory, f"{os.getpid()}.json")
+
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(self.snapshot(), file)
+
+        os.replace(f"{path}.tmp", path)
+
+    def start_flusher(self, directory: str, seconds: float) -> None:
+        """Flush every seconds from a thread of this process.
+
+        Called on each request, as pre-forked workers do not inherit the
+        threads of the process that created the application. A worker
+        drops the samples it inherited, which its parent reports.
+        """
+        pid = os.getpid()
+
+        if self._flusher_pid == pid:
+            return
+
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+
+            self._flusher_pid = pid
+
+            if pid != self._pid:
+                self._pid = pid
+                self.counters.clear()
+                self.gauges.clear()
+                self.histograms.clear()
+                self._baseline = {
+                    (name, labels): value
+                    for name, labels, value in self._collect()
+                }
+
+        def flush_forever():
+            while True:
+                time.sleep(seconds)
+                self.flush(directory)
+
+        threading.Thread(
+            target=flush_forever, name="metrics-flush", daemon=True
+        ).start()
+        atexit.register(self.flush, directory)
+
+
+def registry() -> Registry | None:
+    """The application's metrics, or None if disabled."""
+    if not has_app_context():
+        return None
+
+    return current_app.extensions.get("metrics")
+
+
+def observe(name: str, value: float, **labels) -> None:
+    metrics = registry()
+
+    if metrics is not None:
+        metrics.observe(name, tuple(sorted(labels.items())), value)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the block in the histogram name."""
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+
+    return True
+
+
+def _snapshots(metrics: Registry, directory: str | None):
+    """(snapshot, process alive) of every process."""
+    if directory is None:
+        yield metrics.snapshot(), True
+        return
+
+    metrics.flush(directory)
+
+    for entry in os.scandir(directory):
+        pid, _, extension = entry.name.partition(".")
+
+        if extension != "json" or not pid.isdigit():
+            continue
+
+        try:
+            with open(entry.path, encoding="utf-8") as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+
+        yield snapshot, _alive(int(pid))
+
+
+def collect(metrics: Registry, directory: str | None = None) -> dict:
+    """Samples of all processes, added up, keyed by (name, labels)."""
+    merged = {"counters": {}, "gauges": {}, "histograms": {}}
+
+    for snapshot, alive in _snapshots(metrics, directory):
+        for kind, samples in merged.items():
+            if kind == "gauges" and not alive:
+                continue
+
+            for name, labels, value in snapshot[kind]:
+                key = (name, tuple(map(tuple, labels)))
+                total = samples.get(key)
+
+                if total is None:
+                    samples[key] = value
+                elif kind == "histograms":
+                    samples[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    samples[key] = total + value
+
+    counters, gauges = merged["counters"], merged["gauges"]
+
+    for cache in CACHES:
+        labels = (("cache", cache),)
+        hits = counters.get(("hbnb_cache_hits_total", labels), 0)
+        misses = counters.get(("hbnb_cache_misses_total", labels), 0)
+
+        if hits + misses:
+            gauges[("hbnb_cache_hit_ratio", labels)] = hits / (hits + misses)
+
+    return merged
+
+
+def _number(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _labels(labels) -> str:
+    if not labels:
+        return ""
+
+    pairs = (
+        '{}="{}"'.format(
+            name,
+            str(value)
+            .replace("\\", "\\\\")
+            .replace('"', '\\"')
+            .replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + ",".join(pairs) + "}"
+
+
+def render(samples: dict) -> str:
+    """collect() samples in the Prometheus text format."""
+    lines = []
+
+    for name, (kind, description, buckets) in METRICS.items():
+        values = samples[f"{kind}s"]
+        keys = sorted(key for key in values if key[0] == name)
+
+        if not keys:
+            continue
+
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {kind}")
+
+        for key in keys:
+            labels, value = key[1], values[key]
+
+            if kind != "histogram":
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+                continue
+
+            cumulative = 0
+
+            for bound, count in zip(buckets + (math.inf,), value):
+                cumulative += count
+                le = labels + (("le", _number(bound)),)
+                lines.append(f"{name}_bucket{_labels(le)} {cumulative}")
+
+            lines.append(f"{name}_sum{_labels(labels)} {_number(value[-1])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+
+    return "\n".join(lines) + "\n"
+
+
+def start_request(app, endpoint: str | None, rule: str | None):
+    """Count a request to endpoint in flight; returns its sample.
+
+    The sample, None when not recorded, is passed to record_request once
+    the status is known and to end_request when the request is done.
+    """
+    metrics = app.extensions.get("metrics")
+
+    if metrics is None or endpoint == "metrics":
+        return None
+
+    directory = app.config["METRICS_DIR"]
+
+    if directory:
+        metrics.start_flusher(directory, app.config["METRICS_FLUSH_SECONDS"])
+
+    namespaces = app.extensions["metrics_namespaces"]
+    labels = (
+        ("namespace", namespaces.get(endpoint, "other")),
+        ("route", rule or "unmatched"),
+    )
+    metrics.add("hbnb_http_requests_in_flight", labels, 1)
+    return metrics, labels, time.perf_counter()
+
+
+def record_request(sample, method: str, status: int) -> None:
+    if sample is None:
+        return
+
+    metrics, labels, started = sample
+    labels += (("method", method),)
+    metrics.observe(
+        "hbnb_http_request_duration_seconds",
+        labels,
+        time.perf_counter() - started,
+    )
+    metrics.inc(
+        "hbnb_http_requests_total", labels + (("status", str(status)),)
+    )
+
+
+def end_request(sample) -> None:
+    if sample is not None:
+        metrics, labels, _ = sample
+        metrics.add("hbnb_http_requests_in_flight", labels, -1)
+
+
+def instrument_engine(metrics: Registry, engine, name: str) -> None:
+    """Time the pool checkouts of engine.
+
+    The pool has no event before a checkout, so this wraps
+    Engine.raw_connection, through which every Connection gets its DBAPI
+    connection.
+    """
+    raw_connection = engine.raw_connection
+    labels = (("engine", name),)
+
+    def timed_raw_connection():
+        started = time.perf_counter()
+
+        try:
+            return raw_connection()
+        finally:
+            metrics.observe(
+                "hbnb_db_pool_checkout_seconds",
+                labels,
+                time.perf_counter() - started,
+            )
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _cache_samples(app):
+    for cache, extension in CACHES.items():
+        store = app.extensions.get(extension)
+
+        if store is not None:
+            labels = (("cache", cache),)
+            yield "hbnb_cache_hits_total", labels, store.hits
+            yield "hbnb_cache_misses_total", labels, store.misses
+
+
+def init_app(app, api) -> None:
+    """Record the metrics and add /metrics; after the namespaces."""
+    from app import db
+
+    if not app.config["METRICS_ENABLED"]:
+        return
+
+    directory = app.config["METRICS_DIR"]
+    metrics = app.extensions["metrics"] = Registry()
+    metrics.collectors.append(lambda: _cache_samples(app))
+    # Endpoint -> namespace, for start_request
+    app.extensions["metrics_namespaces"] = {
+        route.resource.endpoint: namespace.name
+        for namespace in api.namespaces
+        for route in namespace.resources
+    }
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    with app.app_context():
+        instrument_engine(metrics, db.engine, "writer")
+
+    if app.extensions.get("sqlalchemy_reader") is not None:
+        instrument_engine(
+            metrics, app.extensions["sqlalchemy_reader"], "reader"
+        )
+
+    @app.before_request
+    def _start_request():
+        rule = request.url_rule
+        g.metrics_request = start_request(
+            app, request.endpoint, rule.rule if rule is not None else None
+        )
+
+    @app.after_request
+    def _record_request(response):
+        if "metrics_request" in g:
+            record_request(
+                g.metrics_request, request.method, response.status_code
+            )
+
+        return response
+
+    @app.teardown_request
+    def _end_request(_error):
+        end_request(g.pop("metrics_request", None))
+
+    def metrics_view():
+        return Response(
+            render(collect(metrics, directory)), content_type=CONTENT_TYPE
+        )
+
+    app.add_url_rule("/metrics", "metrics", metrics_view)
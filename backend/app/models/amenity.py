@@ -6,7 +6,10 @@ from app.models.place import Place
 
 
 class Amenity(BaseModel, db.Model):
-    name = db.Column(db.String(50), nullable=False)
+    name = db.Column(db.String(50), nullable=False, unique=True)
+    # Position in Place.amenity_bits, assigned on insert; None once the
+    # bitset is full, see app/persistence/amenity_bits.py
+    bit = db.Column(db.Integer, nullable=True, unique=True)
 
     def __init__(self, name) -> None:
         super().__init__()
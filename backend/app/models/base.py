@@ -1,22 +1,36 @@
 from app import db
+from app.persistence.unit_of_work import commit
 import uuid
 from datetime import datetime
+from sqlalchemy import event, inspect
 
 
 class BaseModel:
     id = db.Column(
         db.String(36), primary_key=True, default=lambda: str(uuid.uuid4())
     )
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    # Indexed so max(updated_at), the collection validator, is one probe
+    updated_at = db.Column(
+        db.DateTime,
+        nullable=False,
+        default=datetime.now,
+        onupdate=datetime.now,
+        index=True,
+    )
+    # Incremented by every UPDATE of the row, see _bump_version
+    version = db.Column(db.Integer, nullable=False, default=1)
 
     def __init__(self):
         self.id = str(uuid.uuid4())
         self.created_at = datetime.now()
         self.updated_at = datetime.now()
+        self.version = 1
 
     def save(self):
         """Update the updated_at timestamp whenever the object is modified"""
         self.updated_at = datetime.now()
-        db.session.commit()
+        commit()
 
     def update(self, data):
         """Update the attributes of the object based on the provided dictionary"""
@@ -24,3 +38,25 @@ class BaseModel:
             if hasattr(self, key):
                 setattr(self, key, value)
         self.save()  # Update the updated_at timestamp
+
+
+@event.listens_for(BaseModel, "before_update", propagate=True)
+def _bump_version(mapper, connection, target):
+    """Increment the version in the UPDATE itself, so it is monotonic.
+
+    Only column and many-to-many changes count: an object whose only
+    change is the other side of a one-to-many (a user gaining a place)
+    keeps its version and is not written.
+    """
+    state = inspect(target)
+    changed = any(
+        state.attrs[attr.key].history.has_changes()
+        for attr in mapper.column_attrs
+    ) or any(
+        state.attrs[rel.key].history.has_changes()
+        for rel in mapper.relationships
+        if rel.secondary is not None
+    )
+
+    if changed:
+        target.version = mapper.class_.version + 1
@@ -2,6 +2,7 @@ from typing import TYPE_CHECKING
 from app.models.base import BaseModel
 from sqlalchemy.orm import validates
 from app import db
+from app.persistence.geo import GEOHASH_PRECISION, encode_geohash
 
 if TYPE_CHECKING == True:
     from app.models.user import User
@@ -10,12 +11,32 @@ if TYPE_CHECKING == True:
 
 
 class Place(BaseModel, db.Model):
+    # Back the filters and keyset orderings of PlaceRepository.search;
+    # ix_place_owner_id_price also serves every lookup by owner_id
+    __table_args__ = (
+        db.Index("ix_place_price_id", "price", "id"),
+        db.Index("ix_place_owner_id_price", "owner_id", "price"),
+        db.Index("ix_place_created_at_id", "created_at", "id"),
+        db.Index("ix_place_geohash", "geohash"),
+        db.Index("ix_place_rating_avg_id", "rating_avg", "id"),
+    )
+
     #tables for baseadata
     title = db.Column(db.String(50), nullable=False)
     description = db.Column(db.String(500), nullable=True)
     price = db.Column(db.Float, nullable=False)
     latitude = db.Column(db.Float, nullable=False)
     longitude = db.Column(db.Float, nullable=False)
+    # Kept in sync by the latitude/longitude validators
+    geohash = db.Column(db.String(GEOHASH_PRECISION), nullable=True)
+
+    # Rating aggregates, maintained by the facade's review operations
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_avg = db.Column(db.Float, nullable=False, default=0.0)
+
+    # One bit per amenity (Amenity.bit), see app/persistence/amenity_bits.py
+    amenity_bits = db.Column(db.Integer, nullable=False, default=0)
 
     #Foreign Union 
     owner_id = db.Column(
@@ -37,6 +58,10 @@ class Place(BaseModel, db.Model):
         self.latitude: float = latitude
         self.longitude: float = longitude
         self.owner: User = owner
+        self.review_count: int = 0
+        self.rating_sum: int = 0
+        self.rating_avg: float = 0.0
+        self.amenity_bits: int = 0
         self.reviews: list[Review] = []
         self.amenities: list[Amenity] = []
 
@@ -94,6 +119,8 @@ class Place(BaseModel, db.Model):
         if latitude < -90 or latitude > 90:
             raise ValueError("latitude must be between -90 and 90")
 
+        self._sync_geohash(latitude, self.longitude)
+
         return latitude
 
     @validates("longitude")
@@ -105,8 +132,15 @@ class Place(BaseModel, db.Model):
         if longitude < -180 or longitude > 180:
             raise ValueError("longitude must be between -180 and 180")
 
+        self._sync_geohash(self.latitude, longitude)
+
         return longitude
 
+    def _sync_geohash(self, latitude, longitude):
+        """Recompute the geohash once both coordinates are known."""
+        if latitude is not None and longitude is not None:
+            self.geohash = encode_geohash(latitude, longitude)
+
     def add_review(self, review):
         """Add a review to the place."""
         from app.models.review import Review
@@ -9,6 +9,15 @@ if TYPE_CHECKING:
 
 
 class Review(BaseModel, db.Model):
+    # One review per user and place; the constraint's index also serves
+    # lookups by place_id
+    __table_args__ = (
+        db.UniqueConstraint(
+            "place_id", "user_id", name="uq_review_place_id_user_id"
+        ),
+        db.Index("ix_review_user_id", "user_id"),
+    )
+
     text = db.Column(db.String(500), nullable=False)
     rating = db.Column(db.Integer, nullable=False)
 
@@ -1,5 +1,6 @@
-from app import bcrypt, db
+from app import db
 from app.models.base import BaseModel
+from app.passwords import PasswordHash, check_password, hash_password
 from sqlalchemy.orm import validates
 
 
@@ -63,12 +64,15 @@ class User(BaseModel, db.Model):
 
     @validates("password")
     def validate_password(self, key, password: str):
-        """Hashes the password before storing it."""
+        """Hashes the password before storing it, unless a PasswordHash."""
+        if isinstance(password, PasswordHash):
+            return str(password)
+
         if not isinstance(password, str):
             raise ValueError("Password must be a string")
 
-        return bcrypt.generate_password_hash(password).decode("utf-8")
+        return hash_password(password)
 
     def verify_password(self, password):
         """Verifies if the provided password matches the hashed password."""
-        return bcrypt.check_password_hash(self.password, password)
+        return check_password(self.password, password)
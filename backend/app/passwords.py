@@ -0,0 +1,80 @@
+"""Password hashing pipeline.
+
+bcrypt is deliberately slow, so this module lets trusted callers pass an
+existing hash as a PasswordHash, and can run hashing and verification in
+a bounded thread pool (BCRYPT_POOL_SIZE) so that a burst of logins cannot occupy
+every request thread with bcrypt work at once.
+"""
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from app import bcrypt, metrics
+
+BCRYPT_HASH = re.compile(r"^\$2[abxy]\$(\d{2})\$[./A-Za-z0-9]{53}$")
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(func, *args):
+    """Run func in the bcrypt pool, or inline when the pool is disabled."""
+    global _executor
+
+    size = current_app.config.get("BCRYPT_POOL_SIZE")
+
+    if not size:
+        return func(*args)
+
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=size, thread_name_prefix="bcrypt"
+                )
+
+    return _executor.submit(func, *args).result()
+
+
+def is_password_hash(value: str) -> bool:
+    return BCRYPT_HASH.match(value) is not None
+
+
+class PasswordHash(str):
+    """A bcrypt hash that User stores as is, instead of hashing it.
+
+    Only for trusted callers (seeding, benchmarks): anything read from a
+    request is a plain str and is always hashed.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, value: str):
+        if not is_password_hash(value):
+            raise ValueError("Invalid password hash")
+
+        return super().__new__(cls, value)
+
+
+def hash_password(password: str) -> str:
+    """Hash password with the configured BCRYPT_LOG_ROUNDS."""
+    rounds = current_app.config.get("BCRYPT_LOG_ROUNDS", 12)
+
+    with metrics.timer("hbnb_bcrypt_seconds", operation="hash"):
+        pw_hash = _run(bcrypt.generate_password_hash, password, rounds)
+
+    return pw_hash.decode("utf-8")
+
+
+def check_password(pw_hash: str, password: str) -> bool:
+    with metrics.timer("hbnb_bcrypt_seconds", operation="verify"):
+        return _run(bcrypt.check_password_hash, pw_hash, password)
+
+
+def needs_rehash(pw_hash: str) -> bool:
+    """True when pw_hash was made with a different cost than configured."""
+    match = BCRYPT_HASH.match(pw_hash)
+    rounds = current_app.config.get("BCRYPT_LOG_ROUNDS", 12)
+    return match is not None and int(match.group(1)) != rounds
@@ -0,0 +1,151 @@
+"""Per-place amenity bitsets for "has all of these amenities" filters.
+
+The first MAX_BITS amenities each own a bit position (Amenity.bit) and
+every place stores the OR of its amenities' bits in Place.amenity_bits.
+Requiring several amenities is then a single `amenity_bits & mask = mask`
+test on the place row instead of one place_amenity probe per amenity,
+and amenity facet counts are bit sums over the same column.
+
+Bits are assigned, and the bitsets of places whose amenities changed are
+recomputed, before each flush, so add_amenity, list assignment and
+removals all stay in sync. Amenities created once every bit is taken
+have none and are still matched through place_amenity. `flask
+recompute-amenity-bits` rebuilds both columns from place_amenity, e.g.
+after rows were written around the ORM. The project has no migrations:
+a database created before these columns (or the geohash, rating and
+version ones) has to be recreated from the models.
+"""
+from sqlalchemy import (
+    event,
+    false,
+    func,
+    inspect,
+    literal,
+    select,
+    text,
+    update,
+)
+from sqlalchemy.orm import Session
+
+from app.models.amenity import Amenity, PlaceAmenity
+from app.models.place import Place
+
+# SQLite integers are signed 64-bit, the sign bit stays unused
+MAX_BITS = 63
+
+
+def bit_mask(bits) -> int:
+    """Bitset with the given bit positions set (None is skipped)."""
+    mask = 0
+
+    for bit in bits:
+        if bit is not None:
+            mask |= 1 << bit
+
+    return mask
+
+
+def amenity_mask(amenities) -> int:
+    return bit_mask(amenity.bit for amenity in amenities)
+
+
+def has_bits(column, mask: int):
+    """Clause true when every bit of mask is set in column."""
+    return column.op("&")(mask) == mask
+
+
+def bit_count(column, bit: int):
+    """Number of rows with bit set in column."""
+    return func.coalesce(func.sum(column.op(">>")(bit).op("&")(1)), 0)
+
+
+def _lock_bits(session) -> None:
+    """Hold, until the transaction ends, a lock other allocations wait for.
+
+    Otherwise two transactions read the same highest bit. SQLite has one
+    writer at a time, which any write statement, even one matching no
+    row, waits to become.
+    """
+    if session.get_bind(Amenity).dialect.name == "postgresql":
+        session.execute(text("LOCK TABLE amenity IN SHARE ROW EXCLUSIVE MODE"))
+        return
+
+    table = Amenity.__table__
+    session.execute(update(table).where(false()).values(bit=table.c.bit))
+
+
+def _next_bit(session) -> int:
+    with session.no_autoflush:
+        _lock_bits(session)
+        highest = session.execute(select(func.max(Amenity.bit))).scalar()
+
+    return 0 if highest is None else highest + 1
+
+
+def next_bits(session, count: int) -> list[int | None]:
+    """Bits for count new amenities, None once every bit is taken."""
+    bit = _next_bit(session)
+
+    return [
+        bit + offset if bit + offset < MAX_BITS else None
+        for offset in range(count)
+    ]
+
+
+def recompute(session) -> int:
+    """Assign missing bits and rebuild every place's bitset.
+
+    Returns the number of amenities that have a bit. The caller commits.
+    """
+    bit = _next_bit(session)
+    unassigned = session.scalars(
+        select(Amenity.id)
+        .where(Amenity.bit.is_(None))
+        .order_by(Amenity.created_at, Amenity.id)
+        .limit(max(0, MAX_BITS - bit))
+    ).all()
+
+    if unassigned:
+        session.execute(
+            update(Amenity),
+            [
+                {"id": amenity_id, "bit": bit + offset}
+                for offset, amenity_id in enumerate(unassigned)
+            ],
+        )
+
+    # Distinct powers of two: their sum is their OR
+    place_bits = (
+        select(func.coalesce(func.sum(literal(1).op("<<")(Amenity.bit)), 0))
+        .join(PlaceAmenity, PlaceAmenity.amenity_id == Amenity.id)
+        .where(PlaceAmenity.place_id == Place.id, Amenity.bit.is_not(None))
+        .scalar_subquery()
+    )
+    session.execute(update(Place).values(amenity_bits=place_bits))
+
+    return session.execute(
+        select(func.count()).where(Amenity.bit.is_not(None))
+    ).scalar()
+
+
+@event.listens_for(Session, "before_flush")
+def _sync_bits(session, _flush_context, _instances):
+    new_amenities = [
+        obj
+        for obj in session.new
+        if isinstance(obj, Amenity) and obj.bit is None
+    ]
+
+    if new_amenities:
+        bit = _next_bit(session)
+
+        for amenity in new_amenities[: max(0, MAX_BITS - bit)]:
+            amenity.bit = bit
+            bit += 1
+
+    for obj in (*session.new, *session.dirty):
+        if (
+            isinstance(obj, Place)
+            and inspect(obj).attrs.amenities.history.has_changes()
+        ):
+            obj.amenity_bits = amenity_mask(obj.amenities)
@@ -0,0 +1,400 @@
+"""Streaming export of the tables to compressed JSONL, CSV or Parquet.
+
+Each table is read in yield_per batches from a streaming (server-side
+where the driver has them) cursor and written batch by batch, so memory
+stays constant whatever the table size. Files are split every
+rows_per_file rows, as
+
+    <directory>/<table>/<until>-00000.jsonl.gz
+
+with until to the microsecond; an existing file is never overwritten.
+
+Tables can be exported in parallel, one process each. A full export
+reads from the read replica when one is configured; incremental ones
+read from the primary, which the replica may lag. Each export records
+per table, in <directory>/manifest.json, a watermark: the greatest
+updated_at it wrote. An incremental export writes the rows updated after
+the previous watermark minus OVERLAP, so that a transaction committed
+after the previous export read, with an updated_at set before, is not
+lost; consumers drop the rows seen twice on (id, version). Deleted rows
+are not tracked. place_amenities has no timestamp and is always exported
+whole.
+
+Password hashes are never exported. Parquet needs pyarrow.
+"""
+import csv
+import gzip
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+
+from flask import current_app
+from sqlalchemy import (
+    Boolean,
+    DateTime,
+    Float,
+    Integer,
+    create_engine,
+    select,
+)
+
+from app.models.amenity import Amenity, PlaceAmenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # pragma: no cover - optional dependency
+    pyarrow = None
+
+FORMATS = ("jsonl", "csv", "parquet")
+MANIFEST = "manifest.json"
+
+# Rows re-read before an incremental export's watermark; longer than the
+# transactions writing the tables
+OVERLAP = timedelta(minutes=5)
+
+# Table -> (model, exported columns)
+TABLES = {
+    "users": (
+        User,
+        (
+            "id",
+            "first_name",
+            "last_name",
+            "email",
+            "is_admin",
+            "created_at",
+            "updated_at",
+            "version",
+        ),
+    ),
+    "amenities": (
+        Amenity,
+        ("id", "name", "created_at", "updated_at", "version"),
+    ),
+    "places": (
+        Place,
+        (
+            "id",
+            "title",
+            "description",
+            "price",
+            "latitude",
+            "longitude",
+            "owner_id",
+            "review_count",
+            "rating_avg",
+            "created_at",
+            "updated_at",
+            "version",
+        ),
+    ),
+    "reviews": (
+        Review,
+        (
+            "id",
+            "text",
+            "rating",
+            "place_id",
+            "user_id",
+            "created_at",
+            "updated_at",
+            "version",
+        ),
+    ),
+    "place_amenities": (PlaceAmenity, ("place_id", "amenity_id")),
+}
+
+
+def _text(value):
+    """JSON and CSV value: timestamps as ISO 8601."""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+class JsonlWriter:
+    extension = "jsonl.gz"
+
+    def __init__(self, path: str, columns):
+        self.keys = [column.key for column in columns]
+        self.file = gzip.open(path, "wb")
+
+    def write(self, rows) -> None:
+        for row in rows:
+            record = dict(zip(self.keys, map(_text, row)))
+
+            if orjson is not None:
+                self.file.write(orjson.dumps(record) + b"\n")
+            else:
+                self.file.write(json.dumps(record).encode("utf-8") + b"\n")
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class CsvWriter:
+    extension = "csv.gz"
+
+    def __init__(self, path: str, columns):
+        self.file = gzip.open(path, "wt", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(column.key for column in columns)
+
+    def write(self, rows) -> None:
+        self.writer.writerows(map(_text, row) for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class ParquetWriter:
+    """One row group per batch, typed after the table's columns."""
+
+    extension = "parquet"
+
+    def __init__(self, path: str, columns):
+        if pyarrow is None:
+            raise ValueError("The parquet format requires pyarrow")
+
+        self.schema = pyarrow.schema(
+            [(column.key, _arrow_type(column.type)) for column in columns]
+        )
+        self.writer = pyarrow.parquet.ParquetWriter(
+            path, self.schema, compression="zstd"
+        )
+
+    def write(self, rows) -> None:
+        columns = list(zip(*rows))
+        self.writer.write_table(
+            pyarrow.Table.from_arrays(
+                [
+                    pyarrow.array(values, type=field.type)
+                    for values, field in zip(columns, self.schema)
+                ],
+                schema=self.schema,
+            )
+        )
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def _arrow_type(sql_type):
+    if isinstance(sql_type, Boolean):
+        return pyarrow.bool_()
+
+    if isinstance(sql_type, Integer):
+        return pyarrow.int64()
+
+    if isinstance(sql_type, Float):
+        return pyarrow.float64()
+
+    if isinstance(sql_type, DateTime):
+        return pyarrow.timestamp("us")
+
+    return pyarrow.string()
+
+
+def _query(table: str, since, until):
+    model, names = TABLES[table]
+    columns = [model.__table__.c[name] for name in names]
+    query = select(*columns)
+
+    if "updated_at" not in names:
+        return query.order_by(*model.__table__.primary_key.columns), columns
+
+    updated_at = model.__table__.c.updated_at
+    query = query.where(updated_at <= until)
+
+    if since is not None:
+        query = query.where(updated_at > since)
+
+    return query.order_by(updated_at, model.__table__.c.id), columns
+
+
+def export_table(
+    engine,
+    table: str,
+    directory: str,
+    fmt: str,
+    since: datetime | None,
+    until: datetime,
+    rows_per_file: int,
+    batch_size: int,
+) -> dict:
+    """Write the rows of table updated in (since, until]; see the module.
+
+    engine may be a URL, for calls in another process.
+    """
+    if isinstance(engine, str):
+        engine = create_engine(engine)
+
+    query, columns = _query(table, since, until)
+    keys = [column.key for column in columns]
+    # Rows come in updated_at order: the last one has the greatest
+    stamp_index = keys.index("updated_at") if "updated_at" in keys else None
+    last = None
+    writer_class = WRITERS[fmt]
+    extension = writer_class.extension
+    folder = os.path.join(directory, table)
+    os.makedirs(folder, exist_ok=True)
+    stamp = until.strftime("%Y%m%dT%H%M%S%f")
+    files, rows, writer, written = [], 0, None, 0
+
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True, yield_per=batch_size
+        ).execute(query)
+
+        try:
+            for batch in result.partitions():
+                while batch:
+                    if writer is None or written == rows_per_file:
+                        if writer is not None:
+                            writer.close()
+
+                        name = f"{stamp}-{len(files):05d}.{extension}"
+                        path = os.path.join(folder, name)
+
+                        if os.path.exists(path):
+                            raise ValueError(f"{path} already exists")
+
+                        files.append(os.path.join(table, name))
+                        writer = writer_class(path, columns)
+                        written = 0
+
+                    part = batch[: rows_per_file - written]
+                    batch = batch[len(part) :]
+                    writer.write(part)
+                    written += len(part)
+                    rows += len(part)
+
+                    if stamp_index is not None:
+                        last = part[-1][stamp_index]
+        finally:
+            if writer is not None:
+                writer.close()
+
+    return {
+        "since": since.isoformat() if since else None,
+        "until": until.isoformat(),
+        "watermark": last.isoformat() if last else None,
+        "rows": rows,
+        "files": files,
+    }
+
+
+def read_manifest(directory: str) -> dict:
+    try:
+        with open(os.path.join(directory, MANIFEST), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"tables": {}}
+
+
+def _write_manifest(directory: str, manifest: dict) -> None:
+    path = os.path.join(directory, MANIFEST)
+
+    with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+        json.dump(manifest, file, indent=2)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def export_tables(
+    directory: str,
+    tables=tuple(TABLES),
+    fmt: str = "jsonl",
+    jobs: int = 1,
+    incremental: bool = False,
+    since: datetime | None = None,
+    rows_per_file: int = 1_000_000,
+    batch_size: int = 10_000,
+) -> dict:
+    """Export tables into directory; returns table -> export summary.
+
+    Incremental exports start OVERLAP before each table's watermark in
+    the manifest (since overrides it); every export moves the watermark
+    to the greatest updated_at it wrote, or leaves it if it wrote none.
+    """
+    from app import db
+
+    if fmt == "parquet" and pyarrow is None:
+        raise ValueError("The parquet format requires pyarrow")
+
+    os.makedirs(directory, exist_ok=True)
+    manifest = read_manifest(directory)
+    until = datetime.now()
+    # Full dumps may lag: read them from the replica when there is one.
+    # Incremental ones would skip for good the rows it has not replayed
+    # yet
+    engine = db.engine
+
+    if not incremental and since is None:
+        engine = current_app.extensions.get("sqlalchemy_reader") or engine
+
+    starts = {}
+
+    for table in tables:
+        previous = manifest["tables"].get(table, {})
+
+        if since is not None:
+            starts[table] = since
+        elif incremental and previous.get("watermark"):
+            starts[table] = (
+                datetime.fromisoformat(previous["watermark"]) - OVERLAP
+            )
+        else:
+            starts[table] = None
+
+    options = (directory, fmt)
+    sizes = (rows_per_file, batch_size)
+
+    if jobs > 1 and len(tables) > 1:
+        url = engine.url.render_as_string(hide_password=False)
+
+        with ProcessPoolExecutor(
+            min(jobs, len(tables)), mp_context=get_context("spawn")
+        ) as pool:
+            futures = {
+                table: pool.submit(
+                    export_table,
+                    url,
+                    table,
+                    *options,
+                    starts[table],
+                    until,
+                    *sizes,
+                )
+                for table in tables
+            }
+            results = {
+                table: future.result() for table, future in futures.items()
+            }
+    else:
+        results = {
+            table: export_table(
+                engine, table, *options, starts[table], until, *sizes
+            )
+            for table in tables
+        }
+
+    for table, result in results.items():
+        entry = manifest["tables"].setdefault(table, {"exports": []})
+        entry["watermark"] = result["watermark"] or entry.get("watermark")
+        entry["exports"].append({"format": fmt, **result})
+
+    _write_manifest(directory, manifest)
+    return results
@@ -0,0 +1,672 @@
+"""Bulk import of users, amenities, places and reviews from CSV or JSONL.
+
+Rows are streamed in chunks and written with Core executemany INSERTs,
+one transaction per chunk, instead of one ORM object and commit each:
+
+- values go through the models' @validates rules, called on a stand-in
+  rather than on model instances;
+- owner and reviewer emails and amenity names are resolved through maps
+  loaded once, places through one query per chunk;
+- passwords are hashed with bcrypt in a process pool (password_hash
+  values, bcrypt hashes from another system, are kept as they are);
+- the derived data the ORM events and the facade maintain is written in
+  the same transaction: geohash, amenity bits, rating aggregates and the
+  full-text index.
+
+Invalid rows are reported and skipped. The number of rows consumed is
+stored in import_checkpoint with every chunk, so an interrupted import
+resumes after its last committed chunk. The checkpoint also records the
+file's size and a hash of its first block: a different file dropped
+under the same name is refused rather than skipped, until the import is
+restarted.
+
+File layouts (CSV headers or JSON keys); optional ones in brackets:
+
+- users: first_name, last_name, email, password or password_hash,
+  [is_admin]
+- amenities: name
+- places: [id], title, [description], price, latitude, longitude,
+  owner_email, [amenities] (names, '|'-separated in CSV)
+- reviews: text, rating, place_id, user_email
+"""
+import csv
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice, repeat
+from types import SimpleNamespace
+
+import bcrypt
+from flask import current_app
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    bindparam,
+    case,
+    cast,
+    insert,
+    inspect,
+    select,
+    tuple_,
+    update,
+)
+
+from app.models.amenity import Amenity, PlaceAmenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.passwords import PasswordHash
+from app.persistence import amenity_bits, search
+from app.persistence.entity_cache import entity_cache
+from app.persistence.geo import encode_geohash
+
+KINDS = ("users", "amenities", "places", "reviews")
+FORMATS = ("csv", "jsonl")
+
+# Bytes of a file hashed into its checkpoint's fingerprint
+FINGERPRINT_BLOCK = 64 * 1024
+
+# Separator of the amenity names of a place in CSV files
+AMENITY_SEPARATOR = "|"
+
+# Kept apart from db.metadata: created on the first import only
+checkpoints = Table(
+    "import_checkpoint",
+    MetaData(),
+    Column("source", String(1024), primary_key=True),
+    Column("rows", Integer, nullable=False),
+    Column("done", Boolean, nullable=False),
+    # See fingerprint()
+    Column("fingerprint", String(64), nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+# `self` of the validators: only Place's coordinates use it, to keep the
+# geohash in sync, which the importer computes itself
+_VALIDATION_SELF = SimpleNamespace(
+    latitude=None, longitude=None, _sync_geohash=lambda *args: None
+)
+
+
+def _hash(password: str, rounds: int) -> str:
+    """bcrypt hash of password, as flask_bcrypt makes them."""
+    return bcrypt.hashpw(
+        password.encode("utf-8"), bcrypt.gensalt(rounds)
+    ).decode("utf-8")
+
+
+def detect_format(path: str) -> str:
+    name = path[:-3] if path.endswith(".gz") else path
+    extension = os.path.splitext(name)[1].lstrip(".").lower()
+
+    if extension == "json":
+        return "jsonl"
+
+    if extension not in FORMATS:
+        raise ValueError(f"Unknown file format '{extension}', use --format")
+
+    return extension
+
+
+class SourceChangedError(ValueError):
+    """The file differs from the one its checkpoint was saved for."""
+
+
+def read_rows(path: str, fmt: str):
+    """Iterate over the rows of a CSV or JSONL file, gzipped or not.
+
+    A JSONL line that does not parse is yielded as the ValueError to
+    report for it, see _check_row.
+    """
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rt", encoding="utf-8", newline="") as file:
+        if fmt == "csv":
+            for row in csv.DictReader(file):
+                # Empty cells are missing values
+                yield {key: value for key, value in row.items() if value}
+        else:
+            for line in file:
+                if not line.strip():
+                    continue
+
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    yield ValueError(f"Invalid JSON: {e}")
+
+
+def _check_row(row) -> dict:
+    """row if it maps keys to scalars (amenities: names), else ValueError.
+
+    The writers can then read any row without raising on its types.
+    """
+    if isinstance(row, ValueError):
+        raise row
+
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+
+    for key, value in row.items():
+        if key is None:
+            # csv.DictReader's key for cells past the header
+            raise ValueError("Row has more cells than the header")
+
+        if key == "amenities" and isinstance(value, list):
+            if all(isinstance(name, str) for name in value):
+                continue
+
+            raise ValueError("amenities must be a list of names")
+
+        if value is not None and not isinstance(value, (str, int, float)):
+            raise ValueError(f"{key} must be a string or a number")
+
+    return row
+
+
+def _check_rows(chunk) -> tuple[list, list[tuple[int, str]]]:
+    """The (number, row) pairs of chunk passing _check_row, and errors."""
+    rows, errors = [], []
+
+    for number, row in chunk:
+        try:
+            rows.append((number, _check_row(row)))
+        except ValueError as e:
+            errors.append((number, str(e)))
+
+    return rows, errors
+
+
+def _validate(model, key: str, value):
+    validator = inspect(model).validators.get(key)
+
+    if validator is None:
+        return value
+
+    return validator[0](_VALIDATION_SELF, key, value)
+
+
+def _required(row: dict, key: str):
+    if row.get(key) in (None, ""):
+        raise ValueError(f"{key} is required")
+
+    return row[key]
+
+
+def _number(row: dict, key: str, kind=float):
+    value = _required(row, key)
+
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{key} must be a number") from None
+
+
+def _boolean(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("1", "true", "yes")
+
+    return bool(value)
+
+
+def _names(value) -> list[str]:
+    if not value:
+        return []
+
+    if isinstance(value, str):
+        value = value.split(AMENITY_SEPARATOR)
+
+    return list(dict.fromkeys(name.strip() for name in value if name))
+
+
+class BulkImporter:
+    """Chunk writers sharing the lookup maps and the hashing pool.
+
+    Each write_* method validates a chunk of (row number, row) pairs,
+    inserts the valid rows in the session's transaction and returns the
+    (row number, message) errors of the others. The caller commits.
+    """
+
+    def __init__(self, session, hash_workers: int, rounds: int):
+        self.session = session
+        self.rounds = rounds
+        self.hash_workers = hash_workers
+        self.pool = (
+            ProcessPoolExecutor(hash_workers) if hash_workers else None
+        )
+        self.user_ids = dict(
+            session.execute(select(User.email, User.id)).tuples().all()
+        )
+        self.amenities = {
+            name: (amenity_id, bit)
+            for name, amenity_id, bit in session.execute(
+                select(Amenity.name, Amenity.id, Amenity.bit)
+            )
+        }
+
+    def close(self) -> None:
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def _hash_passwords(self, passwords: list[str]) -> list[str]:
+        pending = [
+            index
+            for index, password in enumerate(passwords)
+            if not isinstance(password, PasswordHash)
+        ]
+        plain = [passwords[index] for index in pending]
+
+        if self.pool is None:
+            hashed = [_hash(password, self.rounds) for password in plain]
+        else:
+            hashed = self.pool.map(
+                _hash,
+                plain,
+                repeat(self.rounds),
+                chunksize=max(1, len(plain) // (self.hash_workers * 4)),
+            )
+
+        passwords = [str(password) for password in passwords]
+
+        for index, value in zip(pending, hashed):
+            passwords[index] = value
+
+        return passwords
+
+    def _insert(self, model, values: list[dict]) -> None:
+        if values:
+            self.session.execute(insert(model.__table__), values)
+
+    @staticmethod
+    def _stamp(values: dict, now: datetime) -> dict:
+        values.setdefault("id", str(uuid.uuid4()))
+        values.update(created_at=now, updated_at=now, version=1)
+        return values
+
+    def write_users(self, chunk) -> list[tuple[int, str]]:
+        errors, valid = [], []
+        now = datetime.now()
+
+        for number, row in chunk:
+            try:
+                email = _validate(User, "email", _required(row, "email"))
+                if row.get("password_hash") not in (None, ""):
+                    password = PasswordHash(row["password_hash"])
+                else:
+                    password = _required(row, "password")
+
+                    if not isinstance(password, str):
+                        raise ValueError("Password must be a string")
+
+                if email in self.user_ids:
+                    raise ValueError("Email already registered")
+
+                values = {
+                    "first_name": _validate(
+                        User, "first_name", _required(row, "first_name")
+                    ),
+                    "last_name": _validate(
+                        User, "last_name", _required(row, "last_name")
+                    ),
+                    "email": email,
+                    "password": password,
+                    "is_admin": _boolean(row.get("is_admin", False)),
+                }
+            except (ValueError, TypeError) as e:
+                errors.append((number, str(e)))
+                continue
+
+            self.user_ids[email] = self._stamp(values, now)["id"]
+            valid.append(values)
+
+        passwords = self._hash_passwords([user["password"] for user in valid])
+
+        for user, password in zip(valid, passwords):
+            user["password"] = password
+
+        self._insert(User, valid)
+        return errors
+
+    def write_amenities(self, chunk) -> list[tuple[int, str]]:
+        errors, valid = [], []
+        now = datetime.now()
+
+        for number, row in chunk:
+            try:
+                name = _validate(Amenity, "name", _required(row, "name"))
+
+                if name in self.amenities:
+                    raise ValueError(
+                        f"Amenity with the name '{name}' already exists"
+                    )
+            except (ValueError, TypeError) as e:
+                errors.append((number, str(e)))
+                continue
+
+            values = self._stamp({"name": name}, now)
+            self.amenities[name] = (values["id"], None)
+            valid.append(values)
+
+        bits = amenity_bits.next_bits(self.session, len(valid))
+
+        for values, bit in zip(valid, bits):
+            values["bit"] = bit
+            self.amenities[values["name"]] = (values["id"], bit)
+
+        self._insert(Amenity, valid)
+        return errors
+
+    def write_places(self, chunk) -> list[tuple[int, str]]:
+        errors, valid, links = [], [], []
+        now = datetime.now()
+        given_ids = [row["id"] for _, row in chunk if row.get("id")]
+        taken = set(
+            self.session.scalars(
+                select(Place.id).where(Place.id.in_(given_ids))
+            )
+        )
+
+        for number, row in chunk:
+            try:
+                values = {
+                    "title": _validate(
+                        Place, "title", _required(row, "title")
+                    ),
+                    "description": _validate(
+                        Place, "description", row.get("description", "")
+                    ),
+                    "price": _validate(Place, "price", _number(row, "price")),
+                    "latitude": _validate(
+                        Place, "latitude", _number(row, "latitude")
+                    ),
+                    "longitude": _validate(
+                        Place, "longitude", _number(row, "longitude")
+                    ),
+                }
+                owner_email = _required(row, "owner_email")
+
+                if owner_email not in self.user_ids:
+                    raise ValueError("Owner not found")
+
+                names = _names(row.get("amenities"))
+                unknown = [
+                    name for name in names if name not in self.amenities
+                ]
+
+                if unknown:
+                    raise ValueError(f"Unknown amenity '{unknown[0]}'")
+
+                if row.get("id"):
+                    if row["id"] in taken:
+                        raise ValueError(f"Place {row['id']} already exists")
+
+                    values["id"] = row["id"]
+            except (ValueError, TypeError) as e:
+                errors.append((number, str(e)))
+                continue
+
+            amenities = [self.amenities[name] for name in names]
+            bits = (bit for _, bit in amenities)
+            latitude, longitude = values["latitude"], values["longitude"]
+            values.update(
+                owner_id=self.user_ids[owner_email],
+                geohash=encode_geohash(latitude, longitude),
+                amenity_bits=amenity_bits.bit_mask(bits),
+                review_count=0,
+                rating_sum=0,
+                rating_avg=0.0,
+            )
+            place_id = self._stamp(values, now)["id"]
+            taken.add(place_id)
+            valid.append(values)
+            links.extend(
+                {"place_id": place_id, "amenity_id": amenity_id}
+                for amenity_id, _ in amenities
+            )
+
+        self._insert(Place, valid)
+        self._insert(PlaceAmenity, links)
+        search.index_documents(
+            self.session,
+            [
+                (place["id"], place["title"], place["description"])
+                for place in valid
+            ],
+        )
+        return errors
+
+    def write_reviews(self, chunk) -> list[tuple[int, str]]:
+        errors, valid = [], []
+        now = datetime.now()
+        place_ids = {row.get("place_id") for _, row in chunk} - {None}
+        owners = dict(
+            self.session.execute(
+                select(Place.id, Place.owner_id).where(
+                    Place.id.in_(place_ids)
+                )
+            )
+            .tuples()
+            .all()
+        )
+        pairs = {
+            (row.get("place_id"), self.user_ids.get(row.get("user_email")))
+            for _, row in chunk
+        }
+        reviewed = set(
+            self.session.execute(
+                select(Review.place_id, Review.user_id).where(
+                    tuple_(Review.place_id, Review.user_id).in_(
+                        [pair for pair in pairs if None not in pair]
+                    )
+                )
+            ).tuples()
+        )
+
+        for number, row in chunk:
+            try:
+                values = {
+                    "text": _validate(Review, "text", _required(row, "text")),
+                    "rating": _validate(
+                        Review, "rating", _number(row, "rating", int)
+                    ),
+                }
+                place_id = _required(row, "place_id")
+                user_id = self.user_ids.get(_required(row, "user_email"))
+
+                if place_id not in owners:
+                    raise ValueError("Place not found")
+
+                if user_id is None:
+                    raise ValueError("User not found")
+
+                if owners[place_id] == user_id:
+                    raise ValueError("You cannot review your own place.")
+
+                if (place_id, user_id) in reviewed:
+                    raise ValueError("You have already reviewed this place.")
+            except (ValueError, TypeError) as e:
+                errors.append((number, str(e)))
+                continue
+
+            reviewed.add((place_id, user_id))
+            values.update(place_id=place_id, user_id=user_id)
+            valid.append(self._stamp(values, now))
+
+        self._insert(Review, valid)
+        self._adjust_ratings(valid)
+        return errors
+
+    def _adjust_ratings(self, reviews: list[dict]) -> None:
+        """Add the reviews to their places' aggregates, one UPDATE per
+        place as PlaceRepository.adjust_rating does."""
+        counts, sums = Counter(), Counter()
+
+        for review in reviews:
+            counts[review["place_id"]] += 1
+            sums[review["place_id"]] += review["rating"]
+
+        if not counts:
+            return
+
+        count = Place.review_count + bindparam("count_delta")
+        total = Place.rating_sum + bindparam("sum_delta")
+        statement = (
+            update(Place.__table__)
+            .where(Place.id == bindparam("place_id"))
+            .values(
+                version=Place.version + 1,
+                review_count=count,
+                rating_sum=total,
+                rating_avg=case(
+                    (count > 0, cast(total, Float) / count), else_=0.0
+                ),
+            )
+        )
+        self.session.execute(
+            statement,
+            [
+                {
+                    "place_id": place_id,
+                    "count_delta": counts[place_id],
+                    "sum_delta": sums[place_id],
+                }
+                for place_id in counts
+            ],
+        )
+
+
+def _source(kind: str, path: str) -> str:
+    return f"{kind}:{os.path.abspath(path)}"
+
+
+def fingerprint(path: str) -> str:
+    """Size of the file and a hash of its first FINGERPRINT_BLOCK bytes."""
+    with open(path, "rb") as file:
+        digest = hashlib.blake2b(
+            file.read(FINGERPRINT_BLOCK), digest_size=16
+        ).hexdigest()
+
+    return f"{os.path.getsize(path)}:{digest}"
+
+
+def _checkpoint(session, source: str) -> tuple[int, bool, str] | None:
+    row = session.execute(
+        select(
+            checkpoints.c.rows, checkpoints.c.done, checkpoints.c.fingerprint
+        ).where(checkpoints.c.source == source)
+    ).first()
+
+    return tuple(row) if row else None
+
+
+def _save_checkpoint(
+    session, source: str, rows: int, done: bool, file_print: str
+) -> None:
+    values = {
+        "rows": rows,
+        "done": done,
+        "fingerprint": file_print,
+        "updated_at": datetime.now(),
+    }
+    result = session.execute(
+        update(checkpoints)
+        .where(checkpoints.c.source == source)
+        .values(**values)
+    )
+
+    if result.rowcount == 0:
+        session.execute(insert(checkpoints).values(source=source, **values))
+
+
+def import_file(
+    kind: str,
+    path: str,
+    fmt: str | None = None,
+    chunk_size: int = 5000,
+    hash_workers: int | None = None,
+    restart: bool = False,
+    on_chunk=None,
+) -> dict:
+    """Import path into the kind table, resuming from its checkpoint.
+
+    on_chunk(rows, errors) is called after each committed chunk with the
+    number of rows consumed so far and the chunk's errors. Returns the
+    counts of the run: rows skipped (already imported), inserted and
+    rejected.
+    """
+    from app import db
+
+    if kind not in KINDS:
+        raise ValueError(f"Unknown kind '{kind}'")
+
+    fmt = fmt or detect_format(path)
+    session = db.session
+    source = _source(kind, path)
+    checkpoints.create(session.connection(), checkfirst=True)
+    session.commit()
+
+    file_print = fingerprint(path)
+    checkpoint = None if restart else _checkpoint(session, source)
+
+    if checkpoint and checkpoint[2] != file_print:
+        raise SourceChangedError(
+            f"{path} changed since it was imported up to row "
+            f"{checkpoint[0]}; restart the import to read it from the "
+            "first row"
+        )
+
+    start = checkpoint[0] if checkpoint else 0
+    counts = {"skipped": start, "inserted": 0, "rejected": 0}
+
+    if checkpoint and checkpoint[1]:
+        return counts
+
+    importer = BulkImporter(
+        session,
+        os.cpu_count() if hash_workers is None else hash_workers,
+        current_app.config.get("BCRYPT_LOG_ROUNDS", 12),
+    )
+    write = getattr(importer, f"write_{kind}")
+    rows = enumerate(islice(read_rows(path, fmt), start, None), start + 1)
+    consumed = start
+
+    try:
+        while chunk := list(islice(rows, chunk_size)):
+            checked, errors = _check_rows(chunk)
+            # Sorted back by row number
+            errors = sorted(errors + write(checked))
+            consumed += len(chunk)
+            # Committed with the chunk, so a resume never repeats it
+            _save_checkpoint(session, source, consumed, False, file_print)
+            session.commit()
+            counts["inserted"] += len(chunk) - len(errors)
+            counts["rejected"] += len(errors)
+
+            if on_chunk is not None:
+                on_chunk(consumed, errors)
+
+        _save_checkpoint(session, source, consumed, True, file_print)
+        session.commit()
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        importer.close()
+
+        # Imported reviews changed their places' aggregates
+        cache = entity_cache()
+        if cache is not None and counts["inserted"]:
+            cache.clear()
+
+    return counts
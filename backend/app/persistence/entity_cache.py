@@ -0,0 +1,148 @@
+"""Read-through cache of entity snapshots for SQLAlchemyRepository.
+
+Repositories serve read-only lookups (get(..., snapshot=True)) from a
+per-process LRU with TTL, keyed by model, id and load policy. Entries are
+detached, read-only Snapshot copies of the loaded entity graph, so nothing
+cached is bound to a session.
+
+Every cached entry records the entities embedded in it (a place detail
+embeds its owner, amenities and reviews). Flushing a change to any of
+them, through the repositories or BaseModel.save/update, invalidates the
+entry. Changes made with bulk UPDATE statements are marked with
+mark_stale(). Other worker processes see a change at the latest after
+ENTITY_CACHE_TTL seconds.
+"""
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from app.cache import TaggedCache
+
+PENDING_KEY = "entity_cache_pending"
+
+
+class Snapshot:
+    """Detached, read-only copy of an entity's loaded attributes."""
+
+    __slots__ = ("_model", "_values")
+
+    def __init__(self, model: str, values: dict) -> None:
+        object.__setattr__(self, "_model", model)
+        object.__setattr__(self, "_values", values)
+
+    def __getattr__(self, name):
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(
+                f"{name!r} was not loaded into this {self._model} snapshot"
+            )
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self._model} snapshots are read-only")
+
+    def __repr__(self):
+        return f"<{self._model} snapshot {self._values.get('id')}>"
+
+
+def take_snapshot(obj, deps: set, _path=frozenset()) -> Snapshot:
+    """Snapshot obj and its loaded relationships, collecting their keys."""
+    state = inspect(obj)
+    mapper = state.mapper
+    model = mapper.class_.__name__
+    identity = (model, obj.id)
+    deps.add(identity)
+    path = _path | {identity}
+
+    values = {attr.key: getattr(obj, attr.key) for attr in mapper.column_attrs}
+
+    for relationship in mapper.relationships:
+        if relationship.key in state.unloaded:
+            continue
+
+        value = state.attrs[relationship.key].loaded_value
+
+        if relationship.uselist:
+            related = list(value)
+        else:
+            related = [] if value is None else [value]
+
+        # Skip back-references to an entity already on the path
+        if any(
+            (inspect(item).mapper.class_.__name__, item.id) in path
+            for item in related
+        ):
+            continue
+
+        snapshots = tuple(take_snapshot(item, deps, path) for item in related)
+        values[relationship.key] = (
+            snapshots if relationship.uselist else next(iter(snapshots), None)
+        )
+
+    return Snapshot(model, values)
+
+
+class EntityCache(TaggedCache):
+    """TaggedCache of snapshots, tagged with the entities they embed."""
+
+    def __init__(self, maxsize: int, ttl: float, models: dict) -> None:
+        super().__init__(maxsize, ttl)
+        self.models = models
+
+    def enabled(self, model: str) -> bool:
+        return self.models.get(model, False)
+
+
+def entity_cache() -> EntityCache | None:
+    if not has_app_context():
+        return None
+
+    return current_app.extensions.get("entity_cache")
+
+
+def mark_stale(session, model: str, obj_id: str) -> None:
+    """Invalidate an entity changed outside of the unit of work."""
+    session.info.setdefault(PENDING_KEY, set()).add((model, obj_id))
+    _flush_pending(session)
+
+
+def _flush_pending(session) -> None:
+    cache = entity_cache()
+    pending = session.info.get(PENDING_KEY)
+
+    if cache is not None and pending:
+        cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, _flush_context):
+    pending = session.info.setdefault(PENDING_KEY, set())
+
+    for obj in (*session.dirty, *session.deleted):
+        obj_id = getattr(obj, "id", None)
+
+        if obj_id is not None:
+            pending.add((type(obj).__name__, obj_id))
+
+    # Invalidate now for this process, and again once the change is
+    # visible to other connections (a reader may cache in between)
+    _flush_pending(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    _flush_pending(session)
+    session.info.pop(PENDING_KEY, None)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def init_app(app) -> None:
+    app.extensions["entity_cache"] = EntityCache(
+        app.config["ENTITY_CACHE_SIZE"],
+        app.config["ENTITY_CACHE_TTL"],
+        app.config["ENTITY_CACHE_MODELS"],
+    )
@@ -0,0 +1,154 @@
+"""Geohash encoding and covering for spatial queries over places.
+
+Places store a geohash of their coordinates in an indexed column. A
+bounding box is answered by a handful of geohash prefix range scans on that
+index, then refined exactly on latitude/longitude (and haversine distance
+for radius queries), so the cost follows the size of the area rather than
+the size of the catalog.
+"""
+import math
+
+BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 12
+EARTH_RADIUS_KM = 6371.0088
+
+# Upper bound of prefix ranges used to cover one bounding box
+MAX_COVER_CELLS = 16
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate as a base32 geohash string."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+
+    while len(chars) < precision:
+        coordinate, bounds = (
+            (longitude, lon_range) if even else (latitude, lat_range)
+        )
+        mid = (bounds[0] + bounds[1]) / 2
+
+        if coordinate >= mid:
+            value = value << 1 | 1
+            bounds[0] = mid
+        else:
+            value <<= 1
+            bounds[1] = mid
+
+        even = not even
+        bits += 1
+
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = 0
+            value = 0
+
+    return "".join(chars)
+
+
+def _cell_size(precision):
+    """Height and width in degrees of a geohash cell."""
+    lat_bits = 5 * precision // 2
+    lon_bits = 5 * precision - lat_bits
+    return 180.0 / 2**lat_bits, 360.0 / 2**lon_bits
+
+
+def _cell_span(low, high, origin, size, count):
+    first = max(0, int((low - origin) // size))
+    last = min(count - 1, int((high - origin) // size))
+    return range(first, last + 1)
+
+
+def geohash_cover(min_lat, min_lon, max_lat, max_lon):
+    """Return geohash prefixes whose cells cover the bounding box.
+
+    Picks the finest precision that needs at most MAX_COVER_CELLS cells.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        height, width = _cell_size(precision)
+        rows = _cell_span(min_lat, max_lat, -90.0, height, round(180 / height))
+        cols = _cell_span(min_lon, max_lon, -180.0, width, round(360 / width))
+
+        if len(rows) * len(cols) <= MAX_COVER_CELLS or precision == 1:
+            break
+
+    return sorted(
+        encode_geohash(
+            -90.0 + (row + 0.5) * height,
+            -180.0 + (col + 0.5) * width,
+            precision,
+        )
+        for row in rows
+        for col in cols
+    )
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two coordinates in kilometres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def split_bbox(min_lat, min_lon, max_lat, max_lon):
+    """Split a box crossing the antimeridian into boxes that do not.
+
+    A box crosses the antimeridian when min_lon > max_lon, or when its
+    longitudes run past +/-180.
+    """
+    if max_lon - min_lon >= 360:
+        return [(min_lat, -180.0, max_lat, 180.0)]
+
+    if min_lon < -180:
+        min_lon += 360
+    if max_lon > 180:
+        max_lon -= 360
+
+    if min_lon > max_lon:
+        return [
+            (min_lat, min_lon, max_lat, 180.0),
+            (min_lat, -180.0, max_lat, max_lon),
+        ]
+
+    return [(min_lat, min_lon, max_lat, max_lon)]
+
+
+def parse_bbox(value: str):
+    """Parse 'min_lon,min_lat,max_lon,max_lat' into boxes."""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (
+            float(part) for part in value.split(",")
+        )
+    except ValueError:
+        raise ValueError("bbox must be 'min_lon,min_lat,max_lon,max_lat'")
+
+    if not (-90 <= min_lat <= max_lat <= 90):
+        raise ValueError("bbox latitudes must be ordered and within -90..90")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180):
+        raise ValueError("bbox longitudes must be within -180..180")
+
+    return split_bbox(min_lat, min_lon, max_lat, max_lon)
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """Boxes enclosing the circle of radius_km around a coordinate."""
+    d_lat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - d_lat, latitude + d_lat
+
+    if min_lat <= -90 or max_lat >= 90:
+        return [(max(min_lat, -90.0), -180.0, min(max_lat, 90.0), 180.0)]
+
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(
+        math.radians(latitude)
+    )
+    d_lon = 180.0 if ratio >= 1 else math.degrees(math.asin(ratio))
+
+    return split_bbox(min_lat, longitude - d_lon, max_lat, longitude + d_lon)
@@ -0,0 +1,33 @@
+"""Unique constraint violations as validation errors.
+
+Endpoints look for an existing row before writing, but two concurrent
+requests can both pass that check. The unique constraints then reject
+the second write, and unique_violation() turns its IntegrityError into a
+DuplicateError, which endpoints answer like the check would have.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy.exc import IntegrityError
+
+
+class DuplicateError(ValueError):
+    """The write would duplicate a unique value."""
+
+
+def is_unique_violation(error: IntegrityError) -> bool:
+    # SQLite: "UNIQUE constraint failed", PostgreSQL: "duplicate key
+    # value violates unique constraint", MySQL: "Duplicate entry"
+    message = str(error.orig).lower()
+    return "unique" in message or "duplicate" in message
+
+
+@contextmanager
+def unique_violation(message: str):
+    """Raise DuplicateError(message) for a unique constraint violation."""
+    try:
+        yield
+    except IntegrityError as e:
+        if not is_unique_violation(e):
+            raise
+
+        raise DuplicateError(message) from e
@@ -0,0 +1,38 @@
+"""Relationship loading policies, selected per endpoint by name.
+
+Every relationship on the models is lazy, so serializing N objects that
+touch a relationship costs N extra queries. Endpoints instead ask the
+facade for a named policy that eagerly loads exactly what they render.
+"""
+from sqlalchemy.orm import joinedload, selectinload
+
+from app.models.place import Place
+
+LOAD_POLICIES = {
+    Place: {
+        # PlaceList.get / PlaceResource.put: owner block and amenities
+        "list": (
+            joinedload(Place.owner),
+            selectinload(Place.amenities),
+        ),
+        # PlaceResource.get: list policy plus reviews
+        "detail": (
+            joinedload(Place.owner),
+            selectinload(Place.amenities),
+            selectinload(Place.reviews),
+        ),
+        # PlaceReviewList.get / ReviewList.post
+        "reviews": (selectinload(Place.reviews),),
+    },
+}
+
+
+def loader_options(model, load: str | None) -> tuple:
+    """Return the loader options of the named policy for model."""
+    if load is None:
+        return ()
+
+    try:
+        return LOAD_POLICIES[model][load]
+    except KeyError:
+        raise LookupError(f"No '{load}' load policy for {model.__name__}")
@@ -0,0 +1,80 @@
+"""Keyset (cursor) pagination helpers for the SQLAlchemy repositories."""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, and_, or_
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+
+    raise TypeError(f"Cannot encode {type(value).__name__} in a cursor")
+
+
+def _coerce(column, value):
+    """Turn a decoded cursor value back into the column's Python type."""
+    if not isinstance(column.type, DateTime):
+        return value
+
+    try:
+        return datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def encode_cursor(values: list) -> str:
+    """Encode the sort key values of the last row into an opaque cursor."""
+    raw = json.dumps(
+        values, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """Decode a cursor produced by encode_cursor."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+
+    # Sort keys are never NULL or booleans: anything else was not made by
+    # encode_cursor
+    if not all(
+        isinstance(value, (str, int, float)) and not isinstance(value, bool)
+        for value in values
+    ):
+        raise ValueError("Invalid cursor")
+
+    return values
+
+
+def keyset_filter(sort_keys: list, values: list):
+    """Build the clause selecting rows that sort strictly after values.
+
+    sort_keys is a list of (column, descending) pairs and must end with a
+    unique column so that the ordering is total.
+    """
+    clauses = []
+    values = [
+        _coerce(column, value) for (column, _), value in zip(sort_keys, values)
+    ]
+
+    for i, (column, descending) in enumerate(sort_keys):
+        after = column < values[i] if descending else column > values[i]
+        equal = [sort_keys[j][0] == values[j] for j in range(i)]
+        clauses.append(and_(*equal, after))
+
+    return or_(*clauses)
+
+
+def order_by_clauses(sort_keys: list) -> list:
+    return [
+        column.desc() if descending else column.asc()
+        for column, descending in sort_keys
+    ]
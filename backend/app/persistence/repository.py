@@ -1,9 +1,40 @@
 from app import db
+from flask import current_app
+import heapq
+from sqlalchemy import (
+    Float,
+    and_,
+    case,
+    cast,
+    exists,
+    false,
+    func,
+    or_,
+    select,
+)
+from sqlalchemy import update as sql_update
+from sqlalchemy.orm import raiseload
 from abc import ABC, abstractmethod
-from app.models.amenity import Amenity
+from app.models.amenity import Amenity, PlaceAmenity
 from app.models.review import Review
 from app.models.user import User
 from app.models.place import Place
+from app.persistence.entity_cache import (
+    entity_cache,
+    mark_stale,
+    take_snapshot,
+)
+from app.persistence.geo import geohash_cover, haversine_km, radius_bbox
+from app.persistence import amenity_bits, search as place_search
+from app.persistence.loading import loader_options
+from app.persistence.routing import pinned_to_primary, reads_lag
+from app.persistence.unit_of_work import commit, in_transaction
+from app.persistence.pagination import (
+    decode_cursor,
+    encode_cursor,
+    keyset_filter,
+    order_by_clauses,
+)
 
 
 class Repository(ABC):
@@ -11,6 +42,10 @@ class Repository(ABC):
     def add(self, obj):
         pass
 
+    @abstractmethod
+    def add_many(self, objs):
+        pass
+
     @abstractmethod
     def get(self, obj_id):
         pass
@@ -19,6 +54,10 @@ class Repository(ABC):
     def get_all(self):
         pass
 
+    @abstractmethod
+    def get_page(self, limit, cursor=None):
+        pass
+
     @abstractmethod
     def update(self, obj_id, data):
         pass
@@ -39,12 +78,31 @@ class InMemoryRepository(Repository):
     def add(self, obj):
         self._storage[obj.id] = obj
 
-    def get(self, obj_id):
+    def add_many(self, objs):
+        for obj in objs:
+            self.add(obj)
+
+    def get(self, obj_id, load=None, snapshot=False):
         return self._storage.get(obj_id)
 
     def get_all(self):
         return list(self._storage.values())
 
+    def get_page(self, limit, cursor=None, load=None):
+        after = decode_cursor(cursor, 1)[0] if cursor else None
+        ids = sorted(
+            obj_id
+            for obj_id in self._storage
+            if after is None or obj_id > after
+        )
+        items = [self._storage[obj_id] for obj_id in ids[: limit + 1]]
+
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        return items, encode_cursor([items[-1].id])
+
     def update(self, obj_id, data):
         obj = self.get(obj_id)
         if obj:
@@ -71,28 +129,171 @@ class SQLAlchemyRepository(Repository):
 
     def add(self, obj):
         db.session.add(obj)
-        db.session.commit()
+        commit()
 
-    def get(self, obj_id):
-        return self.model.query.get(obj_id)
+    def add_many(self, objs):
+        """Insert objs in a single transaction.
 
-    def get_all(self):
-        return self.model.query.all()
+        The primary keys are generated client side, so the flush sends the
+        rows of each table as one executemany INSERT.
+        """
+        db.session.add_all(objs)
+        commit()
+
+    def _query(self, load=None):
+        """Base query with the named load policy applied.
+
+        With SQLALCHEMY_STRICT_LOADING every relationship not covered by the
+        policy raises on access instead of silently issuing a lazy load.
+        """
+        options = list(loader_options(self.model, load))
+
+        if current_app.config.get("SQLALCHEMY_STRICT_LOADING"):
+            options.append(raiseload("*"))
+
+        return self.model.query.options(*options)
+
+    def get(self, obj_id, load=None, snapshot=False):
+        """Return the object with obj_id, or None.
+
+        With snapshot=True the result is a read-only Snapshot served from
+        the entity cache when it is enabled for the model.
+        """
+        if snapshot:
+            return self._get_snapshot(obj_id, load)
+
+        if load is None:
+            return self.model.query.get(obj_id)
+
+        return self._query(load).filter(self.model.id == obj_id).first()
+
+    def _get_snapshot(self, obj_id, load):
+        cache = entity_cache()
+        key = (self.model.__name__, obj_id, load)
+
+        if (
+            cache is None
+            or not cache.enabled(self.model.__name__)
+            or pinned_to_primary()
+        ):
+            obj = self.get(obj_id, load)
+            return take_snapshot(obj, set()) if obj else None
+
+        cached = cache.get(key)
+
+        if cached is not None:
+            return cached
+
+        generation = cache.generation
+        obj = self.get(obj_id, load)
+
+        if obj is None:
+            return None
+
+        deps = set()
+        snapshot = take_snapshot(obj, deps)
+
+        # A replica's row may predate a write already invalidated here
+        if not reads_lag():
+            cache.add(key, snapshot, deps, generation)
+
+        return snapshot
+
+    def get_all(self, load=None):
+        return self._query(load).all()
+
+    def get_many(self, obj_ids, load=None):
+        if not obj_ids:
+            return []
+
+        return self._query(load).filter(self.model.id.in_(obj_ids)).all()
+
+    def get_many_by_attribute(self, attr_name, attr_values):
+        if not attr_values:
+            return []
+
+        column = getattr(self.model, attr_name)
+        return self.model.query.filter(column.in_(attr_values)).all()
+
+    def get_page(
+        self, limit, cursor=None, query=None, sort_keys=None, load=None
+    ):
+        """Return up to limit objects following cursor, and the next cursor.
+
+        Pages are selected with a keyset filter on sort_keys (default: the
+        primary key) rather than OFFSET, so every page is an index range scan.
+        """
+        query = self._query(load) if query is None else query
+        sort_keys = sort_keys or [(self.model.id, False)]
+
+        if cursor:
+            values = decode_cursor(cursor, len(sort_keys))
+            query = query.filter(keyset_filter(sort_keys, values))
+
+        items = (
+            query.order_by(*order_by_clauses(sort_keys)).limit(limit + 1).all()
+        )
+
+        if len(items) <= limit:
+            return items, None
+
+        items = items[:limit]
+        last = items[-1]
+        return items, encode_cursor(
+            [getattr(last, column.key) for column, _ in sort_keys]
+        )
+
+    def stream(self, query=None, sort_keys=None, load=None, batch_size=1000):
+        """Iterate over every row in sort order, batch_size rows at a time.
+
+        Rows are fetched with yield_per, so memory use does not grow with
+        the size of the table.
+        """
+        query = self._query(load) if query is None else query
+        sort_keys = sort_keys or [(self.model.id, False)]
+
+        return query.order_by(*order_by_clauses(sort_keys)).yield_per(
+            batch_size
+        )
 
     def update(self, obj, data):
         for key, value in data.items():
             setattr(obj, key, value)
-        db.session.commit()
-        db.session.refresh(obj)
+        commit()
+        if not in_transaction():
+            db.session.refresh(obj)
         return obj
 
     def delete(self, obj):
         db.session.delete(obj)
-        db.session.commit()
+        commit()
 
     def get_by_attribute(self, attr_name, attr_value):
         return self.model.query.filter_by(**{attr_name: attr_value}).first()
 
+    def exists(self, **criteria):
+        """True if a row has every attribute=value of criteria.
+
+        Runs as SELECT EXISTS, a single index probe when the criteria
+        columns are indexed; nothing is loaded into the session.
+        """
+        clauses = [
+            getattr(self.model, name) == value
+            for name, value in criteria.items()
+        ]
+        return db.session.execute(select(exists().where(*clauses))).scalar()
+
+    def collection_stats(self):
+        """(row count, latest updated_at), the validator of list responses.
+
+        Any insert, update or delete changes at least one of the two.
+        """
+        return tuple(
+            db.session.execute(
+                select(func.count(), func.max(self.model.updated_at))
+            ).one()
+        )
+
 
 class UserRepository(SQLAlchemyRepository):
     def __init__(self):
@@ -103,14 +304,335 @@ class UserRepository(SQLAlchemyRepository):
 
 
 class PlaceRepository(SQLAlchemyRepository):
+    SORT_KEYS = {
+        None: [(Place.id, False)],
+        "price": [(Place.price, False), (Place.id, False)],
+        "-price": [(Place.price, True), (Place.id, True)],
+        "created": [(Place.created_at, False), (Place.id, False)],
+        "rating": [(Place.rating_avg, True), (Place.id, True)],
+    }
+
     def __init__(self):
         super().__init__(Place)
 
+    def search(self, limit, cursor=None, load=None, **filters):
+        """Return a page of places matching every given filter.
+
+        See _search_query for the filters.
+        """
+        query, sort_keys = self._search_query(load, **filters)
+        return self.get_page(limit, cursor, query=query, sort_keys=sort_keys)
+
+    def stream_search(self, load=None, batch_size=1000, **filters):
+        """Iterate over every place matching the filters."""
+        query, sort_keys = self._search_query(load, **filters)
+        return self.stream(
+            query=query, sort_keys=sort_keys, batch_size=batch_size
+        )
+
+    def _search_query(
+        self,
+        load=None,
+        min_price=None,
+        max_price=None,
+        owner_id=None,
+        amenity_ids=(),
+        bbox=None,
+        sort=None,
+    ):
+        """Filtered query and sort keys of a place search.
+
+        bbox is a list of (min_lat, min_lon, max_lat, max_lon) boxes, see
+        app.persistence.geo.parse_bbox.
+        """
+        if sort not in self.SORT_KEYS:
+            raise ValueError(f"Invalid sort '{sort}'")
+
+        query = self._query(load)
+
+        if min_price is not None:
+            query = query.filter(Place.price >= min_price)
+        if max_price is not None:
+            query = query.filter(Place.price <= max_price)
+        if owner_id is not None:
+            query = query.filter(Place.owner_id == owner_id)
+        if bbox:
+            query = query.filter(self._within(bbox))
+
+        if amenity_ids:
+            query = query.filter(self._has_amenities(set(amenity_ids)))
+
+        return query, self.SORT_KEYS[sort]
+
+    @staticmethod
+    def _has_amenities(amenity_ids):
+        """Clause matching places that have every one of amenity_ids.
+
+        Amenities with a bit are tested together on Place.amenity_bits;
+        any without one falls back to a place_amenity primary key probe.
+        """
+        bits = dict(
+            db.session.execute(
+                select(Amenity.id, Amenity.bit).where(
+                    Amenity.id.in_(amenity_ids)
+                )
+            ).all()
+        )
+
+        # An unknown amenity is had by no place
+        if len(bits) < len(amenity_ids):
+            return false()
+
+        clauses = [
+            amenity_bits.has_bits(
+                Place.amenity_bits, amenity_bits.bit_mask(bits.values())
+            )
+        ]
+        clauses.extend(
+            exists().where(
+                PlaceAmenity.place_id == Place.id,
+                PlaceAmenity.amenity_id == amenity_id,
+            )
+            for amenity_id, bit in bits.items()
+            if bit is None
+        )
+
+        return and_(*clauses)
+
+    def amenity_facets(self, **filters):
+        """(amenity id, name, place count) over the places matching filters.
+
+        Counts of amenities with a bit come from one pass summing each bit
+        of Place.amenity_bits; the others are counted in place_amenity.
+        Most common first.
+        """
+        query, _ = self._search_query(**filters)
+        amenities = db.session.execute(
+            select(Amenity.id, Amenity.name, Amenity.bit)
+        ).all()
+        with_bit = [
+            amenity for amenity in amenities if amenity.bit is not None
+        ]
+        counts = {}
+
+        if with_bit:
+            row = query.with_entities(
+                *[
+                    amenity_bits.bit_count(Place.amenity_bits, amenity.bit)
+                    for amenity in with_bit
+                ]
+            ).one()
+            counts.update(zip([amenity.id for amenity in with_bit], row))
+
+        if len(with_bit) < len(amenities):
+            place_ids = query.with_entities(Place.id).subquery()
+            counts.update(
+                db.session.execute(
+                    select(PlaceAmenity.amenity_id, func.count())
+                    .join(Amenity, Amenity.id == PlaceAmenity.amenity_id)
+                    .where(
+                        Amenity.bit.is_(None),
+                        PlaceAmenity.place_id.in_(select(place_ids.c.id)),
+                    )
+                    .group_by(PlaceAmenity.amenity_id)
+                ).all()
+            )
+
+        facets = [
+            (amenity.id, amenity.name, counts.get(amenity.id, 0))
+            for amenity in amenities
+        ]
+        facets.sort(key=lambda facet: (-facet[2], facet[1], facet[0]))
+        return facets
+
+    def recompute_amenity_bits(self):
+        """Assign missing amenity bits and rebuild every place's bitset.
+
+        Returns the number of amenities that have a bit.
+        """
+        count = amenity_bits.recompute(db.session)
+        commit()
+
+        cache = entity_cache()
+        if cache is not None:
+            cache.clear()
+
+        return count
+
+    def adjust_rating(self, place_id, count_delta, sum_delta):
+        """Apply a review change to the rating aggregates of a place.
+
+        Runs as a single UPDATE computed from the stored values, so
+        concurrent reviews cannot lose increments. The caller commits.
+        """
+        count = Place.review_count + count_delta
+        total = Place.rating_sum + sum_delta
+        statement = (
+            sql_update(Place)
+            .where(Place.id == place_id)
+            .values(
+                version=Place.version + 1,
+                review_count=count,
+                rating_sum=total,
+                rating_avg=case(
+                    (count > 0, cast(total, Float) / count), else_=0.0
+                ),
+            )
+        )
+
+        # The review being written may not be in the session yet
+        with db.session.no_autoflush:
+            db.session.execute(statement)
+
+        mark_stale(db.session, "Place", place_id)
+
+    def recompute_ratings(self):
+        """Rebuild every place's rating aggregates from the review table.
+
+        Returns the number of places that have at least one review.
+        """
+        totals = db.session.execute(
+            select(Review.place_id, func.count(), func.sum(Review.rating))
+            .group_by(Review.place_id)
+        ).all()
+
+        # Also bumps every version: any place's aggregates may change
+        db.session.execute(
+            sql_update(Place).values(
+                version=Place.version + 1,
+                review_count=0,
+                rating_sum=0,
+                rating_avg=0.0,
+            )
+        )
+
+        if totals:
+            db.session.execute(
+                sql_update(Place),
+                [
+                    {
+                        "id": place_id,
+                        "review_count": count,
+                        "rating_sum": total,
+                        "rating_avg": total / count,
+                    }
+                    for place_id, count, total in totals
+                ],
+            )
+
+        commit()
+
+        cache = entity_cache()
+        if cache is not None:
+            cache.clear()
+
+        return len(totals)
+
+    def rebuild_search_index(self):
+        """Refill the full-text index from the place table."""
+        return place_search.rebuild(db.session)
+
+    def nearby(self, latitude, longitude, radius_km, limit, load=None):
+        """Return up to limit (place, distance_km) pairs, nearest first."""
+        candidates = db.session.query(
+            Place.id, Place.latitude, Place.longitude
+        ).filter(self._within(radius_bbox(latitude, longitude, radius_km)))
+
+        distances = (
+            (haversine_km(latitude, longitude, lat, lon), place_id)
+            for place_id, lat, lon in candidates
+        )
+        hits = heapq.nsmallest(
+            limit,
+            (hit for hit in distances if hit[0] <= radius_km),
+        )
+
+        if not hits:
+            return []
+
+        places = {
+            place.id: place
+            for place in self._query(load).filter(
+                Place.id.in_([place_id for _, place_id in hits])
+            )
+        }
+
+        return [
+            (places[place_id], distance)
+            for distance, place_id in hits
+            if place_id in places
+        ]
+
+    def full_text_search(self, q, limit, cursor=None, load=None):
+        """Return a page of (place, score, title, snippet) hits for q.
+
+        Hits are ranked by bm25, best first; title and snippet are HTML
+        with the matched words in <mark>. See app.persistence.search.
+        """
+        match = place_search.match_query(q)
+        after = decode_cursor(cursor, 2) if cursor else None
+        hits = place_search.search(match, limit + 1, after)
+        next_cursor = None
+
+        if len(hits) > limit:
+            hits = hits[:limit]
+            next_cursor = encode_cursor(list(hits[-1][::-1]))
+
+        place_ids = [place_id for place_id, _ in hits]
+        places = {place.id: place for place in self.get_many(place_ids, load)}
+        marked = place_search.highlights(match, place_ids)
+
+        return [
+            (places[place_id], score, *marked.get(place_id, (None, None)))
+            for place_id, score in hits
+            if place_id in places
+        ], next_cursor
+
+    @staticmethod
+    def _within(boxes):
+        """Clause matching places inside any of the boxes.
+
+        Geohash prefix ranges narrow the scan through ix_place_geohash, the
+        coordinate comparisons make the result exact.
+        """
+        clauses = []
+
+        for min_lat, min_lon, max_lat, max_lon in boxes:
+            cover = or_(
+                *[
+                    and_(Place.geohash >= prefix, Place.geohash < prefix + "~")
+                    for prefix in geohash_cover(
+                        min_lat, min_lon, max_lat, max_lon
+                    )
+                ]
+            )
+            clauses.append(
+                and_(
+                    cover,
+                    Place.latitude.between(min_lat, max_lat),
+                    Place.longitude.between(min_lon, max_lon),
+                )
+            )
+
+        return or_(*clauses)
+
 
 class ReviewRepository(SQLAlchemyRepository):
     def __init__(self):
         super().__init__(Review)
 
+    def get_place_ids_reviewed_by(self, user_id, place_ids):
+        """Subset of place_ids the user has already reviewed."""
+        if not place_ids:
+            return set()
+
+        rows = db.session.execute(
+            select(Review.place_id).where(
+                Review.user_id == user_id, Review.place_id.in_(place_ids)
+            )
+        )
+        return {place_id for place_id, in rows}
+
 
 class AmenityRepository(SQLAlchemyRepository):
     def __init__(self):
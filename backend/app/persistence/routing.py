@@ -0,0 +1,285 @@
+"""Read/write routing: a reader engine for safe requests, the primary for
+everything else.
+
+The reader engine is either
+
+- a replica, SQLALCHEMY_REPLICA_URI, kept up to date by replication or,
+  for a SQLite primary, by `flask sync-replica`; or
+- with a SQLite file primary and SQLITE_READER_POOL_SIZE > 0, a pool of
+  read-only connections to the same file, next to a writer pool limited
+  to SQLITE_WRITER_POOL_SIZE connections. In WAL mode these readers work
+  on the last committed snapshot and never wait for the writer.
+
+Safe-method requests (GET, HEAD, OPTIONS) and facade.read_only() blocks
+read from it; writes always go to the primary. A session that has
+flushed stays on the primary, so it reads its own writes, and with
+REPLICA_STICKY_SECONDS a client that wrote is served by the primary for
+that long (a cookie signed with JWT_SECRET_KEY, so that clients cannot
+pin themselves), hiding replication lag from it.
+
+Reads from a replica must not fill the shared caches: an entry filled
+after a write's invalidation would serve the replica's lag for the whole
+cache TTL (see reads_lag). The same-file reader pool does not lag. A
+client pinned to the primary also skips cache lookups (see
+pinned_to_primary), as another worker's in-memory caches may still hold
+what its write replaced.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, request
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, Signer
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+READ_ONLY_KEY = "routing_read_only"
+WROTE_KEY = "routing_wrote"
+PINNED_KEY = "routing_pinned"
+SAFE_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+STICKY_COOKIE = "primary_until"
+
+
+class RoutingSession(Session):
+    """Session reading from the reader engine when the request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and self._use_reader():
+            reader = current_app.extensions.get("sqlalchemy_reader")
+
+            if reader is not None:
+                return reader
+
+        return super().get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs
+        )
+
+    def _use_reader(self) -> bool:
+        return (
+            self.info.get(READ_ONLY_KEY, False)
+            and not self.info.get(WROTE_KEY, False)
+            and not self._flushing
+            and has_app_context()
+        )
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _stick_to_writer(session, _flush_context):
+    session.info[WROTE_KEY] = True
+
+
+@contextmanager
+def read_only():
+    """Read the enclosed queries from the reader engine, if any."""
+    from app import db
+
+    info = db.session.info
+    previous = info.get(READ_ONLY_KEY, False)
+    info[READ_ONLY_KEY] = True
+
+    try:
+        yield
+    finally:
+        info[READ_ONLY_KEY] = previous
+
+
+def reads_lag() -> bool:
+    """True when the session reads from a replica, which may lag."""
+    from app import db
+
+    return (
+        has_app_context()
+        and current_app.extensions.get("sqlalchemy_reader_lags", False)
+        and db.session()._use_reader()
+    )
+
+
+def pinned_to_primary() -> bool:
+    """True in requests of a client that wrote REPLICA_STICKY_SECONDS ago
+    or less.
+    """
+    from app import db
+
+    return has_app_context() and db.session.info.get(PINNED_KEY, False)
+
+
+def is_sqlite_file(uri) -> bool:
+    return (
+        isinstance(uri, str)
+        and uri.startswith("sqlite")
+        and ":memory:" not in uri
+        and uri.rstrip("/") not in ("sqlite:", "sqlite+pysqlite:")
+    )
+
+
+def sqlite_path(app, uri: str) -> str:
+    """File of a SQLite URI; relative to the instance folder, like the
+    paths of Flask-SQLAlchemy.
+    """
+    database = make_url(uri).database
+
+    if os.path.isabs(database):
+        return database
+
+    return os.path.join(app.instance_path, database)
+
+
+def configure(app) -> None:
+    """Size the writer pool; call before db.init_app."""
+    size = app.config.get("SQLITE_WRITER_POOL_SIZE")
+
+    if size and is_sqlite_file(app.config.get("SQLALCHEMY_DATABASE_URI")):
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+            "pool_size": size,
+            "max_overflow": 0,
+            "pool_timeout": app.config["SQLITE_POOL_TIMEOUT"],
+            **app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}),
+        }
+
+
+def set_pragmas(engine, pragmas: dict) -> None:
+    """Run PRAGMA name = value for each of pragmas on every new connection."""
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+        cursor.close()
+
+
+def reader_engine(app, uri: str):
+    """Engine for the reads; SQLite files are opened read-only."""
+    size = app.config.get("SQLITE_READER_POOL_SIZE")
+    options = {}
+
+    if size:
+        options.update(
+            pool_size=size,
+            max_overflow=0,
+            pool_timeout=app.config["SQLITE_POOL_TIMEOUT"],
+        )
+
+    if not is_sqlite_file(uri):
+        return create_engine(uri, **options)
+
+    url = make_url(uri)
+    engine = create_engine(
+        url.set(
+            database=f"file:{sqlite_path(app, uri)}",
+            query={**url.query, "mode": "ro", "uri": "true"},
+        ),
+        **options,
+    )
+    # journal_mode is a property of the file, set by its writer
+    set_pragmas(
+        engine,
+        {
+            name: value
+            for name, value in (app.config.get("SQLITE_PRAGMAS") or {}).items()
+            if name != "journal_mode"
+        },
+    )
+    return engine
+
+
+def init_app(app) -> None:
+    """Apply the PRAGMAs and create the reader engine; after db.init_app."""
+    from app import db
+
+    uri = app.config.get("SQLALCHEMY_DATABASE_URI")
+    replica_uri = app.config.get("SQLALCHEMY_REPLICA_URI")
+
+    if is_sqlite_file(uri):
+        with app.app_context():
+            writer = db.engine
+
+        set_pragmas(writer, app.config.get("SQLITE_PRAGMAS") or {})
+
+    if replica_uri:
+        reader = reader_engine(app, replica_uri)
+    elif is_sqlite_file(uri) and app.config.get("SQLITE_READER_POOL_SIZE"):
+        # The database must exist, in its journal mode, before it can be
+        # opened read-only
+        with writer.connect():
+            pass
+
+        reader = reader_engine(app, uri)
+    else:
+        return
+
+    app.extensions["sqlalchemy_reader"] = reader
+    app.extensions["sqlalchemy_reader_lags"] = bool(replica_uri)
+    app.extensions["routing_sticky_signer"] = Signer(
+        app.config["JWT_SECRET_KEY"], salt=STICKY_COOKIE
+    )
+    sticky_seconds = app.config.get("REPLICA_STICKY_SECONDS")
+
+    @app.before_request
+    def _route_safe_methods():
+        if request.method not in SAFE_METHODS:
+            return
+
+        cookie = request.cookies.get(STICKY_COOKIE)
+
+        if sticky_seconds and primary_until(app, cookie) > time.time():
+            db.session.info[PINNED_KEY] = True
+            return
+
+        db.session.info[READ_ONLY_KEY] = True
+
+    if not sticky_seconds:
+        return
+
+    @app.after_request
+    def _stick_after_write(response):
+        if db.session.registry.has() and db.session.info.get(WROTE_KEY):
+            signer = app.extensions["routing_sticky_signer"]
+            response.set_cookie(
+                STICKY_COOKIE,
+                signer.sign(str(int(time.time() + sticky_seconds))).decode(),
+                max_age=sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+
+def primary_until(app, cookie: str | None) -> float:
+    """Time until which the sticky cookie pins its client to the primary.
+
+    0 for a missing or forged cookie; never more than
+    REPLICA_STICKY_SECONDS from now.
+    """
+    signer = app.extensions.get("routing_sticky_signer")
+
+    if not cookie or signer is None:
+        return 0.0
+
+    try:
+        until = float(signer.unsign(cookie))
+    except (BadSignature, ValueError):
+        return 0.0
+
+    return min(until, time.time() + app.config["REPLICA_STICKY_SECONDS"])
+
+
+def copy_database(source: str, target: str) -> None:
+    """Copy a SQLite database into target as one consistent snapshot.
+
+    The copy is made with the online backup API, so neither the writers
+    of source nor the readers of target have to stop.
+    """
+    source_conn = sqlite3.connect(source)
+    target_conn = sqlite3.connect(target)
+
+    try:
+        source_conn.backup(target_conn)
+    finally:
+        target_conn.close()
+        source_conn.close()
@@ -0,0 +1,270 @@
+"""Full-text search over place titles and descriptions (SQLite FTS5).
+
+The place_search virtual table holds one document per place. Its rowid
+is a 64-bit hash of the place id (see docid), so a document is found,
+replaced or deleted by primary key without a lookup table, and VACUUM
+renumbering the place table cannot break the mapping.
+
+Place inserts, title/description updates and deletes are collected by
+mapper events and written to the index in one batch at the end of each
+flush, inside the same transaction. `flask rebuild-search-index` creates
+the table if needed and refills it from the place table, e.g. after rows
+were written around the ORM; the place table itself must have the
+current schema (see amenity_bits).
+"""
+import hashlib
+import html
+import re
+import weakref
+
+from sqlalchemy import DDL, event, inspect, text
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models.place import Place
+
+PENDING_KEY = "place_search_pending"
+
+# Columns: place_id (stored only), title, description
+CREATE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS place_search USING fts5("
+    "place_id UNINDEXED, title, description, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+# bm25 weight per column: a title match counts ten times a description one
+BM25 = "bm25(place_search, 0.0, 10.0, 1.0)"
+
+# Highlight markers, swapped for <mark> tags once the text is escaped
+MARK_START, MARK_END = "\x02", "\x03"
+SNIPPET_TOKENS = 16
+
+MAX_TERMS = 16
+TERM = re.compile(r"\w+\*?")
+
+event.listen(
+    db.metadata,
+    "after_create",
+    DDL(CREATE_TABLE).execute_if(dialect="sqlite"),
+)
+
+# Engines known to have the index, see is_available
+_available = weakref.WeakSet()
+
+
+def is_available(connection) -> bool:
+    """True if the database has the index (SQLite, created or rebuilt).
+
+    Only a found index is remembered: until then every call looks it up
+    in sqlite_master, so the workers start indexing as soon as `flask
+    rebuild-search-index` has created it in another process. Until the
+    index exists places are simply not indexed, and rebuild() catches up.
+    """
+    engine = connection.engine
+
+    if engine in _available:
+        return True
+
+    if engine.dialect.name != "sqlite":
+        return False
+
+    found = connection.execute(
+        text(
+            "SELECT 1 FROM sqlite_master"
+            " WHERE type = 'table' AND name = 'place_search'"
+        )
+    ).first()
+
+    if found:
+        _available.add(engine)
+
+    return found is not None
+
+
+def docid(place_id: str) -> int:
+    """Signed 64-bit rowid of a place's document."""
+    digest = hashlib.blake2b(place_id.encode("utf-8"), digest_size=8)
+    return int.from_bytes(digest.digest(), "big", signed=True)
+
+
+def match_query(q: str) -> str:
+    """FTS5 query matching every word of q.
+
+    Words are quoted so FTS5 operators in user input are taken literally;
+    a trailing * makes a word a prefix query ("vill*").
+    """
+    terms = TERM.findall(q)
+
+    if not terms:
+        raise ValueError("Search query must contain at least one word")
+    if len(terms) > MAX_TERMS:
+        raise ValueError(f"Search query is limited to {MAX_TERMS} words")
+
+    return " ".join(
+        f'"{term[:-1]}"*' if term.endswith("*") else f'"{term}"'
+        for term in terms
+    )
+
+
+def search(match: str, limit: int, after=None) -> list[tuple]:
+    """Up to limit (place_id, score) hits, best first, following after.
+
+    Scores are bm25 values (lower is better); after is the (score,
+    place_id) of the last hit of the previous page.
+    """
+    if not is_available(db.session.connection()):
+        raise ValueError(
+            "The search index is missing, run flask rebuild-search-index"
+        )
+
+    score, place_id = after if after else (None, None)
+    rows = db.session.execute(
+        text(
+            f"SELECT place_id, score FROM ("
+            f" SELECT place_id, {BM25} AS score FROM place_search"
+            f" WHERE place_search MATCH :match)"
+            f" WHERE :score IS NULL OR score > :score"
+            f" OR (score = :score AND place_id > :place_id)"
+            f" ORDER BY score, place_id LIMIT :limit"
+        ),
+        {
+            "match": match,
+            "score": score,
+            "place_id": place_id,
+            "limit": limit,
+        },
+    )
+    return [tuple(row) for row in rows]
+
+
+def highlights(match: str, place_ids) -> dict:
+    """{place_id: (title, snippet)} with matches wrapped in <mark>.
+
+    Computed for one page of hits only; the text is HTML-escaped.
+    """
+    if not place_ids:
+        return {}
+
+    rows = db.session.execute(
+        text(
+            f"SELECT place_id,"
+            f" highlight(place_search, 1, :start, :end),"
+            f" snippet(place_search, 2, :start, :end, '…',"
+            f" {SNIPPET_TOKENS})"
+            f" FROM place_search WHERE place_search MATCH :match"
+            f" AND rowid IN ({', '.join(map(str, map(docid, place_ids)))})"
+        ),
+        {"match": match, "start": MARK_START, "end": MARK_END},
+    )
+    return {
+        place_id: (_marked(title), _marked(snippet))
+        for place_id, title, snippet in rows
+    }
+
+
+def _marked(value: str) -> str:
+    return (
+        html.escape(value or "")
+        .replace(MARK_START, "<mark>")
+        .replace(MARK_END, "</mark>")
+    )
+
+
+def rebuild(session) -> int:
+    """(Re)create the index from the place table, return its size."""
+    if session.get_bind().dialect.name != "sqlite":
+        raise ValueError("Full-text search requires an SQLite database")
+
+    session.execute(text(CREATE_TABLE))
+    session.execute(text("DELETE FROM place_search"))
+
+    rows = session.execute(
+        text("SELECT id, title, description FROM place")
+    ).all()
+    _write(session, [], rows)
+    session.commit()
+    _available.add(session.get_bind())
+
+    return len(rows)
+
+
+def index_documents(session, documents) -> None:
+    """Add (place_id, title, description) documents written without the
+    ORM, e.g. by bulk imports; a no-op until the index exists.
+    """
+    if documents and is_available(session.connection()):
+        _write(session, [], documents)
+
+
+def _write(session, deleted_ids, documents) -> None:
+    if deleted_ids:
+        session.execute(
+            text("DELETE FROM place_search WHERE rowid = :rowid"),
+            [{"rowid": docid(place_id)} for place_id in deleted_ids],
+        )
+
+    if documents:
+        session.execute(
+            text(
+                "INSERT INTO place_search"
+                " (rowid, place_id, title, description)"
+                " VALUES (:rowid, :place_id, :title, :description)"
+            ),
+            [
+                {
+                    "rowid": docid(place_id),
+                    "place_id": place_id,
+                    "title": title,
+                    "description": description or "",
+                }
+                for place_id, title, description in documents
+            ],
+        )
+
+
+def _queue(connection, place, deleted=False) -> None:
+    """Queue the place's document, or its deletion, for the flush end."""
+    session = object_session(place)
+
+    if session is not None and is_available(connection):
+        session.info.setdefault(PENDING_KEY, {})[place.id] = (
+            None if deleted else (place.id, place.title, place.description)
+        )
+
+
+@event.listens_for(Place, "after_insert")
+def _index_new_place(mapper, connection, target):
+    _queue(connection, target)
+
+
+@event.listens_for(Place, "after_update")
+def _reindex_place(mapper, connection, target):
+    state = inspect(target)
+
+    if (
+        state.attrs.title.history.has_changes()
+        or state.attrs.description.history.has_changes()
+    ):
+        _queue(connection, target)
+
+
+@event.listens_for(Place, "after_delete")
+def _unindex_place(mapper, connection, target):
+    _queue(connection, target, deleted=True)
+
+
+@event.listens_for(Session, "after_flush")
+def _flush_index(session, _flush_context):
+    pending = session.info.pop(PENDING_KEY, None)
+
+    if pending:
+        _write(
+            session,
+            list(pending),
+            [document for document in pending.values() if document],
+        )
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
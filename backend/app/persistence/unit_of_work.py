@@ -0,0 +1,44 @@
+"""Unit of work: one transaction and one commit per business operation.
+
+Repositories and BaseModel call commit() after each write. Outside of a
+transaction() block that commits immediately, as before. Inside one, the
+write is only flushed and the outermost block commits once on success or
+rolls everything back on error, so nested facade calls join the
+enclosing transaction.
+"""
+from contextlib import contextmanager
+
+from app import db
+
+DEPTH_KEY = "unit_of_work_depth"
+
+
+def in_transaction() -> bool:
+    return db.session.info.get(DEPTH_KEY, 0) > 0
+
+
+@contextmanager
+def transaction():
+    session = db.session
+    depth = session.info.get(DEPTH_KEY, 0)
+    session.info[DEPTH_KEY] = depth + 1
+
+    try:
+        yield session
+
+        if depth == 0:
+            session.commit()
+    except BaseException:
+        if depth == 0:
+            session.rollback()
+        raise
+    finally:
+        session.info[DEPTH_KEY] = depth
+
+
+def commit() -> None:
+    """Commit now, or flush and defer to the enclosing transaction()."""
+    if in_transaction():
+        db.session.flush()
+    else:
+        db.session.commit()
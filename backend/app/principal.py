@@ -0,0 +1,72 @@
+"""Claims-backed current user for JWT-protected routes.
+
+Access tokens carry the user's id, which Principal serves without a
+query. The columns, is_admin included, come from a per-process TTL cache
+of user profiles: tokens do not expire, so is_admin is not taken from
+their claims, and update_user drops the profile so that a demotion
+applies at once in its process and after PRINCIPAL_CACHE_TTL in others.
+The ORM row is loaded only when something else (a relationship, a
+method, or assignment to a model) needs it.
+"""
+from flask import abort, current_app
+
+from app.cache import TTLCache
+from app.models.user import User
+from app.persistence.routing import pinned_to_primary, reads_lag
+
+USER_COLUMNS = frozenset(User.__table__.columns.keys())
+
+
+class Principal:
+    def __init__(self, user_id: str) -> None:
+        self.id = user_id
+        self._user = None
+
+    @property
+    def user(self) -> User:
+        """The full User row, loaded once per request."""
+        if self._user is None:
+            from app.services import facade
+
+            self._user = facade.get_user(self.id)
+
+            if not self._user:
+                abort(404, "User not found")
+
+        return self._user
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        if name in USER_COLUMNS:
+            return self._profile()[name]
+
+        return getattr(self.user, name)
+
+    def _profile(self) -> dict:
+        cache = profile_cache()
+        profile = None if pinned_to_primary() else cache.get(self.id)
+
+        if profile is None:
+            user = self.user
+            profile = {name: getattr(user, name) for name in USER_COLUMNS}
+
+            if not reads_lag():
+                cache.set(self.id, profile)
+
+        return profile
+
+
+def profile_cache() -> TTLCache:
+    return current_app.extensions["principal_cache"]
+
+
+def invalidate_principal(user_id: str) -> None:
+    profile_cache().pop(user_id)
+
+
+def init_app(app) -> None:
+    app.extensions["principal_cache"] = TTLCache(
+        app.config["PRINCIPAL_CACHE_SIZE"], app.config["PRINCIPAL_CACHE_TTL"]
+    )
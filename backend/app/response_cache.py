@@ -0,0 +1,277 @@
+"""Shared cache of rendered GET responses, invalidated by tag.
+
+Entries are (status, headers, body) tuples stored by
+app.api.v1.caching.cached_response and tagged with what they show, e.g.
+"places", "place:<id>", "amenity:<id>". Facade writes call
+invalidate_responses() with the tags they affect; inside a transaction
+the entries are dropped when it commits, and a fill that raced the write
+is discarded (see TaggedCache.add).
+
+Two backends are available (RESPONSE_CACHE_BACKEND):
+
+- "memory": a per-process LRU. Other workers only see an invalidation
+  when their own copy expires after RESPONSE_CACHE_TTL seconds.
+- "sqlite": a SQLite file shared by every worker on the host, in which an
+  invalidation is seen by all of them at once.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app import db
+from app.cache import TaggedCache
+from app.persistence.unit_of_work import in_transaction
+
+PENDING_KEY = "response_cache_pending"
+
+
+class MemoryResponseStore(TaggedCache):
+    """Per-process response cache."""
+
+
+class SQLiteResponseStore:
+    """Response cache in a SQLite file shared by the workers of a host.
+
+    Same interface as MemoryResponseStore. Each thread uses its own
+    connection; the database runs in WAL mode so readers never wait for
+    a writer.
+    """
+
+    # Expired and surplus entries are purged every PURGE_EVERY writes
+    PURGE_EVERY = 100
+
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS response ("
+        " key TEXT PRIMARY KEY, status INTEGER NOT NULL,"
+        " headers TEXT NOT NULL, body BLOB NOT NULL,"
+        " expires_at REAL NOT NULL)",
+        "CREATE INDEX IF NOT EXISTS ix_response_expires_at"
+        " ON response (expires_at)",
+        "CREATE TABLE IF NOT EXISTS response_tag ("
+        " tag TEXT NOT NULL, key TEXT NOT NULL,"
+        " PRIMARY KEY (tag, key)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS ix_response_tag_key"
+        " ON response_tag (key)",
+        "CREATE TABLE IF NOT EXISTS response_meta ("
+        " name TEXT PRIMARY KEY, value INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO response_meta VALUES ('generation', 0)",
+    )
+
+    def __init__(self, path: str, maxsize: int, ttl: float, timer=time.time):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._local = threading.local()
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+
+        with self._write() as conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+
+        return conn
+
+    @contextmanager
+    def _write(self):
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+        conn.execute("COMMIT")
+
+    @staticmethod
+    def _generation(conn) -> int:
+        return conn.execute(
+            "SELECT value FROM response_meta WHERE name = 'generation'"
+        ).fetchone()[0]
+
+    @property
+    def generation(self) -> int:
+        return self._generation(self._connection())
+
+    def get(self, key, default=None):
+        row = (
+            self._connection()
+            .execute(
+                "SELECT status, headers, body FROM response"
+                " WHERE key = ? AND expires_at > ?",
+                (key, self._timer()),
+            )
+            .fetchone()
+        )
+
+        if row is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        status, headers, body = row
+        return status, [tuple(header) for header in json.loads(headers)], body
+
+    def add(self, key, value, tags, generation: int) -> None:
+        """Store value under key unless an invalidation ran since."""
+        status, headers, body = value
+
+        with self._write() as conn:
+            if self._generation(conn) != generation:
+                return
+
+            conn.execute("DELETE FROM response_tag WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO response VALUES (?, ?, ?, ?, ?)",
+                (
+                    key,
+                    status,
+                    json.dumps(headers),
+                    body,
+                    self._timer() + self.ttl,
+                ),
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO response_tag VALUES (?, ?)",
+                [(tag, key) for tag in tags],
+            )
+
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge(conn)
+
+    def invalidate(self, tags) -> None:
+        tags = list(tags)
+        placeholders = ", ".join("?" * len(tags))
+        tagged = f"SELECT key FROM response_tag WHERE tag IN ({placeholders})"
+
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE response_meta SET value = value + 1"
+                " WHERE name = 'generation'"
+            )
+
+            if tags:
+                conn.execute(
+                    f"DELETE FROM response WHERE key IN ({tagged})", tags
+                )
+                conn.execute(
+                    f"DELETE FROM response_tag WHERE key IN ({tagged})", tags
+                )
+
+    def clear(self) -> None:
+        with self._write() as conn:
+            conn.execute(
+                "UPDATE response_meta SET value = value + 1"
+                " WHERE name = 'generation'"
+            )
+            conn.execute("DELETE FROM response")
+            conn.execute("DELETE FROM response_tag")
+
+    def _purge(self, conn) -> None:
+        conn.execute(
+            "DELETE FROM response WHERE expires_at <= ?", (self._timer(),)
+        )
+        conn.execute(
+            "DELETE FROM response WHERE key IN ("
+            " SELECT key FROM response ORDER BY expires_at"
+            " LIMIT max(0, (SELECT count(*) FROM response) - ?))",
+            (self.maxsize,),
+        )
+        conn.execute(
+            "DELETE FROM response_tag"
+            " WHERE key NOT IN (SELECT key FROM response)"
+        )
+
+    def stats(self) -> dict:
+        size = (
+            self._connection()
+            .execute("SELECT count(*) FROM response")
+            .fetchone()[0]
+        )
+        return {"size": size, "hits": self.hits, "misses": self.misses}
+
+
+def response_cache():
+    """The application's response store, or None if disabled."""
+    if not has_app_context():
+        return None
+
+    return current_app.extensions.get("response_cache")
+
+
+def invalidate_responses(*tags: str) -> None:
+    """Drop the responses tagged with any of tags, once committed."""
+    cache = response_cache()
+
+    if cache is None:
+        return
+
+    if in_transaction():
+        db.session.info.setdefault(PENDING_KEY, set()).update(tags)
+    else:
+        cache.invalidate(tags)
+
+
+def clear_responses() -> None:
+    cache = response_cache()
+
+    if cache is not None:
+        cache.clear()
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    pending = session.info.pop(PENDING_KEY, None)
+    cache = response_cache()
+
+    if cache is not None and pending:
+        cache.invalidate(pending)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+def init_app(app) -> None:
+    backend = app.config["RESPONSE_CACHE_BACKEND"]
+    size = app.config["RESPONSE_CACHE_SIZE"]
+    ttl = app.config["RESPONSE_CACHE_TTL"]
+
+    if backend is None:
+        return
+
+    if backend == "memory":
+        store = MemoryResponseStore(size, ttl)
+    elif backend == "sqlite":
+        path = app.config["RESPONSE_CACHE_PATH"]
+
+        if path is None:
+            os.makedirs(app.instance_path, exist_ok=True)
+            path = os.path.join(app.instance_path, "response_cache.sqlite3")
+
+        store = SQLiteResponseStore(path, size, ttl)
+    else:
+        raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND '{backend}'")
+
+    app.extensions["response_cache"] = store
@@ -1,3 +1,6 @@
+from collections import Counter
+from collections.abc import Iterator
+
 from app.persistence.repository import (
     AmenityRepository,
     PlaceRepository,
@@ -8,6 +11,18 @@ from app.models.amenity import Amenity
 from app.models.place import Place
 from app.models.review import Review
 from app.models.user import User
+from app.passwords import needs_rehash
+from app.persistence import bulk_export, bulk_import
+from app.persistence.integrity import unique_violation
+from app.persistence.routing import read_only
+from app.persistence.unit_of_work import transaction
+from app.principal import invalidate_principal
+from app.response_cache import clear_responses, invalidate_responses
+
+# Messages of the duplicates rejected by the unique constraints
+EMAIL_TAKEN = "Email already registered"
+AMENITY_TAKEN = "Amenity with the name '{}' already exists"
+ALREADY_REVIEWED = "You have already reviewed this place."
 
 
 class HBnBFacade:
@@ -17,84 +32,404 @@ class HBnBFacade:
         self.review_repo = ReviewRepository()
         self.amenity_repo = AmenityRepository()
 
+    def transaction(self):
+        """Run the enclosed facade calls in one transaction.
+
+        Writes are committed once when the outermost block exits and rolled
+        back if it raises; nested blocks join the enclosing transaction.
+        """
+        return transaction()
+
+    def read_only(self):
+        """Serve the enclosed facade reads from the read replica, if any.
+
+        Only for reads that may lag behind recent writes.
+        """
+        return read_only()
+
     # ------------------- User -------------------
 
     def create_user(self, user_data: dict) -> User:
         user = User(**user_data)
-        self.user_repo.add(user)
+
+        with self.transaction(), unique_violation(EMAIL_TAKEN):
+            self.user_repo.add(user)
+
         return user
 
-    def get_user(self, user_id: str) -> User | None:
-        return self.user_repo.get(user_id)
+    def get_user(self, user_id: str, snapshot: bool = False) -> User | None:
+        return self.user_repo.get(user_id, snapshot=snapshot)
 
     def get_user_by_email(self, email: str) -> User | None:
         return self.user_repo.get_user_by_email(email)
 
+    def authenticate_user(self, email: str, password: str) -> User | None:
+        """Return the user if the credentials match, else None.
+
+        Hashes made with an outdated bcrypt cost are upgraded on success.
+        """
+        user = self.user_repo.get_user_by_email(email)
+
+        if not user or not user.verify_password(password):
+            return None
+
+        if needs_rehash(user.password):
+            with self.transaction():
+                self.update_user(user, {"password": password})
+
+        return user
+
     def get_users(self) -> list[User]:
         return self.user_repo.get_all()
 
+    def get_users_page(
+        self, limit: int, cursor: str | None = None, load: str | None = None
+    ) -> tuple[list[User], str | None]:
+        return self.user_repo.get_page(limit, cursor, load=load)
+
+    def stream_users(self, load: str | None = None) -> Iterator[User]:
+        return self.user_repo.stream(load=load)
+
     def update_user(self, user: User, user_data: dict) -> User:
-        return self.user_repo.update(user, user_data)
+        with self.transaction(), unique_violation(EMAIL_TAKEN):
+            user = self.user_repo.update(user, user_data)
+            # Owners are embedded in every listed place
+            invalidate_responses("places", f"user:{user.id}")
+
+        invalidate_principal(user.id)
+        return user
 
     # ------------------- Amenity -------------------
 
     def create_amenity(self, amenity_data: dict) -> Amenity:
         amenity = Amenity(**amenity_data)
 
-        self.amenity_repo.add(amenity)
+        with self.transaction(), unique_violation(
+            AMENITY_TAKEN.format(amenity.name)
+        ):
+            self.amenity_repo.add(amenity)
+            invalidate_responses("amenities")
+
         return amenity
 
-    def get_amenity(self, amenity_id: str) -> Amenity | None:
-        return self.amenity_repo.get(amenity_id)
+    def get_amenity(
+        self, amenity_id: str, snapshot: bool = False
+    ) -> Amenity | None:
+        return self.amenity_repo.get(amenity_id, snapshot=snapshot)
+
+    def create_amenities(
+        self, amenities_data: list[dict]
+    ) -> list[Amenity | ValueError]:
+        """Validate and insert amenities in one transaction.
+
+        Returns, in input order, the created amenity or its validation error.
+        """
+        results = []
+
+        for amenity_data in amenities_data:
+            try:
+                results.append(Amenity(**amenity_data))
+            except (ValueError, TypeError) as e:
+                results.append(e)
+
+        with self.transaction(), unique_violation(
+            "An amenity of the batch already exists"
+        ):
+            self.amenity_repo.add_many(
+                [result for result in results if isinstance(result, Amenity)]
+            )
+            invalidate_responses("amenities")
+
+        return results
 
     def get_amenity_by_name(self, name: str) -> Amenity | None:
         return self.amenity_repo.get_by_attribute("name", name)
 
+    def get_amenities_by_names(self, names) -> list[Amenity]:
+        return self.amenity_repo.get_many_by_attribute("name", names)
+
     def get_all_amenities(self) -> list[Amenity]:
         return self.amenity_repo.get_all()
 
+    def stream_amenities(self) -> Iterator[Amenity]:
+        return self.amenity_repo.stream()
+
+    def get_amenities_stats(self) -> list[tuple]:
+        return [self.amenity_repo.collection_stats()]
+
     def update_amenity(self, amenity: Amenity, amenity_data: dict) -> Amenity:
-        return self.amenity_repo.update(amenity, amenity_data)
+        with self.transaction(), unique_violation(
+            AMENITY_TAKEN.format(amenity_data.get("name"))
+        ):
+            amenity = self.amenity_repo.update(amenity, amenity_data)
+            invalidate_responses(
+                "amenities", f"amenity:{amenity.id}", "places"
+            )
+
+        return amenity
 
     # ------------------- Places -------------------
 
     def create_place(self, place_data: dict) -> Place:
         place = Place(**place_data)
-        self.place_repo.add(place)
+
+        with self.transaction():
+            self.place_repo.add(place)
+            invalidate_responses("places")
 
         return place
 
-    def get_place(self, place_id: str) -> Place | None:
-        return self.place_repo.get(place_id)
+    def create_places(
+        self, places_data: list[dict]
+    ) -> list[Place | ValueError]:
+        """Validate and insert places in one transaction.
+
+        Each item may list amenity IDs under "amenities"; unknown IDs are
+        ignored as in single creation. Returns, in input order, the created
+        place or its validation error.
+        """
+        amenity_ids = {
+            amenity_id
+            for place_data in places_data
+            for amenity_id in place_data.get("amenities", ())
+        }
+        amenities = {
+            amenity.id: amenity
+            for amenity in self.amenity_repo.get_many(amenity_ids)
+        }
+        results = []
+
+        for place_data in places_data:
+            place_data = dict(place_data)
+            place_amenities = dict.fromkeys(place_data.pop("amenities", ()))
+
+            try:
+                place = Place(**place_data)
+            except (ValueError, TypeError) as e:
+                results.append(e)
+                continue
+
+            for amenity_id in place_amenities:
+                if amenity_id in amenities:
+                    place.add_amenity(amenities[amenity_id])
+
+            results.append(place)
+
+        with self.transaction():
+            self.place_repo.add_many(
+                [result for result in results if isinstance(result, Place)]
+            )
+            invalidate_responses("places")
+
+        return results
+
+    def get_place(
+        self, place_id: str, load: str | None = None, snapshot: bool = False
+    ) -> Place | None:
+        return self.place_repo.get(place_id, load=load, snapshot=snapshot)
 
     def get_all_places(self) -> list[Place]:
         return self.place_repo.get_all()
 
+    def get_amenities_by_ids(self, amenity_ids) -> list[Amenity]:
+        return self.amenity_repo.get_many(amenity_ids)
+
+    def get_places_by_ids(self, place_ids) -> list[Place]:
+        return self.place_repo.get_many(place_ids)
+
+    def get_places_page(
+        self, limit: int, cursor: str | None = None, load: str | None = None
+    ) -> tuple[list[Place], str | None]:
+        return self.place_repo.get_page(limit, cursor, load=load)
+
+    def search_places(
+        self,
+        limit: int,
+        cursor: str | None = None,
+        load: str | None = None,
+        **filters,
+    ) -> tuple[list[Place], str | None]:
+        return self.place_repo.search(limit, cursor, load=load, **filters)
+
+    def get_amenity_facets(self, **filters) -> list[tuple[str, str, int]]:
+        return self.place_repo.amenity_facets(**filters)
+
+    def search_places_text(
+        self,
+        q: str,
+        limit: int,
+        cursor: str | None = None,
+        load: str | None = None,
+    ) -> tuple[list[tuple], str | None]:
+        return self.place_repo.full_text_search(q, limit, cursor, load=load)
+
+    def stream_places(
+        self, load: str | None = None, **filters
+    ) -> Iterator[Place]:
+        return self.place_repo.stream_search(load=load, **filters)
+
+    def get_places_nearby(
+        self,
+        latitude: float,
+        longitude: float,
+        radius_km: float,
+        limit: int,
+        load: str | None = None,
+    ) -> list[tuple[Place, float]]:
+        return self.place_repo.nearby(
+            latitude, longitude, radius_km, limit, load=load
+        )
+
+    def get_places_stats(self) -> list[tuple]:
+        """Collection validators of place lists.
+
+        A listed place embeds its owner and amenities, so their tables
+        count as well; review changes reach the place via its aggregates.
+        """
+        return [
+            self.place_repo.collection_stats(),
+            self.user_repo.collection_stats(),
+            self.amenity_repo.collection_stats(),
+        ]
+
     def update_place(self, place: Place, place_data: dict) -> Place:
-        return self.place_repo.update(place, place_data)
+        with self.transaction():
+            place = self.place_repo.update(place, place_data)
+            invalidate_responses("places", f"place:{place.id}")
+
+        return place
 
     # ------------------- Review -------------------
 
     def create_review(self, review_data: dict) -> Review:
         review = Review(**review_data)
-        self.review_repo.add(review)
+
+        with self.transaction(), unique_violation(ALREADY_REVIEWED):
+            self.place_repo.adjust_rating(review.place.id, 1, review.rating)
+            self.review_repo.add(review)
+            invalidate_responses("places", f"place:{review.place.id}")
 
         return review
 
-    def get_review(self, review_id: str) -> Review | None:
-        return self.review_repo.get(review_id)
+    def create_reviews(
+        self, reviews_data: list[dict]
+    ) -> list[Review | ValueError]:
+        """Validate and insert reviews in one transaction.
+
+        Rating aggregates are adjusted once per reviewed place. Returns, in
+        input order, the created review or its validation error.
+        """
+        results = []
+
+        for review_data in reviews_data:
+            try:
+                results.append(Review(**review_data))
+            except (ValueError, TypeError) as e:
+                results.append(e)
+
+        reviews = [result for result in results if isinstance(result, Review)]
+        counts = Counter(review.place.id for review in reviews)
+        sums = Counter()
+
+        for review in reviews:
+            sums[review.place.id] += review.rating
+
+        with self.transaction(), unique_violation(ALREADY_REVIEWED):
+            for place_id, count in counts.items():
+                self.place_repo.adjust_rating(place_id, count, sums[place_id])
+
+            self.review_repo.add_many(reviews)
+            invalidate_responses(
+                "places", *(f"place:{place_id}" for place_id in counts)
+            )
+
+        return results
+
+    def has_reviewed(self, user_id: str, place_id: str) -> bool:
+        return self.review_repo.exists(user_id=user_id, place_id=place_id)
+
+    def get_reviewed_place_ids(self, user_id: str, place_ids) -> set[str]:
+        return self.review_repo.get_place_ids_reviewed_by(user_id, place_ids)
+
+    def get_review(
+        self, review_id: str, snapshot: bool = False
+    ) -> Review | None:
+        return self.review_repo.get(review_id, snapshot=snapshot)
 
     def get_all_reviews(self) -> list[Review]:
         return self.review_repo.get_all()
 
+    def get_reviews_page(
+        self, limit: int, cursor: str | None = None, load: str | None = None
+    ) -> tuple[list[Review], str | None]:
+        return self.review_repo.get_page(limit, cursor, load=load)
+
+    def stream_reviews(self, load: str | None = None) -> Iterator[Review]:
+        return self.review_repo.stream(load=load)
+
+    def get_reviews_stats(self) -> list[tuple]:
+        return [self.review_repo.collection_stats()]
+
     def get_reviews_by_place(self, place_id) -> list[Review]:
-        place: Place = self.place_repo.get(place_id)
+        place: Place = self.place_repo.get(place_id, load="reviews")
 
         return place.reviews if place else []
 
     def update_review(self, review, review_data) -> Review:
-        return self.review_repo.update(review, review_data)
+        with self.transaction():
+            if "rating" in review_data:
+                rating = review.validate_rating(
+                    "rating", review_data["rating"]
+                )
+                self.place_repo.adjust_rating(
+                    review.place_id, 0, rating - review.rating
+                )
+                # Place lists show the rating aggregates
+                invalidate_responses("places")
+
+            invalidate_responses(f"place:{review.place_id}")
+            return self.review_repo.update(review, review_data)
 
     def delete_review(self, review) -> bool:
-        self.review_repo.delete(review)
+        with self.transaction():
+            self.place_repo.adjust_rating(review.place_id, -1, -review.rating)
+            self.review_repo.delete(review)
+            invalidate_responses("places", f"place:{review.place_id}")
+
         return True
+
+    def recompute_place_ratings(self) -> int:
+        count = self.place_repo.recompute_ratings()
+        clear_responses()
+        return count
+
+    def recompute_amenity_bits(self) -> int:
+        count = self.place_repo.recompute_amenity_bits()
+        invalidate_responses("places")
+        return count
+
+    def rebuild_search_index(self) -> int:
+        count = self.place_repo.rebuild_search_index()
+        invalidate_responses("places")
+        return count
+
+    # ------------------- Bulk import -------------------
+
+    def import_file(self, kind: str, path: str, **options) -> dict:
+        """Bulk import a CSV or JSONL file of kind ("users", "places"...).
+
+        See app/persistence/bulk_import.py for the file layouts and options.
+        """
+        try:
+            return bulk_import.import_file(kind, path, **options)
+        finally:
+            clear_responses()
+
+    # ------------------- Bulk export -------------------
+
+    def export_tables(self, directory: str, **options) -> dict:
+        """Export tables to compressed JSONL, CSV or Parquet files.
+
+        See app/persistence/bulk_export.py for the layout and options.
+        """
+        return bulk_export.export_tables(directory, **options)
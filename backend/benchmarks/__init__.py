@@ -0,0 +1,13 @@
+"""Benchmarks, run from the backend directory, e.g.
+
+    python -m benchmarks.serialization
+
+- data: deterministic dataset generator (python -m benchmarks.data URI)
+- facade: HBnBFacade and serialization latency, in process
+- load: multi-process HTTP load over every API route
+- concurrency: read latency under writes, per SQLite profile
+
+facade and load write JSON reports (see report), compared with
+
+    python -m benchmarks.report before.json after.json
+"""
@@ -0,0 +1,173 @@
+"""Read latency under concurrent writes, default SQLite vs production profile.
+
+Reader processes page through GET /api/v1/places/ while writer processes
+post batches of places, each process being one app instance on the same
+database file, as gunicorn workers are. "default" is a plain SQLite file
+(rollback journal, one pool for everything); "production" applies the
+ProductionConfig profile: WAL, PRAGMAs, one writer connection and a
+read-only pool for GETs. Response and entity caches are disabled so every
+read reaches the database.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.passwords import PasswordHash
+from benchmarks.report import percentile
+from config import ProductionConfig
+
+# Stored as is, which skips hashing
+PASSWORD_HASH = PasswordHash("$2b$04$" + "a" * 53)
+
+# Time given to the spawned processes to import and build their app
+STARTUP_SECONDS = 5.0
+
+
+def profile_config(name: str, directory: str):
+    class BenchConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{directory}/{name}.db"
+        RESPONSE_CACHE_BACKEND = None
+        ENTITY_CACHE_MODELS = {}
+        JWT_SECRET_KEY = "benchmark-secret-" + "x" * 32
+        JWT_VERIFY_SUB = False
+
+    if name == "default":
+        BenchConfig.SQLITE_PRAGMAS = {}
+        BenchConfig.SQLITE_WRITER_POOL_SIZE = None
+        BenchConfig.SQLITE_READER_POOL_SIZE = 0
+
+    return BenchConfig
+
+
+def seed(config, places: int) -> str:
+    """Create the schema, an owner and places; return the owner's token."""
+    from app.models.place import Place
+    from app.models.user import User
+
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+        owner = User("Bench", "Owner", "owner@example.com", PASSWORD_HASH)
+        db.session.add(owner)
+        db.session.add_all(
+            Place(f"Place {index}", 50.0 + index % 300, 0.0, 0.0, owner)
+            for index in range(places)
+        )
+        db.session.commit()
+
+        return create_access_token(
+            identity={"id": owner.id, "is_admin": True}, expires_delta=False
+        )
+
+
+def reader(profile, window, results) -> None:
+    client = create_app(profile_config(*profile)).test_client()
+    start, deadline = window
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start - time.time()))
+
+    while time.time() < deadline:
+        started = time.perf_counter()
+        response = client.get("/api/v1/places/?limit=100")
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+
+    results.put(("read", latencies, errors))
+
+
+def writer(profile, token, batch: int, window, results) -> None:
+    client = create_app(profile_config(*profile)).test_client()
+    start, deadline = window
+    headers = {"Authorization": f"Bearer {token}"}
+    items = [
+        {"title": "Bench", "price": 10.0, "latitude": 0.0, "longitude": 0.0}
+        for _ in range(batch)
+    ]
+    latencies, errors = [], 0
+    time.sleep(max(0.0, start - time.time()))
+
+    while time.time() < deadline:
+        started = time.perf_counter()
+        response = client.post(
+            "/api/v1/places/batch", json={"items": items}, headers=headers
+        )
+        latencies.append(time.perf_counter() - started)
+        errors += response.status_code != 200
+
+    results.put(("write", latencies, errors))
+
+
+def run(name: str, args, directory: str) -> None:
+    # Processes are spawned, so they get the profile rather than the class
+    profile = (name, directory)
+    token = seed(profile_config(*profile), args.places)
+    results = multiprocessing.Queue()
+    # Measured from the same instant once every process has started
+    start = time.time() + STARTUP_SECONDS
+    window = (start, start + args.seconds)
+    processes = [
+        multiprocessing.Process(
+            target=reader, args=(profile, window, results)
+        )
+        for _ in range(args.readers)
+    ] + [
+        multiprocessing.Process(
+            target=writer,
+            args=(profile, token, args.batch, window, results),
+        )
+        for _ in range(args.writers)
+    ]
+
+    for process in processes:
+        process.start()
+
+    collected = {"read": ([], 0), "write": ([], 0)}
+
+    for _ in processes:
+        kind, latencies, errors = results.get()
+        total, failed = collected[kind]
+        collected[kind] = (total + latencies, failed + errors)
+
+    for process in processes:
+        process.join()
+
+    for kind, (latencies, errors) in collected.items():
+        if not latencies:
+            continue
+
+        ordered = sorted(latencies)
+        p50, p99 = percentile(ordered, 0.5), percentile(ordered, 0.99)
+        print(
+            f"{name:>10} {kind:>5}: {len(latencies) / args.seconds:7.1f}/s"
+            f"  p50 {p50 * 1000:7.1f} ms  p99 {p99 * 1000:7.1f} ms"
+            f"  max {ordered[-1] * 1000:7.1f} ms  errors {errors}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--places", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=200)
+    args = parser.parse_args()
+
+    # Forking after seeding would share the parent's connections
+    multiprocessing.set_start_method("spawn")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name in ("default", "production"):
+            run(name, args, directory)
+
+    print(f"cpus: {os.cpu_count()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""Deterministic benchmark dataset, built through the models.
+
+The same seed and sizes always give the same rows, ids and timestamps
+included, so runs on different commits measure the same data. The shape
+is meant to look like production rather than like a test fixture:
+
+- a few hosts own most places (Zipf-like), and places cluster around
+  cities, so geo and bbox queries hit dense and sparse areas;
+- nightly prices are log-normal, around 90 with a long tail;
+- amenities range from nearly universal (wifi) to rare (sauna);
+- reviews follow a power law, most places having a handful and a few
+  having hundreds, with ratings skewed towards 4 and 5.
+
+Every user has the password PASSWORD; ADMIN_EMAIL is an admin. Run as a
+script to create and fill a database, e.g.
+
+    python -m benchmarks.data sqlite:////tmp/bench.db --places 5000
+"""
+import argparse
+import random
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.review import Review
+from app.models.user import User
+from app.passwords import PasswordHash, hash_password
+from config import Config
+
+PASSWORD = "benchmark-password"
+ADMIN_EMAIL = "admin@example.com"
+
+SIZES = {"users": 1000, "places": 2000, "amenities": 30, "reviews": 10000}
+
+# Amenities from the most to the least common, with their share of places
+AMENITIES = [
+    ("Wifi", 0.92),
+    ("Kitchen", 0.78),
+    ("Heating", 0.74),
+    ("Washer", 0.61),
+    ("Air conditioning", 0.52),
+    ("Free parking", 0.44),
+    ("TV", 0.42),
+    ("Workspace", 0.35),
+    ("Coffee maker", 0.33),
+    ("Dishwasher", 0.28),
+    ("Balcony", 0.24),
+    ("Pets allowed", 0.2),
+    ("Dryer", 0.19),
+    ("Crib", 0.15),
+    ("Garden", 0.14),
+    ("Elevator", 0.13),
+    ("Self check-in", 0.12),
+    ("Bathtub", 0.1),
+    ("Gym", 0.08),
+    ("EV charger", 0.06),
+    ("Fireplace", 0.06),
+    ("BBQ grill", 0.05),
+    ("Pool", 0.05),
+    ("Hot tub", 0.04),
+    ("Beach access", 0.03),
+    ("Ski-in/ski-out", 0.02),
+    ("Piano", 0.02),
+    ("Sauna", 0.02),
+    ("Lake access", 0.01),
+    ("Home cinema", 0.01),
+]
+
+# (name, latitude, longitude, weight)
+CITIES = [
+    ("Paris", 48.857, 2.352, 10),
+    ("London", 51.507, -0.128, 9),
+    ("New York", 40.713, -74.006, 9),
+    ("Tokyo", 35.676, 139.650, 7),
+    ("Barcelona", 41.385, 2.173, 6),
+    ("Lisbon", 38.722, -9.139, 4),
+    ("Berlin", 52.520, 13.405, 4),
+    ("Mexico City", 19.433, -99.133, 3),
+    ("Cape Town", -33.925, 18.424, 2),
+    ("Sydney", -33.869, 151.209, 2),
+    ("Reykjavik", 64.147, -21.942, 1),
+    ("Montevideo", -34.901, -56.164, 1),
+]
+
+FIRST_NAMES = [
+    "Alex", "Amira", "Ana", "Ben", "Chen", "Chloe", "David", "Elena",
+    "Emma", "Hugo", "Ines", "Jonas", "Kenji", "Lea", "Lucas", "Maria",
+    "Mohamed", "Nina", "Omar", "Priya", "Sam", "Sofia", "Tom", "Yuki",
+]
+LAST_NAMES = [
+    "Bauer", "Costa", "Dubois", "Garcia", "Haddad", "Ito", "Jensen",
+    "Khan", "Kowalski", "Martin", "Moreau", "Nguyen", "Novak", "Okafor",
+    "Rossi", "Santos", "Schmidt", "Silva", "Smith", "Tanaka",
+]
+
+ADJECTIVES = [
+    "Bright", "Charming", "Cosy", "Quiet", "Spacious", "Modern", "Rustic",
+    "Sunny", "Elegant", "Hidden", "Historic", "Minimalist",
+]
+KINDS = [
+    "studio", "loft", "apartment", "flat", "house", "cottage", "room",
+    "penthouse", "townhouse", "cabin",
+]
+FEATURES = [
+    "a view over the rooftops",
+    "a sunny terrace",
+    "high ceilings and wooden floors",
+    "a fully equipped kitchen",
+    "a quiet courtyard",
+    "fast wifi for remote work",
+    "a garden with a barbecue",
+    "a short walk to the metro",
+    "original artwork on the walls",
+    "a rooftop pool",
+    "blackout curtains and a king-size bed",
+    "bikes available for guests",
+]
+REVIEW_TEXTS = {
+    1: ["Not as described.", "Dirty and noisy, avoid."],
+    2: ["Disappointing stay.", "The host never answered."],
+    3: ["Fine for a night.", "Good location but tired decor."],
+    4: ["Lovely place, would come back.", "Comfortable and clean."],
+    5: ["Perfect stay!", "Wonderful host and an amazing view."],
+}
+RATING_WEIGHTS = {1: 3, 2: 5, 3: 12, 4: 35, 5: 45}
+
+START = datetime(2024, 1, 1)
+YEAR_MINUTES = 365 * 24 * 60
+
+
+def _uuid(rng) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _stamp(obj, rng) -> None:
+    """Deterministic id and creation time over one year."""
+    obj.id = _uuid(rng)
+    obj.created_at = START + timedelta(minutes=rng.randrange(YEAR_MINUTES))
+    obj.updated_at = obj.created_at
+
+
+def build_users(rng, count: int, password_hash: str) -> list[User]:
+    users = [User("Ada", "Admin", ADMIN_EMAIL, password_hash, is_admin=True)]
+
+    for index in range(1, count):
+        users.append(
+            User(
+                rng.choice(FIRST_NAMES),
+                rng.choice(LAST_NAMES),
+                f"user{index}@example.com",
+                password_hash,
+            )
+        )
+
+    for user in users:
+        _stamp(user, rng)
+
+    return users
+
+
+def build_amenities(rng, count: int) -> list[tuple[Amenity, float]]:
+    """Amenities with the share of places having each."""
+    amenities = []
+
+    for index in range(count):
+        if index < len(AMENITIES):
+            name, share = AMENITIES[index]
+        else:
+            name, share = f"Amenity {index}", 0.01
+
+        amenity = Amenity(name)
+        _stamp(amenity, rng)
+        amenities.append((amenity, share))
+
+    return amenities
+
+
+def build_places(rng, count: int, users, amenities) -> list[Place]:
+    # About one user in five hosts, a few of them owning most places
+    hosts = users[1 : max(2, len(users) // 5)]
+    host_weights = [1 / rank for rank in range(1, len(hosts) + 1)]
+    city_weights = [city[3] for city in CITIES]
+    owners = rng.choices(hosts, host_weights, k=count)
+    places = []
+
+    for owner in owners:
+        city, latitude, longitude, _ = rng.choices(CITIES, city_weights)[0]
+        kind = rng.choice(KINDS)
+        place = Place(
+            f"{rng.choice(ADJECTIVES)} {kind} in {city}",
+            round(min(5000.0, rng.lognormvariate(4.5, 0.6)), 2),
+            max(-90.0, min(90.0, rng.gauss(latitude, 0.05))),
+            max(-180.0, min(180.0, rng.gauss(longitude, 0.07))),
+            owner,
+            description=(
+                f"A {kind} with {rng.choice(FEATURES)} and "
+                f"{rng.choice(FEATURES)}."
+            ),
+        )
+        place.amenities = [
+            amenity for amenity, share in amenities if rng.random() < share
+        ]
+        _stamp(place, rng)
+        places.append(place)
+
+    return places
+
+
+def build_reviews(rng, count: int, users, places) -> list[Review]:
+    """About count reviews, one per user and place, never by the owner."""
+    popularity = [rng.paretovariate(1.2) for _ in places]
+    counts = Counter(rng.choices(range(len(places)), popularity, k=count))
+    ratings = list(RATING_WEIGHTS)
+    rating_weights = list(RATING_WEIGHTS.values())
+    reviews = []
+
+    for index in sorted(counts):
+        place = places[index]
+        wanted = min(counts[index], len(users) - 1)
+        reviewers = [
+            user
+            for user in rng.sample(users, min(wanted + 1, len(users)))
+            if user is not place.owner
+        ][:wanted]
+
+        for user in reviewers:
+            rating = rng.choices(ratings, rating_weights)[0]
+            review = Review(
+                rng.choice(REVIEW_TEXTS[rating]), rating, place, user
+            )
+            _stamp(review, rng)
+            review.created_at = max(review.created_at, place.created_at)
+            review.updated_at = review.created_at
+            reviews.append(review)
+
+        # Aggregates the facade would maintain review by review
+        place.review_count = len(reviewers)
+        place.rating_sum = sum(review.rating for review in place.reviews)
+        place.rating_avg = (
+            place.rating_sum / place.review_count
+            if place.review_count
+            else 0.0
+        )
+
+    return reviews
+
+
+def generate(session, seed: int = 0, **sizes) -> dict:
+    """Add a dataset of SIZES (overridden by sizes) and commit it.
+
+    Needs an app context. Returns the row counts actually created.
+    """
+    sizes = {**SIZES, **sizes}
+    rng = random.Random(seed)
+    # Hashed once for every user
+    password_hash = PasswordHash(hash_password(PASSWORD))
+    users = build_users(rng, max(2, sizes["users"]), password_hash)
+    amenities = build_amenities(rng, sizes["amenities"])
+    places = build_places(rng, sizes["places"], users, amenities)
+    reviews = build_reviews(rng, sizes["reviews"], users, places)
+
+    session.add_all(users)
+    session.add_all(amenity for amenity, _ in amenities)
+    session.add_all(places)
+    session.add_all(reviews)
+    session.commit()
+
+    return {
+        "users": len(users),
+        "amenities": len(amenities),
+        "places": len(places),
+        "reviews": len(reviews),
+    }
+
+
+def bench_config(database_uri: str, base=Config):
+    """base configured for database_uri, with a fixed JWT secret."""
+
+    class BenchConfig(base):
+        SQLALCHEMY_DATABASE_URI = database_uri
+        SQLALCHEMY_TRACK_MODIFICATIONS = False
+        JWT_SECRET_KEY = "benchmark-secret-" + "x" * 32
+        JWT_VERIFY_SUB = False
+
+    return BenchConfig
+
+
+def create_database(config, seed: int = 0, **sizes) -> dict:
+    """Create the schema of config's database and fill it."""
+    app = create_app(config)
+
+    with app.app_context():
+        db.create_all()
+        return generate(db.session, seed, **sizes)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("database_uri", help="e.g. sqlite:////tmp/bench.db")
+    parser.add_argument("--seed", type=int, default=0)
+
+    for name, default in SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+
+    args = parser.parse_args()
+    sizes = {name: getattr(args, name) for name in SIZES}
+    print(create_database(bench_config(args.database_uri), args.seed, **sizes))
+
+
+if __name__ == "__main__":
+    main()
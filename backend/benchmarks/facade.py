@@ -0,0 +1,236 @@
+"""In-process latency of HBnBFacade methods and response serialization.
+
+Builds the benchmarks.data dataset in a temporary SQLite file (or uses
+--database, already filled by benchmarks.data), then calls each operation
+for --seconds. Arguments are prepared outside the timed call and the
+session is removed after it, as at the end of a request. The entity and
+response caches are disabled unless --cached, so reads reach the
+database. Writes go through the facade as the endpoints do (review post,
+place creation and update) and stay in the database.
+
+    python -m benchmarks.facade --output facade.json
+"""
+import argparse
+import itertools
+import random
+import tempfile
+import time
+
+from sqlalchemy import select
+
+from app import create_app, db
+from app.api.v1 import serializers
+from app.api.v1.serializers import PLACE, PLACE_DETAIL, REVIEW
+from app.models.place import Place
+from app.models.user import User
+from app.services import facade
+from benchmarks import data
+from benchmarks.report import report, summarize, write
+
+PAGE_SIZE = 50
+# Paris, the densest city of the dataset
+LATITUDE, LONGITUDE = 48.857, 2.352
+
+
+def measure(run, prepare=None, seconds: float = 1.0, min_calls=5) -> dict:
+    """Call run(*prepare()) for seconds, timing run only."""
+    latencies = []
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline or len(latencies) < min_calls:
+        args = prepare() if prepare else ()
+        started = time.perf_counter()
+        run(*args)
+        latencies.append(time.perf_counter() - started)
+        db.session.remove()
+
+    return summarize(latencies, sum(latencies))
+
+
+def fixtures(rng) -> dict:
+    place_ids = db.session.scalars(select(Place.id).order_by(Place.id)).all()
+    emails = db.session.scalars(select(User.email).order_by(User.id)).all()
+    amenities = facade.get_amenities_by_names(["Wifi", "Kitchen"])
+    rng.shuffle(place_ids)
+    rng.shuffle(emails)
+
+    return {
+        "place_ids": itertools.cycle(place_ids),
+        "emails": itertools.cycle(emails),
+        "amenity_ids": [amenity.id for amenity in amenities],
+        "counter": itertools.count(),
+    }
+
+
+def operations(fixture) -> dict:
+    """Name -> (run, prepare) of every measured operation."""
+    place_ids = fixture["place_ids"]
+    counter = fixture["counter"]
+    search = {
+        "min_price": 60.0,
+        "max_price": 150.0,
+        "amenity_ids": fixture["amenity_ids"],
+        "sort": "price",
+    }
+
+    def place(load=None):
+        return lambda: (facade.get_place(next(place_ids), load=load),)
+
+    def places_page():
+        return (facade.get_places_page(PAGE_SIZE, load="list")[0],)
+
+    def new_reviewer():
+        return facade.create_user(
+            {
+                "first_name": "Bench",
+                "last_name": "Reviewer",
+                "email": f"reviewer{next(counter)}@example.com",
+                "password": data.PASSWORD,
+            }
+        )
+
+    # A new reviewer for each round over the places keeps pairs unique
+    reviewers = (
+        (reviewer_id, place_id)
+        for reviewer_id in iter(lambda: new_reviewer().id, None)
+        for place_id in db.session.scalars(select(Place.id)).all()
+    )
+
+    def review_data():
+        user_id, place_id = next(reviewers)
+        return (
+            {
+                "text": "Great stay",
+                "rating": 4,
+                "place": facade.get_place(place_id),
+                "user": facade.get_user(user_id),
+            },
+        )
+
+    def place_data():
+        owner = facade.get_user_by_email(next(fixture["emails"]))
+        return (
+            {
+                "title": "Benchmark loft",
+                "price": 120.0,
+                "latitude": LATITUDE,
+                "longitude": LONGITUDE,
+                "owner": owner,
+            },
+        )
+
+    return {
+        "get_place": (facade.get_place, lambda: (next(place_ids),)),
+        "get_place_detail": (
+            lambda place_id: facade.get_place(place_id, load="detail"),
+            lambda: (next(place_ids),),
+        ),
+        "get_places_page": (
+            lambda: facade.get_places_page(PAGE_SIZE, load="list"),
+            None,
+        ),
+        "search_places": (
+            lambda: facade.search_places(PAGE_SIZE, load="list", **search),
+            None,
+        ),
+        "get_amenity_facets": (
+            lambda: facade.get_amenity_facets(min_price=60.0), None
+        ),
+        "get_places_nearby": (
+            lambda: facade.get_places_nearby(
+                LATITUDE, LONGITUDE, 5.0, PAGE_SIZE, load="list"
+            ),
+            None,
+        ),
+        "search_places_text": (
+            lambda: facade.search_places_text(
+                "cosy loft", PAGE_SIZE, load="list"
+            ),
+            None,
+        ),
+        "get_reviews_by_place": (
+            facade.get_reviews_by_place,
+            lambda: (next(place_ids),),
+        ),
+        "get_users_page": (lambda: facade.get_users_page(PAGE_SIZE), None),
+        "get_places_stats": (facade.get_places_stats, None),
+        "authenticate_user": (
+            facade.authenticate_user,
+            lambda: (next(fixture["emails"]), data.PASSWORD),
+        ),
+        "create_review": (facade.create_review, review_data),
+        "create_place": (facade.create_place, place_data),
+        "update_place": (
+            lambda place: facade.update_place(
+                place, {"price": round(place.price + 1.0, 2)}
+            ),
+            place(),
+        ),
+        "serialize_place_page": (PLACE.many, places_page),
+        "serialize_place_detail": (PLACE_DETAIL, place("detail")),
+        "serialize_reviews": (
+            REVIEW.many,
+            lambda: (facade.get_reviews_by_place(next(place_ids)),),
+        ),
+        "dumps_place_page": (
+            serializers.dumps,
+            lambda: ({"items": PLACE.many(places_page()[0])},),
+        ),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--database", help="Database filled by benchmarks.data"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--seconds", type=float, default=1.0)
+    parser.add_argument("--cached", action="store_true")
+    parser.add_argument(
+        "--only", action="append", help="Operation to run (repeatable)"
+    )
+    parser.add_argument("--output", help="Report file, default stdout")
+
+    for name, default in data.SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+
+    args = parser.parse_args()
+    sizes = {name: getattr(args, name) for name in data.SIZES}
+
+    with tempfile.TemporaryDirectory() as directory:
+        uri = args.database or f"sqlite:///{directory}/bench.db"
+        config = data.bench_config(uri)
+
+        if not args.cached:
+            config.ENTITY_CACHE_MODELS = {}
+            config.RESPONSE_CACHE_BACKEND = None
+
+        if not args.database:
+            data.create_database(config, args.seed, **sizes)
+
+        app = create_app(config)
+        results = {}
+
+        with app.app_context():
+            fixture = fixtures(random.Random(args.seed))
+
+            for name, (run, prepare) in operations(fixture).items():
+                if args.only and name not in args.only:
+                    continue
+
+                results[name] = measure(run, prepare, args.seconds)
+
+    params = {
+        "database": args.database or "sqlite (temporary file)",
+        "seed": args.seed,
+        "sizes": None if args.database else sizes,
+        "seconds": args.seconds,
+        "cached": args.cached,
+        "orjson": serializers.orjson is not None,
+    }
+    write(report("facade", params, results), args.output)
+
+
+if __name__ == "__main__":
+    main()
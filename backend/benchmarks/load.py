@@ -0,0 +1,657 @@
+"""HTTP load test of every route of app/api/v1.
+
+Worker processes each keep one connection to the server and send requests
+back to back for --seconds, choosing routes by the weights of ROUTES
+(mostly reads, as in production). Every endpoint and method is covered:
+writes go through a reviewer account created for each worker, which
+posts, updates and deletes its own reviews. The API cannot delete
+places, amenities or users, so the CREATES routes leave their rows
+behind; amenities in particular use up the amenity bits (see
+app/persistence/amenity_bits.py), after which searches and facets take
+a slower plan. The report gives the throughput and p50/p95/p99 latency
+of each route, see benchmarks/report.py.
+
+Without --url the driver fills a temporary SQLite database with
+benchmarks.data and serves it with werkzeug's threaded server, so every
+run starts from the same data. With --url it targets a running server
+(e.g. gunicorn) whose database was filled by benchmarks.data; the
+CREATES routes are then left out unless --creates is given, so runs on
+the same database stay comparable. Each run still adds one reviewer
+account per worker.
+
+    python -m benchmarks.load --processes 4 --seconds 30 --output load.json
+    python -m benchmarks.load --only login --only review_post
+"""
+import argparse
+import http.client
+import json
+import logging
+import multiprocessing
+import random
+import socket
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks import data
+from benchmarks.report import report, summarize, write
+
+API = "/api/v1"
+PAGE_SIZE = 50
+LATITUDE, LONGITUDE = 48.857, 2.352
+
+# Route -> relative weight in the mix; the review_* routes are exercised
+# together by one post/update/delete cycle, as are the batch deletes
+ROUTES = {
+    "places_list": 10,
+    "places_search": 5,
+    "places_facets": 2,
+    "places_nearby": 3,
+    "places_text_search": 3,
+    "place_detail": 15,
+    "place_reviews": 5,
+    "place_post": 1,
+    "place_put": 1,
+    "places_batch": 0.5,
+    "reviews_list": 2,
+    "review_detail": 3,
+    "review_post": 3,
+    "reviews_batch": 0.5,
+    "users_list": 1,
+    "user_detail": 3,
+    "user_post": 0.2,
+    "user_put": 1,
+    "amenities_list": 2,
+    "amenity_detail": 2,
+    "amenity_post": 0.5,
+    "amenity_put": 0.5,
+    "amenities_batch": 0.2,
+    "login": 2,
+    "protected": 1,
+}
+
+
+# Routes whose rows persist: there are no DELETE routes for them (the
+# updates create their first target)
+CREATES = frozenset(
+    {
+        "place_post",
+        "place_put",
+        "places_batch",
+        "user_post",
+        "amenity_post",
+        "amenity_put",
+        "amenities_batch",
+    }
+)
+
+
+class Client:
+    """Keep-alive JSON client timing each request under a route name."""
+
+    def __init__(self, url: str):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.connection = None
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, method, path, body=None, token=None):
+        """(status, decoded JSON body or None); raises OSError."""
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(
+                self.host, self.port, timeout=60
+            )
+
+        headers = {}
+
+        if body is not None:
+            body = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+
+        if token is not None:
+            headers["Authorization"] = f"Bearer {token}"
+
+        try:
+            self.connection.request(
+                method, self.prefix + API + path, body, headers
+            )
+            response = self.connection.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            raise
+
+        if response.getheader("Connection", "").lower() == "close":
+            self.connection.close()
+            self.connection = None
+
+        try:
+            return response.status, json.loads(payload) if payload else None
+        except ValueError:
+            return response.status, None
+
+    def timed(self, route, method, path, body=None, token=None):
+        """Request recorded under route; the body, or None on failure."""
+        started = time.perf_counter()
+
+        try:
+            status, payload = self.request(method, path, body, token)
+        except (OSError, http.client.HTTPException):
+            status, payload = None, None
+
+        self.latencies[route].append(time.perf_counter() - started)
+
+        if status is None or status >= 400:
+            self.errors[route] += 1
+            return None
+
+        return payload if payload is not None else {}
+
+    def login(self, email, password, route=None) -> str | None:
+        body = {"email": email, "password": password}
+
+        if route is None:
+            status, payload = self.request("POST", "/login", body)
+            return payload["access_token"] if status == 200 else None
+
+        payload = self.timed(route, "POST", "/login", body)
+        return payload["access_token"] if payload else None
+
+
+def discover(url: str, admin_token: str) -> dict:
+    """Ids of existing entities, read through the API."""
+    client = Client(url)
+
+    def items(path):
+        status, payload = client.request("GET", path, token=admin_token)
+        assert status == 200, f"GET {path}: {status}"
+        return payload["items"] if isinstance(payload, dict) else payload
+
+    places = items("/places/?limit=500")
+    users = items("/users/?limit=500")
+
+    return {
+        "places": [(place["id"], place["owner"]["id"]) for place in places],
+        "users": [(user["id"], user["email"]) for user in users],
+        "amenities": [amenity["id"] for amenity in items("/amenities/")],
+        "reviews": [review["id"] for review in items("/reviews?limit=500")],
+    }
+
+
+class Worker:
+    """One process of the load: its client, accounts and route handlers."""
+
+    def __init__(self, url, admin_token, fixtures, index, run_id, seed):
+        self.client = Client(url)
+        self.admin_token = admin_token
+        self.fixtures = fixtures
+        self.rng = random.Random(seed * 1000 + index)
+        self.tag = f"{run_id}-{index}"
+        self.counter = 0
+        self.own_places = []
+        self.own_amenities = []
+        self.email = f"load-{self.tag}@example.com"
+        status, payload = self.client.request(
+            "POST",
+            "/users/",
+            {
+                "first_name": "Load",
+                "last_name": "Reviewer",
+                "email": self.email,
+                "password": data.PASSWORD,
+            },
+            self.admin_token,
+        )
+        assert status == 201, f"creating the reviewer: {status} {payload}"
+        self.user_id = payload["id"]
+        self.token = self.client.login(self.email, data.PASSWORD)
+
+    def _next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+    def _place_id(self) -> str:
+        return self.rng.choice(self.fixtures["places"])[0]
+
+    def _get(self, route, path, **params):
+        if params:
+            path = f"{path}?{urlencode(params, doseq=True)}"
+
+        return self.client.timed(route, "GET", path)
+
+    # ------------------- Places -------------------
+
+    def places_list(self):
+        self._get("places_list", "/places/", limit=PAGE_SIZE)
+
+    def places_search(self):
+        amenities = self.fixtures["amenities"][:2]
+        self._get(
+            "places_search",
+            "/places/",
+            limit=PAGE_SIZE,
+            min_price=self.rng.choice((40, 60, 80)),
+            max_price=self.rng.choice((120, 150, 200)),
+            amenity_id=amenities,
+            sort=self.rng.choice(("price", "-price", "rating", "created")),
+        )
+
+    def places_facets(self):
+        self._get(
+            "places_facets",
+            "/places/facets",
+            min_price=self.rng.choice((40, 60, 80)),
+        )
+
+    def places_nearby(self):
+        self._get(
+            "places_nearby",
+            "/places/nearby",
+            lat=LATITUDE + self.rng.uniform(-0.05, 0.05),
+            lon=LONGITUDE + self.rng.uniform(-0.05, 0.05),
+            radius_km=self.rng.choice((1, 2, 5)),
+            limit=PAGE_SIZE,
+        )
+
+    def places_text_search(self):
+        query = self.rng.choice(("cosy loft", "terrace", "garden", "stu*"))
+        self._get("places_text_search", "/places/search", q=query)
+
+    def place_detail(self):
+        self._get("place_detail", f"/places/{self._place_id()}")
+
+    def place_reviews(self):
+        self._get("place_reviews", f"/places/{self._place_id()}/reviews")
+
+    def _place(self):
+        return {
+            "title": f"Load place {self.tag} {self._next()}",
+            "description": "A loft with a sunny terrace.",
+            "price": round(self.rng.uniform(40, 300), 2),
+            "latitude": LATITUDE + self.rng.uniform(-0.1, 0.1),
+            "longitude": LONGITUDE + self.rng.uniform(-0.1, 0.1),
+            "amenities": self.fixtures["amenities"][:3],
+        }
+
+    def place_post(self):
+        payload = self.client.timed(
+            "place_post", "POST", "/places/", self._place(), self.token
+        )
+
+        if payload:
+            self.own_places.append(payload["id"])
+
+    def place_put(self):
+        if not self.own_places:
+            return self.place_post()
+
+        self.client.timed(
+            "place_put",
+            "PUT",
+            f"/places/{self.rng.choice(self.own_places)}",
+            {"price": round(self.rng.uniform(40, 300), 2)},
+            self.token,
+        )
+
+    def places_batch(self):
+        payload = self.client.timed(
+            "places_batch",
+            "POST",
+            "/places/batch",
+            {"items": [self._place() for _ in range(5)]},
+            self.token,
+        )
+
+        if payload:
+            self.own_places.extend(
+                result["id"]
+                for result in payload["results"]
+                if "id" in result
+            )
+
+    # ------------------- Reviews -------------------
+
+    def reviews_list(self):
+        self._get("reviews_list", "/reviews", limit=PAGE_SIZE)
+
+    def review_detail(self):
+        review_id = self.rng.choice(self.fixtures["reviews"])
+        self._get("review_detail", f"/reviews/{review_id}")
+
+    def review_post(self):
+        """Post, update and delete a review of someone else's place."""
+        place_id = self._place_id()
+        payload = self.client.timed(
+            "review_post",
+            "POST",
+            "/reviews",
+            {"text": "Lovely stay", "rating": 5, "place_id": place_id},
+            self.token,
+        )
+
+        if not payload:
+            return
+
+        path = f"/reviews/{payload['id']}"
+        self.client.timed(
+            "review_put",
+            "PUT",
+            path,
+            {"text": "Lovely stay", "rating": 4, "place_id": place_id},
+            self.token,
+        )
+        self.client.timed("review_delete", "DELETE", path, token=self.token)
+
+    def reviews_batch(self):
+        place_ids = {self._place_id() for _ in range(5)}
+        payload = self.client.timed(
+            "reviews_batch",
+            "POST",
+            "/reviews/batch",
+            {
+                "items": [
+                    {"text": "Nice", "rating": 4, "place_id": place_id}
+                    for place_id in place_ids
+                ]
+            },
+            self.token,
+        )
+
+        for result in payload["results"] if payload else ():
+            if "id" not in result:
+                continue
+
+            self.client.timed(
+                "review_delete",
+                "DELETE",
+                f"/reviews/{result['id']}",
+                token=self.token,
+            )
+
+    # ------------------- Users -------------------
+
+    def users_list(self):
+        self._get("users_list", "/users/", limit=PAGE_SIZE)
+
+    def user_detail(self):
+        user_id = self.rng.choice(self.fixtures["users"])[0]
+        self._get("user_detail", f"/users/{user_id}")
+
+    def user_post(self):
+        self.client.timed(
+            "user_post",
+            "POST",
+            "/users/",
+            {
+                "first_name": "Load",
+                "last_name": "User",
+                "email": f"load-{self.tag}-{self._next()}@example.com",
+                "password": data.PASSWORD,
+            },
+            self.admin_token,
+        )
+
+    def user_put(self):
+        self.client.timed(
+            "user_put",
+            "PUT",
+            f"/users/{self.user_id}",
+            # The required email and password are ignored for non-admins
+            {
+                "first_name": f"Load{self._next()}",
+                "last_name": "Reviewer",
+                "email": self.email,
+                "password": data.PASSWORD,
+            },
+            self.token,
+        )
+
+    # ------------------- Amenities -------------------
+
+    def amenities_list(self):
+        self._get("amenities_list", "/amenities/")
+
+    def amenity_detail(self):
+        amenity_id = self.rng.choice(self.fixtures["amenities"])
+        self._get("amenity_detail", f"/amenities/{amenity_id}")
+
+    def amenity_post(self):
+        payload = self.client.timed(
+            "amenity_post",
+            "POST",
+            "/amenities/",
+            {"name": f"Load {self.tag} {self._next()}"},
+            self.admin_token,
+        )
+
+        if payload:
+            self.own_amenities.append(payload["id"])
+
+    def amenity_put(self):
+        if not self.own_amenities:
+            return self.amenity_post()
+
+        self.client.timed(
+            "amenity_put",
+            "PUT",
+            f"/amenities/{self.rng.choice(self.own_amenities)}",
+            {"name": f"Load {self.tag} {self._next()}"},
+            self.admin_token,
+        )
+
+    def amenities_batch(self):
+        self.client.timed(
+            "amenities_batch",
+            "POST",
+            "/amenities/batch",
+            {
+                "items": [
+                    {"name": f"Load {self.tag} {self._next()}"}
+                    for _ in range(5)
+                ]
+            },
+            self.admin_token,
+        )
+
+    # ------------------- Auth -------------------
+
+    def login(self):
+        self.client.login(self.email, data.PASSWORD, route="login")
+
+    def protected(self):
+        self.client.timed("protected", "GET", "/protected", token=self.token)
+
+
+def work(url, admin_token, fixtures, index, options, barrier, results):
+    routes, run_id, seed, seconds = options
+    worker = Worker(url, admin_token, fixtures, index, run_id, seed)
+    names, weights = list(routes), list(routes.values())
+    # Every worker is set up before anyone starts measuring
+    barrier.wait()
+    deadline = time.perf_counter() + seconds
+
+    while time.perf_counter() < deadline:
+        getattr(worker, worker.rng.choices(names, weights)[0])()
+
+    results.put(
+        (dict(worker.client.latencies), dict(worker.client.errors))
+    )
+
+
+def server_config(uri: str, cached: bool):
+    config = data.bench_config(uri)
+
+    if not cached:
+        config.ENTITY_CACHE_MODELS = {}
+        config.RESPONSE_CACHE_BACKEND = None
+
+    return config
+
+
+def serve(uri, cached, port, ready) -> None:
+    from werkzeug.serving import make_server
+
+    from app import create_app
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    app = create_app(server_config(uri, cached))
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    ready.set()
+    server.serve_forever()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, directory):
+    """Fill a temporary database and serve it; (url, server process)."""
+    uri = f"sqlite:///{directory}/bench.db"
+    sizes = {name: getattr(args, name) for name in data.SIZES}
+    data.create_database(data.bench_config(uri), args.seed, **sizes)
+    port = _free_port()
+    ready = multiprocessing.Event()
+    # Spawned: the server gets the URI rather than the config class
+    server = multiprocessing.Process(
+        target=serve,
+        args=(uri, not args.no_cache, port, ready),
+        daemon=True,
+    )
+    server.start()
+    ready.wait(60)
+
+    return f"http://127.0.0.1:{port}", server
+
+
+def run(url, args) -> dict:
+    admin_token = Client(url).login(args.email, args.password)
+    assert admin_token, f"cannot log in as {args.email}"
+    fixtures = discover(url, admin_token)
+    routes = {
+        name: weight
+        for name, weight in ROUTES.items()
+        if (not args.only or name in args.only)
+        and (args.creates or name not in CREATES)
+    }
+    options = (routes, uuid.uuid4().hex[:8], args.seed, args.seconds)
+    barrier = multiprocessing.Barrier(args.processes)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(
+            target=work,
+            args=(
+                url, admin_token, fixtures, index, options, barrier, results
+            ),
+        )
+        for index in range(args.processes)
+    ]
+
+    for process in processes:
+        process.start()
+
+    latencies, errors = defaultdict(list), defaultdict(int)
+
+    for _ in processes:
+        worker_latencies, worker_errors = results.get()
+
+        for route, values in worker_latencies.items():
+            latencies[route].extend(values)
+
+        for route, count in worker_errors.items():
+            errors[route] += count
+
+    for process in processes:
+        process.join()
+
+    summaries = {
+        route: summarize(latencies[route], args.seconds, errors[route])
+        for route in sorted(latencies)
+    }
+    summaries["total"] = summarize(
+        [value for values in latencies.values() for value in values],
+        args.seconds,
+        sum(errors.values()),
+    )
+    return summaries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Running server, e.g. http://host:5000")
+    parser.add_argument("--email", default=data.ADMIN_EMAIL)
+    parser.add_argument("--password", default=data.PASSWORD)
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--only",
+        action="append",
+        choices=sorted(ROUTES),
+        help="Route to load (repeatable), default all of ROUTES",
+    )
+    parser.add_argument(
+        "--creates",
+        action="store_true",
+        help="With --url, also load the routes that leave rows behind "
+        "(CREATES); always on for the local server",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Disable the entity and response caches of the local server",
+    )
+    parser.add_argument("--output", help="Report file, default stdout")
+
+    for name, default in data.SIZES.items():
+        parser.add_argument(f"--{name}", type=int, default=default)
+
+    args = parser.parse_args()
+    # The local server's database is recreated for every run
+    args.creates = args.creates or args.url is None
+
+    if args.only and not args.creates and set(args.only) <= CREATES:
+        parser.error("these routes leave rows behind, add --creates")
+
+    # Spawned workers do not inherit the parent's connections
+    multiprocessing.set_start_method("spawn")
+
+    with tempfile.TemporaryDirectory() as directory:
+        server = None
+        url = args.url
+
+        if url is None:
+            url, server = start_server(args, directory)
+
+        try:
+            results = run(url, args)
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+
+    params = {
+        "url": args.url or "local werkzeug server",
+        "processes": args.processes,
+        "seconds": args.seconds,
+        "seed": args.seed,
+        "only": args.only,
+        "creates": args.creates,
+        "sizes": (
+            None
+            if args.url
+            else {name: getattr(args, name) for name in data.SIZES}
+        ),
+        "cached": not args.no_cache,
+    }
+    write(report("load", params, results), args.output)
+
+
+if __name__ == "__main__":
+    main()
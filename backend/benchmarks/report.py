@@ -0,0 +1,155 @@
+"""JSON reports shared by the benchmarks, and their comparison.
+
+Every report has the same layout, so runs on two commits can be diffed:
+
+    {
+      "benchmark": "facade",
+      "meta": {"commit": ..., "python": ..., "cpus": ..., "date": ...},
+      "params": {...},        # sizes, seed, duration, processes
+      "results": {
+        "get_place": {"calls": 812, "errors": 0, "throughput": 811.2,
+                      "mean_ms": 1.2, "p50_ms": 1.1, "p95_ms": 1.6,
+                      "p99_ms": 2.3},
+        ...
+      }
+    }
+
+Compare two of them with
+
+    python -m benchmarks.report before.json after.json
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending, non-empty list."""
+    rank = max(1, math.ceil(fraction * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies: list[float], seconds: float, errors=0) -> dict:
+    """Statistics of latencies (seconds) measured over seconds."""
+    ordered = sorted(latencies)
+    summary = {
+        "calls": len(ordered),
+        "errors": errors,
+        "throughput": round(len(ordered) / seconds, 1) if seconds else 0.0,
+    }
+
+    if not ordered:
+        return summary
+
+    summary["mean_ms"] = round(sum(ordered) / len(ordered) * 1000, 3)
+
+    for name, fraction in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        summary[f"{name}_ms"] = round(percentile(ordered, fraction) * 1000, 3)
+
+    return summary
+
+
+def _commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(benchmark: str, params: dict, results: dict) -> dict:
+    return {
+        "benchmark": benchmark,
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "params": params,
+        "results": results,
+    }
+
+
+def write(data: dict, path: str | None) -> None:
+    """Write the report to path, or stdout when path is None or '-'."""
+    text = json.dumps(data, indent=2)
+
+    if path in (None, "-"):
+        print(text)
+        return
+
+    with open(path, "w", encoding="utf-8") as file:
+        file.write(text + "\n")
+
+
+def compare(before: dict, after: dict, threshold: float) -> list[str]:
+    """Print the change of each result; return the regressed names.
+
+    A result regresses when its p50 or p95 grows by more than threshold
+    (a fraction), or when it starts failing.
+    """
+    regressions = []
+    print(
+        f"{'':32} {'p50 ms':>17} {'p95 ms':>17} {'throughput':>17}"
+    )
+
+    for name, old in before["results"].items():
+        new = after["results"].get(name)
+
+        if new is None or "p50_ms" not in old or "p50_ms" not in new:
+            continue
+
+        columns = []
+        regressed = new["errors"] > old["errors"]
+
+        for key in ("p50_ms", "p95_ms", "throughput"):
+            change = (new[key] - old[key]) / old[key] if old[key] else 0.0
+            columns.append(f"{new[key]:9.2f} {change:+7.1%}")
+
+            if key != "throughput" and change > threshold:
+                regressed = True
+
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:32} {' '.join(columns)}{flag}")
+
+        if regressed:
+            regressions.append(name)
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare two reports")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative p50/p95 increase counted as a regression",
+    )
+    args = parser.parse_args()
+
+    with open(args.before, encoding="utf-8") as file:
+        before = json.load(file)
+
+    with open(args.after, encoding="utf-8") as file:
+        after = json.load(file)
+
+    if compare(before, after, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
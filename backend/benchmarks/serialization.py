@@ -0,0 +1,103 @@
+"""Serialization time per 10k places: inline dicts + json vs shapes.
+
+"before" rebuilds the response dicts by hand and encodes them with the
+stdlib json module, as the resources did; "after" uses the PLACE shape
+and serializers.dumps (orjson when installed).
+"""
+import argparse
+import json
+import timeit
+
+from app import create_app
+from app.api.v1 import serializers
+from app.api.v1.serializers import PLACE
+from app.models.amenity import Amenity
+from app.models.place import Place
+from app.models.user import User
+from app.passwords import PasswordHash
+
+# Stored as is, which skips hashing
+PASSWORD_HASH = PasswordHash("$2b$04$" + "a" * 53)
+
+
+def build_places(count: int) -> list:
+    owner = User("Bench", "Owner", "owner@example.com", PASSWORD_HASH)
+    amenities = [Amenity(name) for name in ("wifi", "pool", "parking")]
+    places = []
+
+    for index in range(count):
+        place = Place(
+            f"Place {index}",
+            50.0 + index % 300,
+            (index % 160) - 80.0,
+            (index % 340) - 170.0,
+            owner,
+            description="A place to stay",
+        )
+        place.amenities = amenities[: index % 4]
+        places.append(place)
+
+    return places
+
+
+def inline_item(place) -> dict:
+    return {
+        "id": place.id,
+        "title": place.title,
+        "description": place.description,
+        "price": place.price,
+        "latitude": place.latitude,
+        "longitude": place.longitude,
+        "review_count": place.review_count,
+        "rating_avg": place.rating_avg,
+        "owner": {
+            "id": place.owner.id,
+            "first_name": place.owner.first_name,
+            "last_name": place.owner.last_name,
+            "email": place.owner.email,
+        },
+        "amenities": [
+            {"id": amenity.id, "name": amenity.name}
+            for amenity in place.amenities
+        ],
+    }
+
+
+def before(places) -> bytes:
+    page = {"items": [inline_item(place) for place in places]}
+    return json.dumps(page).encode("utf-8")
+
+
+def after(places) -> bytes:
+    return serializers.dumps({"items": PLACE.many(places)})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--places", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+
+    with app.app_context():
+        places = build_places(args.places)
+
+        assert json.loads(before(places)) == json.loads(after(places))
+
+        print(
+            f"{args.places} places, best of {args.repeat}, "
+            f"orjson={'yes' if serializers.orjson else 'no'}"
+        )
+
+        for name, run in (("before", before), ("after", after)):
+            timings = timeit.repeat(
+                lambda: run(places), number=1, repeat=args.repeat
+            )
+            best = min(timings)
+            per_10k = best * 10_000 / args.places
+            print(f"{name:>6}: {per_10k * 1000:8.1f} ms per 10k places")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,77 @@ class Config:
 
     JWT_SECRET_KEY = os.getenv("JWT_SECRET", "default_jwt_secret")
 
+    # bcrypt cost; existing hashes are upgraded on the next login
+    BCRYPT_LOG_ROUNDS = 12
+    # Threads hashing/verifying passwords, 0 runs bcrypt inline
+    BCRYPT_POOL_SIZE = 4
+
+    # Profiles of authenticated users served without a query, see
+    # app/principal.py
+    PRINCIPAL_CACHE_SIZE = 10000
+    PRINCIPAL_CACHE_TTL = 300
+
+    # Read-through cache of entity snapshots, see
+    # app/persistence/entity_cache.py. Set a model to False to disable it.
+    ENTITY_CACHE_SIZE = 10000
+    ENTITY_CACHE_TTL = 30
+    ENTITY_CACHE_MODELS = {
+        "Amenity": True,
+        "Place": True,
+        "Review": True,
+        "User": True,
+    }
+
+    # Cache of public GET responses, see app/response_cache.py: "memory"
+    # (per process), "sqlite" (shared by the workers of a host, stored at
+    # RESPONSE_CACHE_PATH, default in the instance folder) or None
+    RESPONSE_CACHE_BACKEND = "memory"
+    RESPONSE_CACHE_PATH = None
+    RESPONSE_CACHE_SIZE = 10000
+    RESPONSE_CACHE_TTL = 60
+
     SWAGGER_UI_DOC_EXPANSION = "list"
     RESTX_VALIDATE = True
 
+    # Keyset pagination for list endpoints
+    PAGE_SIZE_DEFAULT = 50
+    PAGE_SIZE_MAX = 500
+
+    # Maximum number of items accepted by the /batch endpoints
+    BATCH_MAX_ITEMS = 1000
+
+    # Raise on lazy relationship loads not covered by a load policy
+    SQLALCHEMY_STRICT_LOADING = False
+
+    # SQLite file databases, see app/persistence/routing.py: PRAGMAs run on
+    # every connection; with a reader pool, GET requests read through
+    # read-only connections next to the writer pool
+    SQLITE_PRAGMAS = {}
+    SQLITE_WRITER_POOL_SIZE = None
+    SQLITE_READER_POOL_SIZE = 0
+    SQLITE_POOL_TIMEOUT = 30
+
+    # Replica serving the reads of GET requests and facade.read_only(), see
+    # app/persistence/routing.py; a client that wrote is served by the
+    # primary for REPLICA_STICKY_SECONDS
+    SQLALCHEMY_REPLICA_URI = os.getenv("DATABASE_REPLICA_URL")
+    REPLICA_STICKY_SECONDS = 0
+
+    # SQL statement count and time of each request in a Server-Timing
+    # header and an "app.access" log line, see app/instrumentation.py
+    REQUEST_INSTRUMENTATION = False
+    # Profile one instrumented request in N (0: none) with "cprofile" or
+    # "pyinstrument" into PROFILE_DIR, by default instance/profiles
+    PROFILE_SAMPLE_RATE = 0
+    PROFILER = "cprofile"
+    PROFILE_DIR = None
+
+    # Prometheus metrics at /metrics, see app/metrics.py; with several
+    # worker processes, METRICS_DIR is where they share their samples
+    METRICS_ENABLED = True
+    METRICS_DIR = os.getenv("METRICS_DIR")
+    METRICS_FLUSH_SECONDS = 5
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
@@ -17,4 +85,29 @@ class DevelopmentConfig(Config):
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
 
-config = {"development": DevelopmentConfig, "default": DevelopmentConfig}
+class ProductionConfig(Config):
+    SQLALCHEMY_DATABASE_URI = os.getenv(
+        "DATABASE_URL", "sqlite:///production.db"
+    )
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_STRICT_LOADING = True
+    RESPONSE_CACHE_BACKEND = "sqlite"
+
+    SQLITE_PRAGMAS = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "mmap_size": 256 * 1024 * 1024,
+        # Negative: size in KiB, i.e. 64 MiB per connection
+        "cache_size": -64 * 1024,
+    }
+    # One writer per worker; concurrent workers wait on busy_timeout
+    SQLITE_WRITER_POOL_SIZE = 1
+    SQLITE_READER_POOL_SIZE = 8
+
+
+config = {
+    "development": DevelopmentConfig,
+    "production": ProductionConfig,
+    "default": DevelopmentConfig,
+}
@@ -91,12 +91,14 @@ if (!token) {
 
 
   
-async function fetchPlaces(token) {
+async function fetchPlaces(token, filters = {}) {
 // Make a GET request to fetch places data
 // Include the token in the Authorization header
+// Filters (min_price, max_price, sort...) are applied by the server
 // Handle the response and pass the data to displayPlaces function
 try {
-  const response = await fetch("http://127.0.0.1:5000/api/v1/places", {
+  const query = new URLSearchParams(filters).toString();
+  const response = await fetch(`http://127.0.0.1:5000/api/v1/places?${query}`, {
     headers: {
       Authorization: `Bearer ${token}`,
     },
@@ -106,7 +108,7 @@ try {
     throw new Error("Network response was not ok " + response.statusText);
   }
 
-  const places = await response.json();
+  const { items: places } = await response.json();
   displayPlaces(places);
 } catch (error) {
   console.error("Fetch error: ", error);
@@ -141,16 +143,9 @@ placesList.innerHTML = "";
 }
 
 function filterPlacesByPrice(selectedPrice) {
-const places = document.querySelectorAll('.place-card');
-
-places.forEach(place => {
-    const price = place.getAttribute('data-price');
-    if (selectedPrice === 'All' || price === selectedPrice) {
-        place.style.display = 'block';
-    } else {
-        place.style.display = 'none';
-    }
-});
+const filters = selectedPrice === 'All' ? {} : { max_price: selectedPrice };
+
+fetchPlaces(getCookie('token'), filters);
 }
 
 
@@ -161,7 +156,7 @@ try {
     throw new Error("Network response was not ok " + response.statusText);
   }
 
-  const places = await response.json();
+  const { items: places } = await response.json();
 
   const priceFilter = document.getElementById("price-filter");
 